@@ -0,0 +1,415 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2017 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+JSON API for automated configuration of the router.
+
+All the endpoints return JSON. Unsafe requests must carry the CSRF token
+obtained from the session endpoint in the ``X-CSRFToken`` header.
+
+Batch of UCI operations (``POST /api/uci/batch``) looks like this::
+
+    {"operations": [
+        {"op": "set", "path": "foris.settings.lang", "type": "config", "value": "cs"},
+        {"op": "list", "path": "updater.pkglists.lists", "type": "pkglists",
+         "values": ["luci-controls", "nas"]},
+        {"op": "delete", "path": "firewall.my_rule"}
+    ]}
+
+All the operations are validated first and then applied together using
+a single edit-config. If any of them is invalid, nothing is applied.
+
+Read endpoints (``GET /api/uci/<config>[.<section>[.<option>]]`` and
+``GET /api/stats``) fetch only the requested subtree from Nuci. They accept
+``fields`` parameter with comma-separated (dotted) names of the fields to
+return and support conditional requests using ETag/If-None-Match.
+
+``GET /api/status`` reports the state of the connection to Nuci (circuit
+breaker state, consecutive failures, seconds until the next attempt and how
+many times the backend has been cut off).
+"""
+
+from datetime import datetime
+from functools import wraps
+import hashlib
+import json
+import logging
+import re
+
+from bottle import Bottle, request, response
+import bottle
+from ncclient.operations import RPCError, TimeoutExpiredError
+
+from .nuci import client, filters
+from .nuci.modules.uci_raw import Uci, Config, Section, Option, List, Value, build_option_uci_tree
+from .utils import is_user_authenticated
+from .utils.bottle_csrf import CSRFPlugin, get_csrf_token
+
+
+logger = logging.getLogger("foris.api")
+
+
+MAX_OPERATIONS = 200
+
+uci_name = re.compile(r"^[\w\-]+$")
+
+
+class OperationError(ValueError):
+    pass
+
+
+def json_error(status, **kwargs):
+    """Create JSON error response that can be raised from a view.
+
+    :param status: HTTP status code
+    :param kwargs: content of the response
+    :return: HTTPResponse
+    """
+    res = response.copy(cls=bottle.HTTPResponse)
+    res.content_type = "application/json"
+    res.body = json.dumps(dict(success=False, **kwargs))
+    res.status = status
+    return res
+
+
+def api_login_required(func):
+    """Decorator for API views that require login.
+
+    Unlike utils.login_required, it never redirects to the login page.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        no_auth = bottle.default_app().config.get("no_auth", False)
+        if not no_auth and not is_user_authenticated():
+            raise json_error(403, loggedOut=True, error="Authentication required.")
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def _parse_path(path, min_length, max_length):
+    if not isinstance(path, basestring):
+        raise OperationError("Path must be a string.")
+    chunks = path.split(".")
+    if not min_length <= len(chunks) <= max_length:
+        raise OperationError("Invalid path length '%s'." % path)
+    for chunk in chunks:
+        if not uci_name.match(chunk):
+            # this also refuses Uci-style indexing of anonymous sections
+            raise OperationError("Invalid path element '%s'." % chunk)
+    return chunks
+
+
+def _parse_value(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (basestring, int, long, float)):
+        return unicode(value)
+    raise OperationError("Value must be a string, number or boolean.")
+
+
+def _get_section_type(operation):
+    section_type = operation.get("type")
+    if not isinstance(section_type, basestring) or not uci_name.match(section_type):
+        raise OperationError("Section type is missing or invalid.")
+    return section_type
+
+
+def build_operation(operation):
+    """Build Uci tree for a single operation from the batch.
+
+    :param operation: dict describing the operation
+    :return: tuple (touched path, whether the operation removes a node, Uci tree)
+    :raises: OperationError
+    """
+    if not isinstance(operation, dict):
+        raise OperationError("Operation must be an object.")
+    op = operation.get("op")
+
+    if op == "set":
+        chunks = _parse_path(operation.get("path"), 3, 3)
+        if "value" not in operation:
+            raise OperationError("Value is missing.")
+        try:
+            uci = build_option_uci_tree(".".join(chunks), _get_section_type(operation),
+                                        _parse_value(operation["value"]))
+        except ValueError as e:
+            raise OperationError(str(e))
+        return chunks, False, uci
+
+    uci = Uci()
+    if op == "list":
+        chunks = _parse_path(operation.get("path"), 3, 3)
+        values = operation.get("values")
+        if not isinstance(values, list):
+            raise OperationError("List values must be an array.")
+        config = uci.add(Config(chunks[0]))
+        section = config.add(Section(chunks[1], _get_section_type(operation)))
+        list_ = List(chunks[2])
+        for i, value in enumerate(values):
+            value = _parse_value(value)
+            if isinstance(value, bool):
+                # the same representation as Option uses
+                value = u"1" if value else u"0"
+            list_.add(Value(i, value))
+        # replace the whole list, empty list is removed completely
+        if values:
+            section.add_replace(list_)
+        else:
+            section.add_removal(list_)
+        return chunks, not values, uci
+
+    if op == "delete":
+        chunks = _parse_path(operation.get("path"), 2, 3)
+        config = uci.add(Config(chunks[0]))
+        if len(chunks) == 2:
+            config.add_removal(Section(chunks[1], None))
+        else:
+            section = config.add(Section(chunks[1], None))
+            if operation.get("list"):
+                section.add_removal(List(chunks[2]))
+            else:
+                section.add_removal(Option(chunks[2], None))
+        return chunks, True, uci
+
+    raise OperationError("Unknown operation '%s'." % op)
+
+
+def merge_uci(target, node):
+    """Merge Uci node (including its children) into the target node.
+
+    :param target: node to merge into
+    :param node: node to merge
+    """
+    existing = target.add(node)
+    if existing is not node:
+        if isinstance(existing, Section) and existing.type is None:
+            existing.type = node.type
+        for child in list(node.children):
+            merge_uci(existing, child)
+
+
+def _find_conflict(chunks, removal, touched):
+    for other_index, (other_chunks, other_removal) in touched.iteritems():
+        shorter = min(len(chunks), len(other_chunks))
+        if chunks[:shorter] != other_chunks[:shorter]:
+            continue
+        if len(chunks) == len(other_chunks) or removal or other_removal:
+            return other_index
+    return None
+
+
+def _json_default(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError("%r is not JSON serializable" % obj)
+
+
+def section_to_dict(section):
+    """Serialize Uci section to a dict.
+
+    :param section: Section instance
+    :return: dict
+    """
+    options = {}
+    for child in section.children:
+        if isinstance(child, List):
+            options[child.name] = [value.content for value in child.children]
+        else:
+            options[child.name] = child.value
+    return dict(name=section.name, type=section.type, anonymous=section.anonymous,
+                options=options)
+
+
+def project(data, fields):
+    """Select only the given fields from a dict.
+
+    :param data: dict to select the fields from
+    :param fields: list of field names, nested dicts can be accessed using dots
+    :return: dict with selected fields only
+    """
+    result = {}
+    for field in fields:
+        keys = field.split(".")
+        source = data
+        target = result
+        for key in keys[:-1]:
+            source = source.get(key) if isinstance(source, dict) else None
+            if not isinstance(source, dict):
+                break
+            target = target.setdefault(key, {})
+        else:
+            if isinstance(source, dict) and keys[-1] in source:
+                target[keys[-1]] = source[keys[-1]]
+    return result
+
+
+def _get_fields():
+    fields = request.GET.get("fields")
+    if not fields:
+        return None
+    return [field for field in fields.split(",") if field]
+
+
+def json_response(data):
+    """Serialize data to JSON and handle conditional requests.
+
+    :param data: data to serialize
+    :return: JSON string or empty HTTPResponse with status 304
+    """
+    body = json.dumps(data, default=_json_default, sort_keys=True)
+    etag = '"%s"' % hashlib.sha1(body).hexdigest()
+    response.headers["ETag"] = etag
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return bottle.HTTPResponse(status=304, headers={"ETag": etag})
+    response.content_type = "application/json"
+    return body
+
+
+def session_info():
+    return dict(authenticated=bool(is_user_authenticated()), csrf_token=get_csrf_token())
+
+
+@api_login_required
+def uci_batch():
+    try:
+        data = request.json
+    except ValueError:
+        data = None
+    if not isinstance(data, dict) or not isinstance(data.get("operations"), list):
+        raise json_error(400, error="Request body must be a JSON object with 'operations'.")
+
+    operations = data["operations"]
+    if len(operations) > MAX_OPERATIONS:
+        raise json_error(400, error="Too many operations (max %d)." % MAX_OPERATIONS)
+
+    results = []
+    touched = {}
+    uci = Uci()
+    for index, operation in enumerate(operations):
+        try:
+            chunks, removal, tree = build_operation(operation)
+            conflict = _find_conflict(chunks, removal, touched)
+            if conflict is not None:
+                raise OperationError("Conflicts with operation %d." % conflict)
+        except OperationError as e:
+            results.append(dict(index=index, success=False, error=str(e)))
+            continue
+        touched[index] = (chunks, removal)
+        for config in list(tree.children):
+            merge_uci(uci, config)
+        results.append(dict(index=index, success=True))
+
+    if not all(result["success"] for result in results):
+        for result in results:
+            if result["success"]:
+                result.update(success=False, error="Not applied.")
+        response.status = 400
+        return dict(success=False, results=results)
+
+    if uci.children:
+        try:
+            client.edit_config(uci)
+        except (RPCError, TimeoutExpiredError) as e:
+            logger.exception("Batch edit-config failed.")
+            for result in results:
+                result.update(success=False, error="Not applied.")
+            response.status = 500
+            return dict(success=False, error=str(e), results=results)
+        finally:
+            from .core import nuci_cache
+            for config in uci.children:
+                nuci_cache.invalidate(config.name)
+
+    return dict(success=True, results=results)
+
+
+@api_login_required
+def uci_get(path):
+    chunks = path.split(".")
+    if len(chunks) > 3 or not all(chunks):
+        raise json_error(400, error="Invalid path '%s'." % path)
+    config_name = chunks[0]
+    section_name = chunks[1] if len(chunks) > 1 else None
+    if section_name and section_name.startswith("@"):
+        # anonymous sections can't be addressed by subtree filter, get whole config
+        nuci_filter = filters.create_uci_filter(config_name)
+    else:
+        # option filter does not match lists, so filter by section at most
+        nuci_filter = filters.create_uci_filter(config_name, section_name)
+
+    try:
+        data = client.get(filter=nuci_filter)
+    except (RPCError, TimeoutExpiredError) as e:
+        logger.exception("Unable to get Uci data for '%s'." % path)
+        raise json_error(500, error=str(e))
+    try:
+        node = data.find_child("uci.%s" % path)
+    except ValueError as e:
+        raise json_error(400, error=str(e))
+    if node is None:
+        raise json_error(404, error="Path '%s' not found." % path)
+
+    fields = _get_fields()
+    if isinstance(node, Config):
+        sections = []
+        for section in node.children:
+            section = section_to_dict(section)
+            if fields:
+                section["options"] = project(section["options"], fields)
+            sections.append(section)
+        result = dict(config=node.name, sections=sections)
+    elif isinstance(node, Section):
+        section = section_to_dict(node)
+        if fields:
+            section["options"] = project(section["options"], fields)
+        result = dict(config=config_name, section=section)
+    elif isinstance(node, List):
+        result = dict(path=path, value=[value.content for value in node.children])
+    else:
+        result = dict(path=path, value=node.value)
+    return json_response(result)
+
+
+@api_login_required
+def stats_get():
+    try:
+        data = client.get(filter=filters.stats)
+    except (RPCError, TimeoutExpiredError) as e:
+        logger.exception("Unable to get stats.")
+        raise json_error(500, error=str(e))
+    stats = data.find_child("stats")
+    result = stats.data if stats is not None else {}
+    fields = _get_fields()
+    if fields:
+        result = project(result, fields)
+    return json_response(result)
+
+
+@api_login_required
+def status_get():
+    return dict(nuci=client.get_backend_status())
+
+
+def init_app():
+    app = Bottle()
+    app.install(CSRFPlugin())
+    app.route("/session", name="api_session", callback=session_info)
+    app.route("/uci/batch", name="api_uci_batch", method="POST", callback=uci_batch)
+    app.route("/uci/<path:re:[\w\-.@\[\]]+>", name="api_uci", callback=uci_get)
+    app.route("/stats", name="api_stats", callback=stats_get)
+    app.route("/status", name="api_status", callback=status_get)
+    return app
@@ -22,6 +22,7 @@ from urlparse import urlunsplit
 
 from bottle import Bottle, request, template
 import bottle
+from ncclient.operations import RPCError, TimeoutExpiredError
 
 from .core import lazy_cache, gettext_dummy as gettext, make_notification_title, ugettext as _
 from .config_handlers import *
@@ -29,7 +30,7 @@ from .nuci import client
 from .nuci.client import filters
 from .nuci.exceptions import ConfigRestoreError
 from .nuci.preprocessors import preproc_disabled_to_agreed
-from .utils import login_required, messages, require_contract_valid, contract_valid
+from .utils import login_required, messages, require_contract_valid, contract_valid, staging
 from .utils.bottle_csrf import CSRFPlugin
 from .utils.routing import reverse
 
@@ -38,7 +39,11 @@ logger = logging.getLogger(__name__)
 
 class ConfigPageMixin(object):
     menu_order = 50
+    # time budgets (in seconds) of AJAX actions, overriding the request deadline
+    ajax_budgets = {}
     template = "config/main"
+    # changes can be saved to the staging area and applied later with other pages' changes
+    can_stage = False
 
     def call_action(self, action):
         """Call config page action.
@@ -57,6 +62,7 @@ class ConfigPageMixin(object):
         raise bottle.HTTPError(404, "No AJAX actions specified for this page.")
 
     def default_template(self, **kwargs):
+        kwargs.setdefault('can_stage', self.can_stage)
         return template(self.template, title=_(kwargs.pop('title', self.userfriendly_title)),
                         **kwargs)
 
@@ -77,9 +83,17 @@ class ConfigPageMixin(object):
     def save(self, *args, **kwargs):
         no_messages = kwargs.pop("no_messages", False)
         result = super(ConfigPageMixin, self).save(*args, **kwargs)
+        if not result and self.form.outdated:
+            messages.warning(_("The configuration has been modified by someone else since this "
+                               "page was loaded, your changes were not saved. Please check the "
+                               "current settings and submit the form again."))
+            return result
         if no_messages:
             return result
-        if result:
+        if result and kwargs.get("stage"):
+            messages.success(_("Changes were saved for later, they will be applied together "
+                               "with the other pending changes."))
+        elif result:
             messages.success(_("Configuration was successfully saved."))
         else:
             messages.warning(_("There were some errors in your input."))
@@ -94,6 +108,9 @@ class PasswordConfigPage(ConfigPageMixin, PasswordHandler):
 
     def save(self, *args, **kwargs):
         result = super(PasswordConfigPage, self).save(no_messages=True, *args, **kwargs)
+        if not result and self.form.outdated:
+            # already reported by ConfigPageMixin
+            return result
         wrong_old_password = self.form.callback_results.get('wrong_old_password', False)
         if wrong_old_password:
             messages.warning(_("Old password you entered was not valid."))
@@ -106,9 +123,11 @@ class PasswordConfigPage(ConfigPageMixin, PasswordHandler):
 
 class WanConfigPage(ConfigPageMixin, WanHandler):
     menu_order = 12
+    can_stage = True
 
     def render(self, **kwargs):
-        stats = client.get(filter=filters.stats).find_child("stats")
+        stats, = self.form.prefetch_nuci_config(filters.stats)
+        stats = stats.find_child("stats")
         wan_if = stats.data['interfaces'].get(self.wan_ifname)
         if not (wan_if and wan_if.get('is_up')):
             messages.warning(_("WAN port has no link, your internet connection probably won't work."))
@@ -117,8 +136,10 @@ class WanConfigPage(ConfigPageMixin, WanHandler):
 
 class DNSConfigPage(ConfigPageMixin, DNSHandler):
     menu_order = 13
+    can_stage = True
 
     template = "config/dns"
+    ajax_budgets = {"check-connection": 30}
 
     def _action_check_connection(self):
         return client.check_connection().check_results
@@ -132,10 +153,12 @@ class DNSConfigPage(ConfigPageMixin, DNSHandler):
 
 class LanConfigPage(ConfigPageMixin, LanHandler):
     menu_order = 14
+    can_stage = True
 
 
 class WifiConfigPage(ConfigPageMixin, WifiHandler):
     menu_order = 15
+    can_stage = True
 
     template = "config/wifi"
 
@@ -192,6 +215,34 @@ class MaintenanceConfigPage(ConfigPageMixin, MaintenanceHandler):
                 messages.error(_("Sending of the testing message failed because of an internal error."))
         bottle.redirect(reverse("config_page", page_name="maintenance"))
 
+    def _action_take_snapshot(self):
+        if bottle.request.method != 'POST':
+            messages.error(_("Wrong HTTP method."))
+            bottle.redirect(reverse("config_page", page_name="maintenance"))
+        client.take_config_snapshot(description=request.POST.get("description") or None)
+        messages.success(_("Snapshot of the current configuration was taken."))
+        bottle.redirect(reverse("config_page", page_name="maintenance"))
+
+    def _action_rollback_snapshot(self):
+        if bottle.request.method != 'POST':
+            messages.error(_("Wrong HTTP method."))
+            bottle.redirect(reverse("config_page", page_name="maintenance"))
+        try:
+            snapshot_id = int(request.POST.get("snapshot"))
+            changed = client.rollback_config(snapshot_id,
+                                             description=_("Before rollback"))
+        except (TypeError, ValueError, KeyError):
+            messages.error(_("The snapshot doesn't exist anymore."))
+            bottle.redirect(reverse("config_page", page_name="maintenance"))
+        from .core import nuci_cache
+        for config_name in changed:
+            nuci_cache.invalidate(config_name)
+        if changed:
+            messages.success(_("Configuration was reverted to the snapshot."))
+        else:
+            messages.info(_("Configuration is the same as in the snapshot."))
+        bottle.redirect(reverse("config_page", page_name="maintenance"))
+
     def call_action(self, action):
         if action == "config-backup":
             return self._action_config_backup()
@@ -201,17 +252,30 @@ class MaintenanceConfigPage(ConfigPageMixin, MaintenanceHandler):
             return self._action_save_notifications()
         elif action == "test_notifications":
             return self._action_test_notifications()
+        elif action == "take_snapshot":
+            return self._action_take_snapshot()
+        elif action == "rollback_snapshot":
+            return self._action_rollback_snapshot()
         raise ValueError("Unknown AJAX action.")
 
     def render(self, **kwargs):
         notifications_handler = NotificationsHandler(self.data)
+        snapshots = [
+            dict(id=snapshot.id, description=snapshot.description,
+                 created=datetime.fromtimestamp(snapshot.created).strftime("%Y-%m-%d %H:%M:%S"),
+                 changes=len(changes) if changes is not None else None)
+            for snapshot, changes in client.config_snapshots.history()
+        ]
         return super(MaintenanceConfigPage, self).render(notifications_form=notifications_handler.form,
-                                                         **kwargs)
+                                                         snapshots=snapshots, **kwargs)
 
     def save(self, *args, **kwargs):
         result = False
         try:
             result = super(MaintenanceConfigPage, self).save(no_messages=True, *args, **kwargs)
+            if not result and self.form.outdated:
+                # already reported by ConfigPageMixin
+                return result
             new_ip = self.form.callback_results.get('new_ip')
             if new_ip:
                 # rebuild current URL with new IP
@@ -324,6 +388,9 @@ class UpdaterConfigPage(ConfigPageMixin, UpdaterHandler):
 
     def save(self, *args, **kwargs):
         result = super(UpdaterConfigPage, self).save(no_messages=True, *args, **kwargs)
+        if not result and self.form.outdated:
+            # already reported by ConfigPageMixin
+            return result
         if result:
             messages.success(_("Configuration was successfully saved. Selected "
                                "packages should be installed or removed shortly."))
@@ -427,6 +494,7 @@ class AboutConfigPage(ConfigPageMixin):
 
     template = "config/about"
     userfriendly_title = gettext("About")
+    ajax_budgets = {"registration_code": 15}
 
     SENDING_STATUS_TRANSLATION = {
         'online': gettext("Online"),
@@ -462,17 +530,64 @@ class AboutConfigPage(ConfigPageMixin):
         return verbose
 
     def render(self, **kwargs):
-        stats = client.get(filter=filters.stats).find_child("stats")
-        serial = client.get_serial()
-        if not contract_valid():
-            foris_conf = client.get(filter=filters.create_config_filter("foris"))
+        if contract_valid():
+            stats, = client.get_many([filters.stats], allow_stale=True)
+        else:
+            stats, foris_conf = client.get_many([filters.stats, filters.foris_config],
+                                                allow_stale=True)
             agreed_opt = foris_conf.find_child("uci.foris.eula.agreed_collect")
             kwargs['agreed_collect'] = agreed_opt and bool(int(agreed_opt.value))
+        stats = stats.find_child("stats")
+        serial = client.get_serial()
         return self.default_template(stats=stats.data, serial=serial,
                                      translate_sending_status=self.translate_sending_status,
                                      **kwargs)
 
 
+class PendingChangesConfigPage(ConfigPageMixin):
+    menu_order = 98
+
+    template = "config/pending-changes"
+    userfriendly_title = gettext("Pending changes")
+
+    def __init__(self, data=None):
+        self.data = data
+
+    def _action_apply(self):
+        if bottle.request.method != 'POST':
+            messages.error(_("Wrong HTTP method."))
+            bottle.redirect(reverse("config_page", page_name="pending-changes"))
+        try:
+            staging.apply()
+        except (RPCError, TimeoutExpiredError):
+            logger.exception("Unable to apply pending changes.")
+            messages.error(_("Pending changes could not be applied, they are kept so you can "
+                             "try again later."))
+        else:
+            messages.success(_("Pending changes were successfully applied."))
+        bottle.redirect(reverse("config_page", page_name="pending-changes"))
+
+    def _action_discard(self):
+        if bottle.request.method != 'POST':
+            messages.error(_("Wrong HTTP method."))
+            bottle.redirect(reverse("config_page", page_name="pending-changes"))
+        staging.discard()
+        messages.success(_("Pending changes were discarded."))
+        bottle.redirect(reverse("config_page", page_name="pending-changes"))
+
+    def call_action(self, action):
+        if action == "apply":
+            return self._action_apply()
+        elif action == "discard":
+            return self._action_discard()
+        raise ValueError("Unknown action.")
+
+    def render(self, **kwargs):
+        staged = staging.get_staged()
+        current = staging.get_current_config(staged) if staged is not None else None
+        return self.default_template(changes=staging.describe(staged, current), **kwargs)
+
+
 class VirtualConfigPage(ConfigPageMixin):
     def __init__(self, title, menu_order):
         self.userfriendly_title = title
@@ -502,7 +617,9 @@ config_page_map = ConfigPageMapItems((
 ))
 
 # config pages that are not shown in the menu
-extra_config_pages = ConfigPageMapItems()
+extra_config_pages = ConfigPageMapItems((
+    ('pending-changes', PendingChangesConfigPage),
+))
 
 
 def add_config_page(page_name, page_class, top_level=False):
@@ -528,7 +645,7 @@ def get_config_page(page_name):
 
 @login_required
 def index():
-    notifications = client.get_messages()
+    notifications = client.get_messages(allow_stale=True)
     return template("config/index", title=_("Home page"),
                     make_notification_title=make_notification_title,
                     active_config_page_key='',
@@ -556,13 +673,17 @@ def config_page_get(page_name):
 def config_page_post(page_name):
     bottle.SimpleTemplate.defaults['active_config_page_key'] = page_name
     ConfigPage = get_config_page(page_name)
+    # "Save for later" button - add the changes to the staging area
+    stage = bool(request.POST.pop("stage", None)) and ConfigPage.can_stage
     config_page = ConfigPage(request.POST)
     if request.is_xhr:
         if request.POST.pop("update", None):
             # if update was requested, just render the page - otherwise handle actions as usual
             return config_page.render(is_xhr=True)
     try:
-        if config_page.save():
+        # pages which can't stage (e.g. from plugins) may not accept the argument
+        saved = config_page.save(stage=True) if stage else config_page.save()
+        if saved:
             bottle.redirect(request.fullpath)
     except TypeError:
         # raised by Validator - could happen when the form is posted with wrong fields
@@ -621,7 +742,8 @@ def config_ajax(page_name):
     ConfigPage = get_config_page(page_name)
     config_page = ConfigPage()
     try:
-        result = config_page.call_ajax_action(action)
+        with client.deadline(config_page.ajax_budgets.get(action)):
+            result = config_page.call_ajax_action(action)
         return result
     except ValueError:
         raise bottle.HTTPError(404, "Unknown action.")
@@ -56,19 +56,24 @@ class BaseConfigHandler(object):
         """
         raise NotImplementedError()
 
-    def save(self, extra_callbacks=None):
+    def save(self, extra_callbacks=None, stage=False):
         """
 
         :param extra_callbacks: list of extra callbacks to call when saved
+        :param stage: add the changes to the staging area instead of applying them
         :return:
         """
         form = self.form
+        if not form.check_version():
+            # config has been changed by someone else since the form was rendered
+            logger.warning("Form %s not saved, the config has been modified meanwhile.", form.name)
+            return False
         form.validate()
         if extra_callbacks:
             for cb in extra_callbacks:
                 form.add_callback(cb)
         if form.valid:
-            form.save()
+            form.save(stage=stage)
             return True
         else:
             return False
@@ -139,8 +144,8 @@ class CollectionToggleHandler(BaseConfigHandler):
             return "none", None
 
         form.add_callback(form_cb)
-        form.add_callback(adjust_lists_cb)
-        form.add_callback(run_updater_cb)
+        form.add_callback(adjust_lists_cb, depends_on=["enable"])
+        form.add_callback(run_updater_cb, depends_on=["enable"])
 
         return form
 
@@ -512,8 +517,9 @@ class RegistrationCheckHandler(BaseConfigHandler):
         )
 
         def form_cb(data):
+            # user asked for the check, recent result is not good enough
             result = client.get_registration_status(data.get("email"),
-                                                    bottle.request.app.lang)
+                                                    bottle.request.app.lang, refresh=True)
             return "save_result", {
                 'success': result[0],
                 'response': result[1],
@@ -155,7 +155,9 @@ class UpdaterHandler(BaseConfigHandler):
 
     def __init__(self, *args, **kwargs):
         super(UpdaterHandler, self).__init__(*args, **kwargs)
-        lazy_cache.nuci_updater = lambda: client.get(filter=filters.updater).find_child("updater")
+        # outdated list of packages is good enough when the page is only displayed
+        lazy_cache.nuci_updater = lambda: client.get(
+            filter=filters.updater, allow_stale=not self.data).find_child("updater")
 
     def get_form(self):
         pkg_list = lazy_cache.nuci_updater.pkg_list
@@ -205,6 +207,9 @@ class UpdaterHandler(BaseConfigHandler):
         else:
             agreed_collect = True
 
+        # fields which affect what updater installs
+        list_field_names = []
+
         for pkg_list_item in pkg_list:
             if not contract_valid():
                 if pkg_list_item.name == "i_agree_datacollect":
@@ -221,6 +226,7 @@ class UpdaterHandler(BaseConfigHandler):
                 nuci_path="uci.updater.pkglists.lists",
                 nuci_preproc=make_preproc(pkg_list_item.name)
             )
+            list_field_names.append("install_%s" % pkg_list_item.name)
 
         def make_lang_preproc(lang_name):
             """Make function for preprocessing value of single language."""
@@ -240,6 +246,7 @@ class UpdaterHandler(BaseConfigHandler):
                 nuci_path="uci.updater.l10n.langs",
                 nuci_preproc=make_lang_preproc(language),
             )
+            list_field_names.append("language_%s" % language)
 
         def package_lists_form_cb(data):
             uci = Uci()
@@ -286,5 +293,6 @@ class UpdaterHandler(BaseConfigHandler):
             return "none", None
 
         updater_form.add_callback(package_lists_form_cb)
-        updater_form.add_callback(package_lists_run_updater_cb)
+        # running updater is expensive, do it only if the lists have changed
+        updater_form.add_callback(package_lists_run_updater_cb, depends_on=list_field_names)
         return updater_form
@@ -32,7 +32,7 @@ from ncclient.operations import TimeoutExpiredError, RPCError
 
 # local
 from . import __version__ as foris_version
-from .nuci import client, filters, cache
+from .nuci import client, filters, cache, memo, uci_cache
 from .nuci.modules.uci_raw import Uci, Config, Section, Option
 from .nuci.modules.user_notify import Severity
 from .langs import iso2to3, translation_names, translations, DEFAULT_LANGUAGE
@@ -41,9 +41,10 @@ from .utils import (
     redirect_unauthenticated, is_safe_redirect, is_user_authenticated, template_helpers, LazyCache
 )
 from .utils.bottle_csrf import get_csrf_token, update_csrf_token, CSRFValidationError, CSRFPlugin
-from .utils import DEVICE_CUSTOMIZATION, messages, contract_valid
+from .utils.bottle_nuci import NuciErrorsPlugin
+from .utils import DEVICE_CUSTOMIZATION, messages, contract_valid, staging
 from .utils.reporting_middleware import ReportingMiddleware
-from .utils.routing import reverse, static
+from .utils.routing import build_route_table, reverse, static
 
 
 logger = logging.getLogger("foris")
@@ -88,6 +89,9 @@ bottle.SimpleTemplate.defaults["url"] = lambda name, **kwargs: reverse(name, **k
 bottle.SimpleTemplate.defaults["static"] = static
 bottle.SimpleTemplate.defaults["get_csrf_token"] = get_csrf_token
 bottle.SimpleTemplate.defaults["helpers"] = template_helpers
+bottle.SimpleTemplate.defaults["nuci_status"] = client.get_backend_status
+bottle.SimpleTemplate.defaults["nuci_data_outdated"] = memo.served_stale
+bottle.SimpleTemplate.defaults["staged_changes_count"] = staging.get_staged_count
 
 # messages
 messages.set_template_defaults(bottle.SimpleTemplate)
@@ -253,7 +257,7 @@ def write_uci_lang(lang):
     luci.add(main)
     main.add(Option("lang", lang))
     try:
-        client.edit_config(uci.get_xml())
+        client.edit_config(uci)
         return True
     except (RPCError, TimeoutExpiredError):
         return False
@@ -363,6 +367,20 @@ def clear_lazy_cache():
     lazy_cache.clear()
 
 
+def set_request_deadline():
+    # RPCs to Nuci shouldn't take longer than the client is willing to wait
+    client.set_deadline(bottle.default_app().config.get("request_deadline"))
+
+
+def clear_request_deadline():
+    client.set_deadline(None)
+
+
+def set_request_priority():
+    # saving forms and logging in go first when waiting for Nuci
+    client.set_high_priority(bottle.request.method == "POST" or bottle.request.path == "/")
+
+
 def make_notification_title(notification):
     """
     Helper function for creating of human-readable notification title.
@@ -401,9 +419,13 @@ def init_foris_app(app, prefix):
     """
     app.catchall = False  # caught by ReportingMiddleware
     app.error_handler[403] = foris_403_handler
+    app.install(NuciErrorsPlugin())
+    app.add_hook('before_request', set_request_deadline)
+    app.add_hook('before_request', memo.reset_served_stale)
     app.add_hook('after_request', clickjacking_protection)
     app.add_hook('after_request', disable_caching)
     app.add_hook('after_request', clear_lazy_cache)
+    app.add_hook('after_request', clear_request_deadline)
     app.config['prefix'] = prefix
 
 
@@ -420,11 +442,25 @@ def get_arg_parser():
     group.add_argument("-p", "--port", type=int, default=8080)
     group.add_argument("--session-timeout", type=int, default=900,
                        help="session timeout (in seconds)")
+    group.add_argument("--request-deadline", type=int, default=60,
+                       help="maximum time spent by requests waiting for Nuci (in seconds)")
     group.add_argument("-s", "--server", choices=["wsgiref", "flup", "cgi"], default="wsgiref")
     group.add_argument("-d", "--debug", action="store_true")
     group.add_argument("--noauth", action="store_true",
                        help="disable authentication (available only in debug mode)")
     group.add_argument("--nucipath", help="path to Nuci binary")
+    group.add_argument("--nuci-socket",
+                       help="path to Unix socket of Nuci multiplexer (foris.nuci.multiplexer)")
+    group.add_argument("--read-uci-files", action="store_true",
+                       help="read Uci configs directly from config files instead of asking Nuci")
+    group.add_argument("--uci-cache", nargs="?", const=uci_cache.DEFAULT_CACHE_PATH,
+                       metavar="PATH",
+                       help="share parsed Uci configs between processes using a cache file "
+                            "(implies --read-uci-files, used by default with the cgi server "
+                            "if configs are read from files)")
+    group.add_argument("--watch-config", action="store_true",
+                       help="watch Uci config files and invalidate cached data when they change "
+                            "(not useful with the cgi server)")
     parser.add_argument("-R", "--routes", action="store_true", help="print routes and exit")
     group.add_argument(
         "-S", "--static", action="store_true",
@@ -444,6 +480,7 @@ def init_default_app(include_static=False):
 
     app = bottle.app()
     app.install(CSRFPlugin())
+    app.add_hook('before_request', set_request_priority)
     app.route("/", name="index", callback=index)
     app.route("/lang/<lang:re:\w{2}>", name="change_lang", callback=change_lang)
     app.route("/", method="POST", name="login", callback=login)
@@ -469,8 +506,10 @@ def prepare_main_app(args):
     bottle.TEMPLATE_PATH.append(template_dir)
     logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING)
     # mount apps
+    import api
     import config
     import wizard
+    app.mount("/api", api.init_app())
     app.mount("/config", config.init_app())
     app.mount("/wizard", wizard.init_app())
 
@@ -491,13 +530,31 @@ def prepare_main_app(args):
             prefix = route.config['mountpoint.prefix']
             init_foris_app(mounted, prefix)
 
+    app.config["request_deadline"] = args.request_deadline or None
+
     if args.nucipath:
         client.StaticNetconfConnection.set_bin_path(args.nucipath)
+    if args.nuci_socket:
+        client.StaticNetconfConnection.set_socket_path(args.nuci_socket)
+    cache_path = args.uci_cache
+    if not cache_path and args.read_uci_files and args.server == "cgi":
+        # every request is handled by a new process
+        cache_path = uci_cache.DEFAULT_CACHE_PATH
+    if cache_path:
+        client.uci_files.enable(cache=uci_cache.UciDiskCache(cache_path))
+    elif args.read_uci_files:
+        client.uci_files.enable()
+    if args.watch_config:
+        client.config_watcher.start()
+        nuci_cache.watch(client.config_watcher)
 
     # load Foris plugins before applying Bottle plugins to app
     loader = ForisPluginLoader(app)
     loader.autoload_plugins()
 
+    # all the apps are mounted now, precompute table for reverse()
+    build_route_table(app)
+
     # print routes to console and exit
     if args.routes:
         routes = route_list_cmdline(app)
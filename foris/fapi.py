@@ -16,15 +16,17 @@
 
 from collections import defaultdict, OrderedDict
 import copy
+import hashlib
 import logging
+from xml.etree import cElementTree as ET
 
 from bottle import MultiDict
 
 from form import Input, InputWithArgs, Dropdown, Form, Checkbox, websafe, Hidden, Radio
 from nuci import client
-from nuci.configurator import add_config_update, commit
+from nuci.configurator import add_config_update, commit, take_updates
 from nuci.utils import LocalizableTextValue
-from utils import Lazy
+from utils import Lazy, staging
 import validators as validators_module
 
 
@@ -57,6 +59,9 @@ class ForisFormElement(object):
 
 
 class ForisForm(ForisFormElement):
+    # name of the hidden input containing version token of the config the form was rendered with
+    VERSION_TOKEN_FIELD = "config_version"
+
     def __init__(self, name, data=None, filter=None):
         """
 
@@ -94,15 +99,105 @@ class ForisForm(ForisFormElement):
         self.__form_cache = None
         self.validated = False
         # _nuci_config is not required every time, lazy-evaluate it
+        self._filter = filter
         self._nuci_config = Lazy(lambda: client.get(filter))
         self.requirement_map = defaultdict(list)  # mapping: requirement -> list of required_by
-        self.callbacks = []
+        self.callbacks = []  # list of tuples (callback, names of fields it depends on)
         self.callback_results = {}  # name -> result
+        self.__version_token = None
+        self.__version_rejected = False
 
     @property
     def nuci_config(self):
         return self._nuci_config
 
+    @property
+    def versioned(self):
+        """
+        Whether the form is based on Nuci config, so its version can be checked.
+        Forms without a filter that don't read any nuci paths (e.g. password)
+        would need the whole config just to compute the token.
+        """
+        if self._filter is not None:
+            return True
+        return any(field.nuci_path or field.nuci_preproc for field in self._get_all_fields())
+
+    @property
+    def version_token(self):
+        """
+        Hash of the Uci config the form is based on. It's embedded in the rendered
+        form, so concurrent modification of the config can be detected on save.
+
+        :return: hex digest of the config or None if the form is not versioned
+        """
+        if not self.versioned:
+            return None
+        if self.__version_token is None:
+            uci = self._nuci_config.find_child("uci")
+            serialized = ET.tostring(uci.get_xml()) if uci is not None else ""
+            self.__version_token = hashlib.sha1(serialized).hexdigest()
+        return self.__version_token
+
+    @property
+    def submitted_version_token(self):
+        token = self._request_data.get(self.VERSION_TOKEN_FIELD)
+        if isinstance(token, list):
+            token = token[0] if token else None
+        return token or None
+
+    @property
+    def outdated(self):
+        """
+        Whether the submitted form has been rendered with a config that has been
+        modified since then. Forms submitted without the version token are never
+        considered outdated.
+
+        :return: True if the config has been modified
+        """
+        submitted = self.submitted_version_token
+        if submitted is None or not self.versioned:
+            return False
+        return submitted != self.version_token
+
+    def check_version(self):
+        """Check that the config hasn't been modified since the form was rendered.
+
+        If it has, the current version token is embedded into the re-rendered
+        form, so the user can review the current settings and submit again.
+
+        :return: True if the form can be saved
+        """
+        if self.outdated:
+            self.__version_rejected = True
+            return False
+        return True
+
+    @property
+    def rendered_version_token(self):
+        """
+        Version token to embed into the rendered form. Submitted token is kept
+        when the form is only re-rendered (e.g. on AJAX update), so modifications
+        made meanwhile are still detected on save.
+        """
+        if not self.versioned:
+            return None
+        if self.submitted_version_token is not None and not self.__version_rejected:
+            return self.submitted_version_token
+        return self.version_token
+
+    def prefetch_nuci_config(self, *filters):
+        """Get nuci config of this form together with other data using
+        a single pipelined request.
+
+        :param filters: subtree filters of the other data
+        :return: list of Data instances for the filters
+        """
+        if self._nuci_config.value is not None:
+            return client.get_many(filters)
+        results = client.get_many((self._filter, ) + filters)
+        self._nuci_config.value = results[0]
+        return results[1:]
+
     @property
     def data(self):
         """
@@ -152,6 +247,37 @@ class ForisForm(ForisFormElement):
     def invalidate_data(self):
         self.__data_cache = None
 
+    @staticmethod
+    def _normalize_value(field, value):
+        if issubclass(field.type, Checkbox):
+            return False if value == "0" else bool(value)
+        if isinstance(value, (list, tuple)):
+            return [unicode(v) for v in value]
+        return unicode(value) if value is not None else None
+
+    @property
+    def changed_fields(self):
+        """
+        Names of fields with values different from the values obtained from
+        Nuci. Active fields without value in Nuci config are compared with
+        their default value (e.g. unchecked checkbox for a missing Uci list),
+        inactive fields with value in Nuci config are always considered changed.
+
+        :return: set of field names
+        """
+        data = self.data
+        changed = set()
+        for field in self._get_all_fields():
+            if field.name not in data:
+                if field.name in self._nuci_data:
+                    changed.add(field.name)
+                continue
+            current = self._nuci_data.get(field.name, self.defaults.get(field.name))
+            if self._normalize_value(field, data[field.name]) != \
+                    self._normalize_value(field, current):
+                changed.add(field.name)
+        return changed
+
     @property
     def _form(self):
         if self.__form_cache is not None:
@@ -191,9 +317,13 @@ class ForisForm(ForisFormElement):
         return filter(lambda f: f.has_requirements(data), fields)
 
     def _update_nuci_data(self):
-        for field in self._get_all_fields():
+        fields = self._get_all_fields()
+        paths = [field.nuci_path for field in fields if field.nuci_path]
+        # resolve paths of all the fields in a single pass over the config
+        nodes = self._nuci_config.find_children(paths) if paths else {}
+        for field in fields:
             if field.nuci_path:
-                value = self._nuci_config.find_child(field.nuci_path)
+                value = nodes.get(field.nuci_path)
                 if value:
                     if not field.nuci_preproc:
                         preprocessed = value.value
@@ -234,15 +364,24 @@ class ForisForm(ForisFormElement):
         result += "\n".join(c.render() for c in self.children.itervalues())
         return result
 
-    def save(self):
+    def save(self, stage=False):
+        """Process callbacks and send the config updates to Nuci.
+
+        :param stage: don't send the updates, add them to the staging area
+                      of the session instead (see foris.utils.staging)
+        """
         self.process_callbacks(self.data)
-        commit()
+        if stage:
+            staging.stage(take_updates(), current=self._nuci_config.value)
+            return
+        # don't send unchanged values (if the current config has been fetched already)
+        commit(current=self._nuci_config.value)
 
     def validate(self):
         self.validated = True
         return self._form.validates(self.data)
 
-    def add_callback(self, cb):
+    def add_callback(self, cb, depends_on=None):
         """Add callback function.
 
         Callback is a function taking argument `data` (contains form data) and returning
@@ -255,13 +394,23 @@ class ForisForm(ForisFormElement):
             - none: do nothing, everything has been processed in the callback function
 
         :param cb: callback function
+        :param depends_on: names of fields the callback depends on - the callback
+                           is skipped if none of them has changed (see changed_fields),
+                           None means the callback is always called
         :return: None
         """
-        self.callbacks.append(cb)
+        self.callbacks.append((cb, frozenset(depends_on) if depends_on is not None else None))
 
     def process_callbacks(self, form_data):
         logger.debug("Processing callbacks")
-        for cb in self.callbacks:
+        changed_fields = None
+        for cb, depends_on in self.callbacks:
+            if depends_on is not None:
+                if changed_fields is None:
+                    changed_fields = self.changed_fields
+                if not depends_on & changed_fields:
+                    logger.debug("Skipping callback %s, its fields haven't changed.", cb)
+                    continue
             logger.debug("Processing callback: %s", cb)
             cb_result = cb(form_data)
             operation = cb_result[0]
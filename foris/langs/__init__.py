@@ -22,6 +22,7 @@ import pkgutil
 DEFAULT_LANGUAGE = 'en'
 iso2to3 = {'en': 'eng'}
 translation_names = {'en': 'English'}
+alphabets = {}
 translations = []
 
 for loader, name, _ in pkgutil.iter_modules([os.path.dirname(__file__)]):
@@ -29,6 +30,7 @@ for loader, name, _ in pkgutil.iter_modules([os.path.dirname(__file__)]):
     translations.append(module.iso2)
     iso2to3[module.iso2] = module.iso3
     translation_names[module.iso2] = module.name
+    alphabets[module.iso2] = getattr(module, "alphabet", None)
 
 translations.sort()
 translations.insert(0, DEFAULT_LANGUAGE)  # english first
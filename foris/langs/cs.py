@@ -4,3 +4,6 @@ iso2 = 'cs'
 iso3 = 'cze'
 
 name = u'Čeština'
+
+# uppercase graphemes in collation order, used by foris.utils.localized_sorted
+alphabet = u"A Á Å B C Č D Ď E É Ě F G H CH I Í J K L M N Ň O Ó P Q R Ř S Š T Ť U Ú Ů V W X Y Ý Z Ž".split(" ")
@@ -4,3 +4,6 @@ iso2 = 'da'
 iso3 = 'dan'
 
 name = u'Dansk'
+
+# uppercase graphemes in collation order, used by foris.utils.localized_sorted
+alphabet = u"A B C D E F G H I J K L M N O P Q R S T U V W X Y Ü Z Æ Ä Ø Ö Å".split(" ")
@@ -4,3 +4,6 @@ iso2 = 'de'
 iso3 = 'deu'
 
 name = u'Deutsch'
+
+# uppercase graphemes in collation order, used by foris.utils.localized_sorted
+alphabet = u"A Ä B C D E F G H I J K L M N O Ö P Q R S ß T U Ü V W X Y Z".split(" ")
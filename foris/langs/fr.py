@@ -4,3 +4,6 @@ iso2 = 'fr'
 iso3 = 'fra'
 
 name = u'Français'
+
+# uppercase graphemes in collation order, used by foris.utils.localized_sorted
+alphabet = u"A À Â Æ B C Ç D E É È Ê Ë F G H I Î Ï J K L M N O Ô Œ P Q R S T U Ù Û Ü V W X Y Ÿ Z".split(" ")
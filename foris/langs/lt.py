@@ -4,3 +4,6 @@ iso2 = 'lt'
 iso3 = 'lit'
 
 name = u'Lietuvių kalba'
+
+# uppercase graphemes in collation order, used by foris.utils.localized_sorted
+alphabet = u"A Ą B C Č D E Ę Ė F G H I Į Y J K L M N O P Q R S Š T U Ų Ū V W X Z Ž".split(" ")
@@ -4,3 +4,6 @@ iso2 = 'pl'
 iso3 = 'pol'
 
 name = u'Polski'
+
+# uppercase graphemes in collation order, used by foris.utils.localized_sorted
+alphabet = u"A Ą B C Ć D E Ę F G H I J K L Ł M N Ń O Ó P Q R S Ś T U V W X Y Z Ź Ż".split(" ")
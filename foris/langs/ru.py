@@ -4,3 +4,6 @@ iso2 = 'ru'
 iso3 = 'rus'
 
 name = u'Русский'
+
+# uppercase graphemes in collation order, used by foris.utils.localized_sorted
+alphabet = u"А Б В Г Д Е Ё Ж З И Й К Л М Н О П Р С Т У Ф Х Ц Ч Ш Щ Ъ Ы Ь Э Ю Я".split(" ")
@@ -4,3 +4,6 @@ iso2 = 'sk'
 iso3 = 'svk'
 
 name = u'Slovenčina'
+
+# uppercase graphemes in collation order, used by foris.utils.localized_sorted
+alphabet = u"A Á Ä B C Č D Ď DZ DŽ E É F G H CH I Í J K L Ĺ Ľ M N Ň O Ó Ô P Q R Ŕ S Š T Ť U Ú V W X Y Ý Z Ž".split(" ")
@@ -28,9 +28,13 @@ logger = logging.getLogger("nuci.cache")
 class NuciCache(object):
     """Nuci caching class
 
-    It is used for explicit caching of values.
+    It is used for explicit caching of values. When config changes are watched
+    (see watch()), records are kept until their config is changed instead of
+    being reloaded after the given period.
     """
 
+    watched = False
+
     results = {}
     """
     records look like this
@@ -54,6 +58,30 @@ class NuciCache(object):
 
         logger.debug("records for %s invalidated in cache" % path)
 
+    def watch(self, watcher):
+        """ Invalidate records on config changes instead of relying on their age
+
+        :param watcher: running config watcher
+        :type watcher: foris.nuci.watcher.ConfigWatcher
+        """
+        watcher.subscribe(self.invalidate_config)
+        self.watched = True
+
+    def invalidate_config(self, config):
+        """ Invalidates all records of the config
+
+        :param config: name of the config, None means all configs
+        """
+        if config is None:
+            self.results = {}
+        else:
+            prefix = config + "."
+            self.results = {
+                k: v for k, v in self.results.items() if k != config and not k.startswith(prefix)
+            }
+
+        logger.debug("records for config %s invalidated in cache" % config)
+
     def get(self, nuci_path, cache_valid_period):
         """ Get the record from the cache
 
@@ -61,7 +89,8 @@ class NuciCache(object):
 
         :param nuci_path: filter used to obtain the cache
         :type nuci_path: str
-        :param cache_valid_period: older records are reloaded (in seconds), 0 means always reload
+        :param cache_valid_period: older records are reloaded (in seconds), 0 means always reload,
+                                   records are not reloaded because of age if config is watched
         :type cache_valid_period: int
 
          :returns: uci tree
@@ -70,7 +99,7 @@ class NuciCache(object):
 
         # try to return cached data
         if cache_valid_period and nuci_path in self.results:
-            if self.results[nuci_path]['stored'] >= \
+            if self.watched or self.results[nuci_path]['stored'] >= \
                     datetime.now() - timedelta(seconds=cache_valid_period):
 
                 logger.debug("uci path %s was loaded from cache" % nuci_path)
@@ -13,12 +13,17 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+from contextlib import contextmanager
+import heapq
+import itertools
 import logging
+import math
 import shlex
-from time import sleep, time
+import threading
+from time import time
 from xml.etree import cElementTree as ET
 
-from ncclient import operations, transport
+from ncclient import operations
 from ncclient.capabilities import Capabilities
 from ncclient.manager import OpExecutor, CAPABILITIES
 from ncclient.operations import RPCError
@@ -26,17 +31,111 @@ from ncclient.operations.errors import TimeoutExpiredError
 from ncclient.transport import TransportError
 
 from . import filters
-from .exceptions import ConfigRestoreError
+from .exceptions import ConfigRestoreError, NuciBusyError, NuciUnavailableError
+from .memo import RpcMemo
+from .snapshots import SnapshotStore
+from .uci_file import UciFileReader
+from .watcher import ConfigWatcher
 from .modules import (
     maintain, network, password as password_module, registration, updater,
     stats, time as time_module, uci_raw, updater, user_notify
 )
 from .modules.base import Data, YinElement
+from .serializer import serialize_config
+from .transport import BASE_1_1, StdIOSession, UnixSocketSession
 from .utils import LocalizableTextValue
 
 logger = logging.getLogger("nuci.client")
 
 
+# states of the circuit breaker guarding the connection to Nuci
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half-open"
+
+
+# per-thread (i.e. per-request) context, holds the deadline for Nuci RPCs
+_request_context = threading.local()
+
+
+def set_deadline(seconds):
+    """Set deadline for all the following RPCs made in the current thread.
+
+    :param seconds: time budget in seconds, None to remove the deadline
+    :return: None
+    """
+    _request_context.deadline = time() + seconds if seconds is not None else None
+
+
+def get_remaining_time():
+    """Get time remaining until the deadline of the current thread.
+
+    :return: remaining time in seconds or None if no deadline is set
+    """
+    deadline = getattr(_request_context, "deadline", None)
+    return deadline - time() if deadline is not None else None
+
+
+def set_high_priority(high_priority):
+    """Set priority of RPCs made in the current thread when waiting for the session.
+
+    :param high_priority: True for high priority (e.g. writes, login)
+    :return: None
+    """
+    _request_context.high_priority = high_priority
+
+
+def is_high_priority():
+    return getattr(_request_context, "high_priority", False)
+
+
+def get_backend_status():
+    """Get status of the connection to Nuci (state of the circuit breaker).
+
+    :return: dict, see StaticNetconfConnection.get_circuit_status()
+    """
+    return StaticNetconfConnection.get_circuit_status()
+
+
+@contextmanager
+def deadline(seconds):
+    """Context manager setting the deadline for RPCs made inside the block,
+    the previous deadline is restored when the block is left.
+
+    :param seconds: time budget in seconds, None keeps the current deadline
+    """
+    if seconds is None:
+        yield
+        return
+    previous = getattr(_request_context, "deadline", None)
+    set_deadline(seconds)
+    try:
+        yield
+    finally:
+        _request_context.deadline = previous
+
+
+class SerializedEditConfig(operations.EditConfig):
+    """
+    edit-config RPC with the config already serialized to XML (see
+    foris.nuci.serializer), the message is composed without building
+    any ElementTree elements.
+    """
+    RPC_TEMPLATE = '<?xml version="1.0" encoding="UTF-8"?>' \
+        '<nc:rpc xmlns:nc="%s" message-id="%s">%s</nc:rpc>'
+    EDIT_CONFIG_TEMPLATE = '<nc:edit-config><nc:target><nc:%s/></nc:target>%s</nc:edit-config>'
+
+    def _wrap(self, subele):
+        return self.RPC_TEMPLATE % (YinElement.NS_URI, self._id, subele)
+
+    def request(self, config, target="running"):
+        """
+        :param config: serialized <config> element
+        :param target: name of the configuration datastore
+        """
+        return self._request(self.EDIT_CONFIG_TEMPLATE % (target, config))
+
+
 class StaticNetconfConnection(object):
     """
     Static connection to Netconf/Nuci, kept open during the whole run
@@ -44,6 +143,9 @@ class StaticNetconfConnection(object):
     """
     BIN_PATH = "/usr/bin/nuci"
 
+    # path to Unix socket of Nuci multiplexer, Nuci is spawned directly if not set
+    SOCKET_PATH = None
+
     # recycle session if older than MAXIMUM_SESSION_LIFE seconds
     MAXIMUM_SESSION_LIFE = 300
 
@@ -62,12 +164,46 @@ class StaticNetconfConnection(object):
     # flag for lock during command execution
     _executing = False
 
+    # maximum number of requests waiting for the session
+    MAX_QUEUE_DEPTH = 8
+    # maximum time (in seconds) a request waits for the session
+    MAX_QUEUE_WAIT = 10
+
+    # requests waiting for the session - heap of [priority, sequence number]
+    _queue = []
+    _queue_condition = threading.Condition()
+    _queue_sequence = itertools.count()
+    # moving average of time spent with the session locked, used for Retry-After
+    _average_duration = 1.0
+
     # when to restart the current persistent session
     session_kill_time = 0
 
+    # prepare spare session this many seconds before the current one is recycled
+    SPARE_SESSION_ADVANCE = 30
+
+    # fully connected session which replaces the current one when it's recycled
+    _spare_session = None
+    _spare_lock = threading.Lock()
+    _spare_timer = None
+
     # remaining connection retries counter
     remaining_connection_retries = MAXIMUM_CONNECTION_RETRIES
 
+    # number of consecutive RPC timeouts after which the circuit is opened
+    CIRCUIT_FAILURE_THRESHOLD = 3
+    # time (in seconds) the circuit stays open, doubled after every failed probe
+    CIRCUIT_INITIAL_BACKOFF = 2
+    CIRCUIT_MAX_BACKOFF = 120
+
+    # circuit breaker - while open, requests fail immediately without touching
+    # Nuci, after the backoff a single request is let through to probe it
+    _circuit_state = CIRCUIT_CLOSED
+    _circuit_failures = 0
+    _circuit_backoff = CIRCUIT_INITIAL_BACKOFF
+    _circuit_retry_time = 0
+    _circuit_open_count = 0
+
     __metaclass__ = OpExecutor
 
     def __new__(cls, *args):
@@ -83,45 +219,338 @@ class StaticNetconfConnection(object):
     def reset_connection_retries(cls):
         cls.remaining_connection_retries = cls.MAXIMUM_CONNECTION_RETRIES
 
+    @classmethod
+    def _create_session(cls):
+        if cls.SOCKET_PATH:
+            session = UnixSocketSession(Capabilities(CAPABILITIES))
+            session.connect(cls.SOCKET_PATH)
+        else:
+            session = StdIOSession(Capabilities(CAPABILITIES + [BASE_1_1]))
+            session.connect(shlex.split(cls.BIN_PATH))
+        return session
+
+    @classmethod
+    def _discard_spare_session(cls):
+        with cls._spare_lock:
+            if cls._spare_timer is not None:
+                cls._spare_timer.cancel()
+                cls._spare_timer = None
+            spare, cls._spare_session = cls._spare_session, None
+        if spare is not None:
+            cls._retire_session(spare)
+
+    @classmethod
+    def _schedule_spare_session(cls):
+        """Schedule preparation of a spare session shortly before the current
+        session is recycled."""
+        delay = max(cls.MAXIMUM_SESSION_LIFE - cls.SPARE_SESSION_ADVANCE, 0)
+        with cls._spare_lock:
+            if cls._spare_timer is not None:
+                cls._spare_timer.cancel()
+            cls._spare_timer = threading.Timer(delay, cls._prepare_spare_session)
+            cls._spare_timer.daemon = True
+            cls._spare_timer.start()
+
+    @classmethod
+    def _prepare_spare_session(cls):
+        """Connect a spare session in the background (runs in timer thread)."""
+        try:
+            session = cls._create_session()
+        except (IOError, OSError, TransportError):
+            logger.exception("Unable to prepare spare NETCONF session.")
+            return
+        with cls._spare_lock:
+            cls._spare_timer = None
+            if cls._spare_session is None:
+                cls._spare_session, session = session, None
+        if session is not None:
+            # another spare is ready already
+            cls._retire_session(session)
+        logger.debug("Spare NETCONF session prepared.")
+
+    @staticmethod
+    def _retire_session(session):
+        """Close the session in a background thread. No RPCs can be in flight
+        on the session at this point, except the ones already abandoned
+        after their timeout expired."""
+        def close():
+            try:
+                session.close()
+            except Exception:
+                logger.exception("Unable to close retired NETCONF session.")
+        thread = threading.Thread(target=close)
+        thread.daemon = True
+        thread.start()
+
+    @classmethod
+    def _started(cls):
+        cls.session_kill_time = time() + cls.MAXIMUM_SESSION_LIFE
+        cls._schedule_spare_session()
+
     @classmethod
     def _connect(cls):
+        cls._discard_spare_session()
         if cls._session is not None:
             cls._session.close()
-        session = transport.StdIOSession(Capabilities(CAPABILITIES))
-        session.connect(path=shlex.split(cls.BIN_PATH))
-        cls._session = session
+        cls._session = cls._create_session()
+        cls._started()
 
     @classmethod
-    def execute(cls, klass, *args, **kwargs):
-        while cls._executing:
-            sleep(0.1)
-        cls._executing = True
-        try:
-            if cls._session is None or time() > cls.session_kill_time:
-                cls._connect()
-                cls.session_kill_time = time() + cls.MAXIMUM_SESSION_LIFE
-            timeout = kwargs.pop("timeout", cls._timeout)
-            result = klass(cls._session,
-                           async=cls._async_mode,
-                           timeout=timeout,
-                           raise_mode=cls._raise_mode).request(*args, **kwargs)
-            # Everything OK, reset retries counter
-            cls.reset_connection_retries()
-        except (IOError, TransportError) as e:
-            if cls.remaining_connection_retries <= 0:
-                # Fail with an error...
-                logger.critical("Unable to revive the NETCONF server.")
-                # ... but make it possible to reconnect in the next call
-                cls.reset_connection_retries()
-                raise e
-            logger.exception("Connection to NETCONF failed, retrying.")
-            cls.remaining_connection_retries -= 1
-            cls._session = None
+    def _recycle(cls):
+        """Replace the current session by the spare session if it is ready,
+        otherwise reconnect."""
+        with cls._spare_lock:
+            spare, cls._spare_session = cls._spare_session, None
+        if spare is None or not spare.connected:
+            if spare is not None:
+                cls._retire_session(spare)
+            cls._connect()
+            return
+        old, cls._session = cls._session, spare
+        cls._started()
+        cls._retire_session(old)
+        logger.debug("NETCONF session replaced by the spare session.")
+
+    @classmethod
+    def _retry_after(cls):
+        return max(1, int(math.ceil(cls._average_duration * (len(cls._queue) + 1))))
+
+    @classmethod
+    def _acquire(cls, high_priority=False):
+        """
+        Wait for exclusive access to the session. Requests with high priority
+        (writes or see set_high_priority()) go first, requests of the same
+        priority are served in the order of arrival.
+
+        :param high_priority: request has high priority
+
+        :raises: NuciBusyError when the queue is full or the request waits
+                 longer than MAX_QUEUE_WAIT, TimeoutExpiredError when the
+                 deadline of the request passes
+        """
+        priority = 0 if high_priority or is_high_priority() else 1
+        with cls._queue_condition:
+            if not cls._executing and not cls._queue:
+                cls._executing = True
+                return
+            if len(cls._queue) >= cls.MAX_QUEUE_DEPTH:
+                raise NuciBusyError("Too many requests waiting for Nuci.", cls._retry_after())
+
+            entry = [priority, next(cls._queue_sequence)]
+            heapq.heappush(cls._queue, entry)
+            give_up_time = time() + cls.MAX_QUEUE_WAIT
+            try:
+                while cls._executing or cls._queue[0] is not entry:
+                    # don't wait for the session if the caller is not interested anymore
+                    remaining = cls._check_deadline()
+                    wait = give_up_time - time()
+                    if wait <= 0:
+                        raise NuciBusyError("Timeout while waiting for Nuci.", cls._retry_after())
+                    if remaining is not None:
+                        wait = min(wait, remaining)
+                    cls._queue_condition.wait(wait)
+            except Exception:
+                cls._queue.remove(entry)
+                heapq.heapify(cls._queue)
+                cls._queue_condition.notify_all()
+                raise
+            heapq.heappop(cls._queue)
+            cls._executing = True
+
+    @classmethod
+    def _release(cls, duration):
+        with cls._queue_condition:
             cls._executing = False
-            return cls.execute(klass, *args, **kwargs)
+            cls._average_duration = 0.8 * cls._average_duration + 0.2 * duration
+            cls._queue_condition.notify_all()
+
+    @classmethod
+    def _check_circuit(cls):
+        """Fail fast if the circuit is open.
+
+        :return: True if the request should probe whether Nuci works again
+        :raises: NuciUnavailableError if the circuit is open
+        """
+        if cls._circuit_state == CIRCUIT_CLOSED:
+            return False
+        remaining = cls._circuit_retry_time - time()
+        if remaining > 0:
+            raise NuciUnavailableError("Nuci is not available.", int(math.ceil(remaining)))
+        return True
+
+    @classmethod
+    def _open_circuit(cls, backoff):
+        cls._circuit_state = CIRCUIT_OPEN
+        cls._circuit_backoff = backoff
+        cls._circuit_retry_time = time() + backoff
+        cls._circuit_open_count += 1
+        logger.error("Nuci is not responding, circuit opened for %d seconds.", backoff)
+        # the session is probably broken, the probe starts a new one
+        if cls._session is not None:
+            cls._retire_session(cls._session)
+            cls._session = None
+
+    @classmethod
+    def _record_success(cls):
+        if cls._circuit_state != CIRCUIT_CLOSED:
+            logger.info("Nuci is responding again, circuit closed.")
+        cls._circuit_state = CIRCUIT_CLOSED
+        cls._circuit_failures = 0
+        cls._circuit_backoff = cls.CIRCUIT_INITIAL_BACKOFF
+
+    @classmethod
+    def _record_failure(cls, fatal=False):
+        """Record failed request and open the circuit if needed.
+
+        :param fatal: Nuci couldn't be reached at all (open the circuit immediately)
+        """
+        cls._circuit_failures += 1
+        if cls._circuit_state == CIRCUIT_HALF_OPEN:
+            cls._open_circuit(min(cls._circuit_backoff * 2, cls.CIRCUIT_MAX_BACKOFF))
+        elif fatal or cls._circuit_failures >= cls.CIRCUIT_FAILURE_THRESHOLD:
+            cls._open_circuit(cls.CIRCUIT_INITIAL_BACKOFF)
+
+    @classmethod
+    def get_circuit_status(cls):
+        """Get state of the circuit breaker.
+
+        :return: dict with state, number of consecutive failures, seconds until
+                 the next probe (None if the circuit is closed) and number
+                 of times the circuit has been opened
+        """
+        state = cls._circuit_state
+        retry_after = None
+        if state != CIRCUIT_CLOSED:
+            retry_after = max(0, int(math.ceil(cls._circuit_retry_time - time())))
+        return dict(state=state, failures=cls._circuit_failures, retry_after=retry_after,
+                    open_count=cls._circuit_open_count)
+
+    @classmethod
+    def _run(cls, request, high_priority=False):
+        """
+        Run a request with exclusive access to the session. Reconnects to Nuci
+        if the session is too old or if the connection fails.
+
+        :param request: function taking the session as its only argument
+        :param high_priority: request has high priority when waiting for the session
+        :return: result of the request function
+        :raises: NuciUnavailableError if Nuci has been failing recently
+        """
+        # don't even wait in the queue if the circuit is open
+        cls._check_circuit()
+        cls._acquire(high_priority)
+        started = time()
+        try:
+            # the circuit might have been opened while waiting for the session
+            if cls._check_circuit():
+                logger.debug("Probing whether Nuci is available again.")
+                cls._circuit_state = CIRCUIT_HALF_OPEN
+                # single attempt only, reconnection retries are not worth it
+                cls.remaining_connection_retries = 0
+            while True:
+                try:
+                    if cls._session is None:
+                        cls._connect()
+                    elif time() > cls.session_kill_time:
+                        cls._recycle()
+                    result = request(cls._session)
+                    # Everything OK, reset retries counter
+                    cls.reset_connection_retries()
+                    cls._record_success()
+                    return result
+                except RPCError:
+                    # Nuci replied, it's alive
+                    cls._record_success()
+                    raise
+                except TimeoutExpiredError:
+                    remaining = get_remaining_time()
+                    # timeouts caused by the deadline of the request are not Nuci's fault
+                    if remaining is None or remaining > 0:
+                        cls._record_failure()
+                    elif cls._circuit_state == CIRCUIT_HALF_OPEN:
+                        # the probe didn't tell anything, let the next request try
+                        cls._circuit_state = CIRCUIT_OPEN
+                    raise
+                except (IOError, TransportError):
+                    if cls.remaining_connection_retries <= 0:
+                        # Fail with an error...
+                        logger.critical("Unable to revive the NETCONF server.")
+                        # ... and stop trying for a while
+                        cls.reset_connection_retries()
+                        cls._record_failure(fatal=True)
+                        raise
+                    logger.exception("Connection to NETCONF failed, retrying.")
+                    cls.remaining_connection_retries -= 1
+                    cls._session = None
         finally:
-            cls._executing = False
-        return result
+            cls._release(time() - started)
+
+    @staticmethod
+    def _check_deadline():
+        remaining = get_remaining_time()
+        if remaining is not None and remaining <= 0:
+            raise TimeoutExpiredError("Deadline of the request has passed.")
+        return remaining
+
+    @classmethod
+    def _get_timeout(cls, timeout):
+        """Limit RPC timeout by the time remaining until the deadline."""
+        remaining = cls._check_deadline()
+        return timeout if remaining is None else min(timeout, remaining)
+
+    @classmethod
+    def execute(cls, klass, *args, **kwargs):
+        timeout = kwargs.pop("timeout", cls._timeout)
+
+        def request(session):
+            return klass(session,
+                         async=cls._async_mode,
+                         timeout=cls._get_timeout(timeout),
+                         raise_mode=cls._raise_mode).request(*args, **kwargs)
+
+        return cls._run(request, high_priority=issubclass(klass, operations.EditConfig))
+
+    @classmethod
+    def _wait_for_reply(cls, rpc, deadline):
+        rpc.event.wait(max(deadline - time(), 0))
+        if not rpc.event.is_set():
+            raise TimeoutExpiredError("Reply for RPC %s not received in time." % rpc.id)
+        if rpc.error:
+            # error that prevented the reply delivery
+            raise rpc.error
+        reply = rpc.reply
+        reply.parse()
+        if reply.error is not None:
+            if cls._raise_mode == operations.RaiseMode.ALL or \
+                    cls._raise_mode == operations.RaiseMode.ERRORS and reply.error.type == "error":
+                raise reply.error
+        return reply
+
+    @classmethod
+    def execute_many(cls, requests, timeout=None):
+        """
+        Execute multiple RPCs pipelined on the session - all the RPCs are sent
+        at once and then the replies are collected (they are matched to the
+        requests by message-id).
+
+        :param requests: list of tuples (operation class, args, kwargs)
+        :param timeout: timeout for receiving all the replies
+        :return: list of replies in the order of requests
+        """
+        timeout = timeout or cls._timeout
+
+        def request(session):
+            rpc_timeout = cls._get_timeout(timeout)
+            rpcs = []
+            for klass, args, kwargs in requests:
+                rpc = klass(session, async=True, timeout=rpc_timeout, raise_mode=cls._raise_mode)
+                rpc.request(*args, **kwargs)
+                rpcs.append(rpc)
+            replies_deadline = time() + rpc_timeout
+            return [cls._wait_for_reply(pending, replies_deadline) for pending in rpcs]
+
+        high_priority = any(issubclass(klass, operations.EditConfig) for klass, _, _ in requests)
+        return cls._run(request, high_priority=high_priority)
 
     @classmethod
     def set_bin_path(cls, path):
@@ -136,6 +565,19 @@ class StaticNetconfConnection(object):
             # reconnect to new binary
             cls._connect()
 
+    @classmethod
+    def set_socket_path(cls, path):
+        """
+        Connect to Nuci multiplexer listening on a Unix socket instead
+        of spawning own Nuci process.
+
+        :param path: path to the socket of Nuci multiplexer
+        :return: None
+        """
+        cls.SOCKET_PATH = path
+        if cls._session:
+            cls._connect()
+
     @classmethod
     def enable_test_environment(cls, path):
         """
@@ -153,13 +595,59 @@ class StaticNetconfConnection(object):
 # open persistent connection to Nuci
 netconf = StaticNetconfConnection()
 
+# results of RPCs (and gets with subtree filters) that change rarely
+rpc_memo = RpcMemo({
+    registration.Serial.qual_tag("serial"): RpcMemo.FOREVER,
+    registration.RegNum.qual_tag("get"): 3600,
+    registration.RegistrationStatus.qual_tag("get-status"): 300,
+    # mostly static info about the device, only short-living to merge concurrent requests
+    stats.Stats.qual_tag("stats"): 10,
+    # always refreshed, kept only for read-only pages when Nuci is too slow to respond
+    user_notify.Messages.qual_tag(user_notify.Messages.tag): 0,
+    updater.Updater.qual_tag(updater.Updater.tag): 0,
+}, stale_policies={
+    stats.Stats.qual_tag("stats"): 600,
+    user_notify.Messages.qual_tag(user_notify.Messages.tag): 600,
+    updater.Updater.qual_tag(updater.Updater.tag): 600,
+})
+
+# snapshots of the Uci config (see foris.nuci.snapshots)
+config_snapshots = SnapshotStore()
+
+# reading of Uci configs directly from files, disabled by default
+uci_files = UciFileReader()
+
+# notifications about config changes made outside of Foris, not started by default
+config_watcher = ConfigWatcher()
+
+# memoized results depending on Uci configs
+CONFIG_MEMO_TAGS = {
+    "updater": [updater.Updater.qual_tag(updater.Updater.tag)],
+}
+
+
+def _invalidate_memo(config):
+    """Forget memoized results depending on the changed config.
+
+    :param config: name of the config, None means all configs
+    """
+    if config is None:
+        for tags in CONFIG_MEMO_TAGS.values():
+            for tag in tags:
+                rpc_memo.invalidate(tag)
+    else:
+        for tag in CONFIG_MEMO_TAGS.get(config, ()):
+            rpc_memo.invalidate(tag)
+
+
+config_watcher.subscribe(_invalidate_memo)
 
-def get(filter=None):
-    data = netconf.get(filter=("subtree", filter) if filter is not None else None).data_ele
+
+def _parse_data(data):
     reply_data = Data()
     for elem in data.iter():
         if elem.tag == uci_raw.Uci.qual_tag("uci"):
-            reply_data.add(uci_raw.Uci.from_element(elem))
+            reply_data.add(uci_raw.Uci.from_element(elem, lazy=True))
         elif elem.tag == time_module.Time.qual_tag("time"):
             reply_data.add(time_module.Time.from_element(elem))
         elif elem.tag == updater.Updater.qual_tag("updater"):
@@ -171,6 +659,72 @@ def get(filter=None):
     return reply_data
 
 
+def _subtree(filter):
+    return ("subtree", filter) if filter is not None else None
+
+
+def _get_data(filter):
+    return netconf.get(filter=_subtree(filter)).data_ele
+
+
+def get(filter=None, refresh=False, allow_stale=False):
+    """Execute netconf get.
+
+    :param filter: subtree filter (None means no filter)
+    :param refresh: don't use memoized data (see rpc_memo)
+    :param allow_stale: accept outdated memoized data (for read-only pages),
+                        fresh data are obtained in background
+    :return: Data instance
+    """
+    data = uci_files.get(filter)
+    if data is not None:
+        return data
+    data = rpc_memo.call("get", filter, lambda: _get_data(filter),
+                         refresh=refresh, allow_stale=allow_stale)
+    return _parse_data(data)
+
+
+def get_many(filters, allow_stale=False):
+    """Execute multiple netconf get requests in a single pipelined round trip.
+
+    :param filters: list of subtree filters (None means no filter)
+    :param allow_stale: accept outdated memoized data (for read-only pages),
+                        fresh data are obtained in background
+    :return: list of Data instances in the order of filters
+    """
+    # Uci configs read from files (if enabled) don't need any RPC
+    decoded = [uci_files.get(filter) for filter in filters]
+    results = [
+        rpc_memo.lookup("get", filter,
+                        revalidate=(lambda filter=filter: _get_data(filter)) if allow_stale else None)
+        for filter, data in zip(filters, decoded) if data is None
+    ]
+    pending = [i for i, data in enumerate(decoded) if data is None]
+    missing = [i for i, result in zip(pending, results) if result is None]
+    if missing:
+        replies = netconf.execute_many(
+            [(operations.Get, (), dict(filter=_subtree(filters[i]))) for i in missing]
+        )
+        for i, reply in zip(missing, replies):
+            rpc_memo.store("get", filters[i], reply.data_ele)
+            decoded[i] = _parse_data(reply.data_ele)
+    for i, result in zip(pending, results):
+        if result is not None:
+            decoded[i] = _parse_data(result)
+    return decoded
+
+
+def _dispatch_memoized(rpc, refresh=False):
+    """Dispatch RPC, the result may be memoized (see rpc_memo).
+
+    :param rpc: RPC element
+    :param refresh: don't use memoized result
+    :return: reply data as an XML element
+    """
+    return rpc_memo.call("dispatch", rpc, lambda: ET.fromstring(dispatch(rpc).xml),
+                         refresh=refresh)
+
+
 def reboot():
     try:
         dispatch(maintain.Maintain.rpc_reboot())
@@ -214,33 +768,42 @@ def save_config_backup(filename):
 
 def get_registration():
     try:
-        data = dispatch(registration.RegNum.rpc_get())
-        return registration.RegNum.from_element(ET.fromstring(data.xml))
+        data = _dispatch_memoized(registration.RegNum.rpc_get())
+        return registration.RegNum.from_element(data)
     except (RPCError, TimeoutExpiredError):
         return None
 
 
 def get_serial():
     try:
-        data = dispatch(registration.Serial.rpc_serial())
-        return registration.Serial.from_element(ET.fromstring(data.xml))
+        data = _dispatch_memoized(registration.Serial.rpc_serial())
+        return registration.Serial.from_element(data)
     except (RPCError, TimeoutExpiredError):
         return None
 
 
-def get_registration_status(email, lang=None):
+def get_registration_status(email, lang=None, refresh=False):
+    """Get status of the registration.
+
+    :param email: email used for the registration
+    :param lang: language of the registration page
+    :param refresh: don't use a recent result (e.g. when user asks for a recheck)
+    :return: tuple (success, RegistrationStatus or error message)
+    """
     try:
-        data = dispatch(registration.RegistrationStatus.rpc_get_status(email, lang))
-        return True, registration.RegistrationStatus.from_element(ET.fromstring(data.xml))
+        data = _dispatch_memoized(registration.RegistrationStatus.rpc_get_status(email, lang),
+                                  refresh=refresh)
+        return True, registration.RegistrationStatus.from_element(data)
     except RPCError, e:
         return False, e.message
     except TimeoutExpiredError:
         return False, "Timed out."
 
 
-def get_messages():
+def get_messages(allow_stale=False):
     try:
-        return get(filter=filters.messages).find_child("messages") or user_notify.Messages()
+        return get(filter=filters.messages, allow_stale=allow_stale).find_child("messages") \
+            or user_notify.Messages()
     except (RPCError, TimeoutExpiredError):
         from foris.core import ugettext as _
         logger.exception("Unable to fetch messages")
@@ -259,6 +822,7 @@ def dismiss_notifications(message_ids):
         logger.debug(message_ids)
         logger.debug(ET.tostring(user_notify.UserNotify.rpc_display(message_ids)))
         dispatch(user_notify.UserNotify.rpc_display(message_ids))
+        rpc_memo.invalidate(filters.messages.tag)
         return True
     except (RPCError, TimeoutExpiredError):
         return False
@@ -324,6 +888,7 @@ def deny_approval(approval_id):
     """
     try:
         dispatch(updater.Updater.rpc_deny(approval_id))
+        rpc_memo.invalidate(filters.updater.tag)
         return True
     except (RPCError, TimeoutExpiredError):
         return False
@@ -337,6 +902,7 @@ def approve_approval(approval_id):
     """
     try:
         dispatch(updater.Updater.rpc_grant(approval_id))
+        rpc_memo.invalidate(filters.updater.tag)
         return True
     except (RPCError, TimeoutExpiredError):
         return False
@@ -371,6 +937,7 @@ def check_updates():
     element = ET.Element(check_tag)
     try:
         dispatch(element)
+        rpc_memo.invalidate(filters.updater.tag)
         return True
     except (RPCError, TimeoutExpiredError):
         return False
@@ -397,10 +964,41 @@ def get_updater_status():
 def get_uci_config():
     data = netconf.get_config("running").data_ele
     reply_data = Data()
-    reply_data.add(uci_raw.Uci.from_element(data.find(uci_raw.Uci.qual_tag("uci"))))
+    reply_data.add(uci_raw.Uci.from_element(data.find(uci_raw.Uci.qual_tag("uci")), lazy=True))
     return reply_data
 
 
+def take_config_snapshot(description=None):
+    """Take snapshot of the whole Uci config.
+
+    :param description: description of the snapshot
+    :return: Snapshot
+    """
+    uci = get_uci_config().find_child("uci")
+    return config_snapshots.take(uci, description=description)
+
+
+def rollback_config(snapshot_id, description=None):
+    """Revert the Uci config to the snapshot. Only the differences between
+    the current config and the snapshot are sent to Nuci.
+
+    :param snapshot_id: identifier of the snapshot
+    :param description: if set, snapshot of the current config with this
+                        description is taken first, so the rollback can be reverted
+    :return: names of the changed configs
+    :raises: KeyError if there's no such snapshot
+    """
+    snapshot = config_snapshots.get(snapshot_id)
+    current = get_uci_config().find_child("uci")
+    update = config_snapshots.rollback_update(snapshot, current)
+    if update is None:
+        return []
+    if description is not None:
+        config_snapshots.take(current, description=description)
+    edit_config(update)
+    return [config.name for config in update.children]
+
+
 def edit_uci_config(uci):
     """Create proper Uci config for given Uci element and save it.
 
@@ -415,20 +1013,34 @@ def edit_uci_config(uci):
 def edit_config(config):
     """Execute netconf edit-config.
 
-    :param config: config to edit as an XML Element
+    :param config: config to edit as a YinElement (serialized directly to XML)
+                   or an XML Element
     :return:
     """
+    if isinstance(config, YinElement):
+        return netconf.execute(SerializedEditConfig, serialize_config([config]))
     config_root = ET.Element(YinElement.qual_tag("config"))
     config_root.append(config)
     return netconf.edit_config("running", config=config_root)
 
 
 def edit_config_multiple(configs):
+    """Execute netconf edit-config for every config.
+
+    :param configs: configs to edit (see edit_config)
+    """
     for config in configs:
-        config_root = ET.Element(YinElement.qual_tag("config"))
-        config_root.append(config)
-        netconf.edit_config("running", config=config_root)
+        edit_config(config)
 
 
 def dispatch(*args, **kwargs):
     return netconf.dispatch(*args, **kwargs)
+
+
+def dispatch_many(rpcs):
+    """Dispatch multiple RPCs in a single pipelined round trip.
+
+    :param rpcs: list of RPC elements
+    :return: list of replies in the order of rpcs
+    """
+    return netconf.execute_many([(operations.Dispatch, (rpc,), {}) for rpc in rpcs])
@@ -16,8 +16,9 @@
 
 import logging
 import client
+from diff import strip_unchanged
 
-__all__ = ['add_config_update', 'commit']
+__all__ = ['add_config_update', 'commit', 'take_updates']
 
 logger = logging.getLogger("nuci.configurator")
 
@@ -39,9 +40,33 @@ def clean_updates():
     config_updates = []
 
 
-def commit():
+def take_updates():
+    """Remove all the config updates without sending them to Nuci.
+
+    :return: list of removed updates
+    """
+    updates = config_updates
+    clean_updates()
+    return updates
+
+
+def commit(current=None):
+    """Send all the config updates to Nuci.
+
+    :param current: current configuration (Data or Uci) - if set, parts of
+                    the updates which wouldn't change anything are not sent
+                    and no RPC is made if nothing is left
+    :return: None
+    """
     logger.debug("Commiting changes (%s config updates).", len(config_updates))
     try:
-        client.edit_config_multiple([cu.get_xml() for cu in config_updates])
+        updates = config_updates
+        if current is not None:
+            updates = [strip_unchanged(cu, current) for cu in updates]
+            updates = [cu for cu in updates if cu is not None]
+            if not updates:
+                logger.debug("No changes to commit.")
+                return
+        client.edit_config_multiple(updates)
     finally:
         clean_updates()
\ No newline at end of file
@@ -0,0 +1,96 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2017 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Comparison of Uci updates with the current configuration, so only the
+changed parts are sent to Nuci (which restarts services of every config
+touched by edit-config).
+
+Nodes which are not present in the current configuration are always kept -
+the current data might have been obtained using a narrower filter, so their
+absence doesn't prove anything.
+"""
+
+import logging
+
+from .modules.uci_raw import Uci, Section, Option, List
+
+
+logger = logging.getLogger("nuci.diff")
+
+
+def _list_values(list_):
+    return [value.content for value in list_.children]
+
+
+def _is_unchanged(node, current):
+    """Check whether node matches the current node, children excluded."""
+    if type(node) is not type(current):
+        return False
+    if isinstance(node, Option):
+        return node.value == current.value
+    if isinstance(node, List):
+        return _list_values(node) == _list_values(current)
+    if isinstance(node, Section):
+        return node.type is None or node.type == current.type
+    return True
+
+
+def _strip(node, current):
+    """Remove unchanged children of the node.
+
+    :return: True if the node itself can be dropped
+    """
+    if current is None or node.operation not in (None, "replace"):
+        # unknown or removed node - keep as it is
+        return False
+    if isinstance(node, (Option, List)):
+        # replacing option/list by the same value doesn't change anything
+        return _is_unchanged(node, current)
+    if node.operation is not None or type(node) is not type(current):
+        # replaced section might remove options which are not in the update
+        return False
+
+    current_children = {}
+    for child in current.children:
+        current_children.setdefault(child.key, child)
+    for child in list(node.children):
+        if _strip(child, current_children.get(child.key)):
+            node.remove(child)
+    # nothing changed inside the existing node
+    return not node.children and _is_unchanged(node, current)
+
+
+def strip_unchanged(update, current):
+    """Remove options, lists, sections and configs that wouldn't be changed
+    by the update. The update is modified in place.
+
+    :param update: Uci tree to be sent in edit-config
+    :type update: Uci
+    :param current: current data containing Uci tree
+    :type current: foris.nuci.modules.base.Data or Uci
+    :return: stripped update or None if nothing would be changed
+    """
+    if type(update) is not Uci:
+        # only whole Uci trees are compared
+        return update
+    current_uci = current if type(current) is Uci else current.find_child("uci")
+    if current_uci is None:
+        return update
+    if _strip(update, current_uci):
+        logger.debug("Update doesn't change anything.")
+        return None
+    return update
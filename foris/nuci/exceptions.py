@@ -9,4 +9,30 @@ class ConfigRestoreError(NuciError):
     """
     Raised when config-restore RPC command fails.
     """
-    pass
\ No newline at end of file
+    pass
+
+
+class NuciBusyError(NuciError):
+    """
+    Raised when too many requests are waiting for Nuci.
+    """
+    def __init__(self, message, retry_after):
+        """
+        :param message: error message
+        :param retry_after: estimated time (in seconds) after which the request may succeed
+        """
+        super(NuciBusyError, self).__init__(message)
+        self.retry_after = retry_after
+
+
+class NuciUnavailableError(NuciError):
+    """
+    Raised without contacting Nuci when it has been failing recently.
+    """
+    def __init__(self, message, retry_after):
+        """
+        :param message: error message
+        :param retry_after: time (in seconds) until the next attempt to contact Nuci
+        """
+        super(NuciUnavailableError, self).__init__(message)
+        self.retry_after = retry_after
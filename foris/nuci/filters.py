@@ -77,4 +77,14 @@ def wifi_filter():
     return uci.get_xml()
 
 
+def create_uci_names_filter():
+    """Create filter that selects only the names of all the Uci configs."""
+    uci_et = ET.Element(uci_raw.Uci.qual_tag(uci_raw.Uci.tag))
+    config_et = ET.SubElement(uci_et, uci_raw.Uci.qual_tag("config"))
+    # empty leaf is a selection node - only names are returned
+    ET.SubElement(config_et, uci_raw.Uci.qual_tag("name"))
+    return uci_et
+
+
 foris_config = create_config_filter("foris")
+uci_config_names = create_uci_names_filter()
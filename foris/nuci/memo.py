@@ -0,0 +1,259 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2017 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Memoization of results of Nuci RPCs which change rarely (or never).
+
+Results are stored as raw XML elements, so every caller decodes its own
+copy of the data and can't affect other callers by modifying it.
+
+Read-only pages may accept outdated results (stale-while-revalidate) - fresh
+results are awaited only for a short time, if Nuci is too slow to provide them,
+outdated ones are returned while a background thread keeps obtaining fresh
+ones. Whether outdated data was served during the current request can be
+checked using served_stale().
+"""
+
+import logging
+import threading
+from time import time
+from xml.etree import cElementTree as ET
+
+
+logger = logging.getLogger("nuci.memo")
+
+
+# per-thread (i.e. per-request) flag - whether outdated result has been served
+_request_context = threading.local()
+
+
+def served_stale():
+    """Check whether outdated results have been served in the current thread.
+
+    :return: True if any outdated result has been served
+    """
+    return getattr(_request_context, "served_stale", False)
+
+
+def reset_served_stale():
+    _request_context.served_stale = False
+
+
+class _Call(object):
+    """RPC call in progress, other callers of the same RPC wait for its result."""
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RpcMemo(object):
+    """
+    Memoizes results of RPCs according to TTL policies declared for
+    tags of the RPC elements (or subtree filters).
+
+    Concurrent identical calls are merged into a single RPC.
+    """
+    # TTL of results that never change
+    FOREVER = None
+
+    def __init__(self, policies, stale_policies=None, stale_wait=1.0):
+        """
+        :param policies: dict qualified tag -> TTL in seconds (or FOREVER),
+                         RPCs with other tags are not memoized
+        :param stale_policies: dict qualified tag -> for how long (in seconds)
+                               after expiration the result can be served
+                               to callers that allow outdated results
+        :param stale_wait: how long (in seconds) to wait for a fresh result before
+                           an outdated one is returned to such callers
+        """
+        self.policies = policies
+        self.stale_policies = stale_policies or {}
+        self.stale_wait = stale_wait
+        self._results = {}
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def is_memoized(self, element):
+        return element is not None and element.tag in self.policies
+
+    @staticmethod
+    def _key(kind, element):
+        return kind, element.tag, ET.tostring(element)
+
+    def _lookup(self, key, tag, allow_stale=False):
+        """Find memoized result.
+
+        :return: tuple (result, whether it's outdated), result is None if not found
+        """
+        record = self._results.get(key)
+        if record is None:
+            return None, False
+        stored, result = record
+        ttl = self.policies[tag]
+        if ttl is self.FOREVER:
+            return result, False
+        age = time() - stored
+        if age <= ttl:
+            return result, False
+        max_stale = self.stale_policies.get(tag, 0)
+        if age > ttl + max_stale:
+            del self._results[key]
+            return None, False
+        if allow_stale:
+            return result, True
+        return None, False
+
+    def _start_revalidation(self, key, func):
+        """Start obtaining fresh result in background (if not running already).
+
+        Must be called with the lock held.
+
+        :return: _Call of the revalidation
+        """
+        call = self._calls.get(key)
+        if call is not None:
+            return call
+        call = self._calls[key] = _Call()
+        thread = threading.Thread(target=self._revalidate, args=(key, call, func))
+        thread.daemon = True
+        thread.start()
+        return call
+
+    def _await_fresh(self, call, stale_result, tag):
+        """Wait for a short time for the fresh result, use the outdated one if
+        Nuci doesn't provide it in time (or fails).
+
+        :return: fresh or outdated result
+        """
+        if call.event.wait(self.stale_wait) and call.error is None and call.result is not None:
+            return call.result
+        _request_context.served_stale = True
+        logger.debug("Outdated result of %s used.", tag)
+        return stale_result
+
+    def _revalidate(self, key, call, func):
+        try:
+            self._execute(key, call, func)
+        except Exception:
+            logger.exception("Unable to revalidate memoized result.")
+
+    def _execute(self, key, call, func):
+        """Obtain the result as the owner of the call, waiting callers get it too."""
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.error is None and call.result is not None:
+                    self._results[key] = (time(), call.result)
+            call.event.set()
+        return call.result
+
+    def lookup(self, kind, element, refresh=False, revalidate=None):
+        """Get memoized result.
+
+        :param kind: kind of the RPC (e.g. "get" or "dispatch")
+        :param element: RPC element or subtree filter
+        :param refresh: ignore the memoized result
+        :param revalidate: function without arguments obtaining the result, if
+                           set and the memoized result is outdated, this function
+                           is called in background to obtain a fresh one, the
+                           outdated result is returned if it takes too long
+        :return: memoized result or None
+        """
+        if refresh or not self.is_memoized(element):
+            return None
+        key = self._key(kind, element)
+        with self._lock:
+            result, stale = self._lookup(key, element.tag, allow_stale=revalidate is not None)
+            if not stale:
+                return result
+            call = self._start_revalidation(key, revalidate)
+        return self._await_fresh(call, result, element.tag)
+
+    def store(self, kind, element, result):
+        """Memoize the result of an RPC.
+
+        :param kind: kind of the RPC (e.g. "get" or "dispatch")
+        :param element: RPC element or subtree filter
+        :param result: result to store
+        """
+        if self.is_memoized(element):
+            with self._lock:
+                self._results[self._key(kind, element)] = (time(), result)
+
+    def call(self, kind, element, func, refresh=False, allow_stale=False):
+        """Get memoized result or call the function to obtain it.
+
+        If the same call is already in progress, its result is awaited
+        instead of making another RPC (even if refresh is requested -
+        such result is fresh enough).
+
+        :param kind: kind of the RPC (e.g. "get" or "dispatch")
+        :param element: RPC element or subtree filter
+        :param func: function without arguments obtaining the result
+        :param refresh: don't use memoized result (e.g. when user asks for a recheck)
+        :param allow_stale: return outdated result (if available) when a fresh one
+                            can't be obtained within stale_wait, it's obtained
+                            in background then
+        :return: result
+        """
+        if not self.is_memoized(element):
+            return func()
+
+        key = self._key(kind, element)
+        stale_call = None
+        with self._lock:
+            if not refresh:
+                result, stale = self._lookup(key, element.tag, allow_stale)
+                if stale:
+                    stale_call = self._start_revalidation(key, func)
+                elif result is not None:
+                    logger.debug("Memoized result of %s used.", element.tag)
+                    return result
+            if stale_call is None:
+                call = self._calls.get(key)
+                owner = call is None
+                if owner:
+                    call = self._calls[key] = _Call()
+
+        if stale_call is not None:
+            return self._await_fresh(stale_call, result, element.tag)
+
+        if not owner:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        return self._execute(key, call, func)
+
+    def invalidate(self, tag=None):
+        """Forget memoized results.
+
+        :param tag: forget results for this tag only, all of them if None
+        """
+        with self._lock:
+            if tag is None:
+                self._results = {}
+            else:
+                self._results = {
+                    key: value for key, value in self._results.iteritems() if key[1] != tag
+                }
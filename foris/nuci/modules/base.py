@@ -20,6 +20,116 @@ from xml.etree import cElementTree as ET
 
 anon_path = re.compile(r"@(?P<name>[\w\-]+)\[(?P<pos>\-?\d+)]")
 
+# kinds of path steps
+STEP_KEY = 0
+STEP_ANONYMOUS = 1
+STEP_ANY = 2
+
+# maximum number of compiled paths kept (paths may come from user input)
+MAX_COMPILED_PATHS = 1024
+_compiled_paths = {}
+
+
+def compile_path(path):
+    """Parse dotted path to a node (e.g. "uci.firewall.@rule[0].name").
+
+    Path elements can be keys of the nodes, Uci-style indices of anonymous
+    sections (@type[index], negative indices count from the end) or
+    wildcard "*" matching any node. Compiled paths are cached.
+
+    :param path: dotted path
+    :return: tuple of steps
+    :raises: ValueError if the path is invalid
+    """
+    steps = _compiled_paths.get(path)
+    if steps is not None:
+        return steps
+    steps = []
+    for key in path.split("."):
+        if key == "*":
+            steps.append((STEP_ANY, ))
+        elif key.startswith("@"):
+            match = anon_path.match(key)
+            if not match or match.end() != len(key):
+                raise ValueError("Invalid path element '%s'." % key)
+            steps.append((STEP_ANONYMOUS, match.group("name"), int(match.group("pos"))))
+        elif key:
+            steps.append((STEP_KEY, key))
+        else:
+            raise ValueError("Empty element in path '%s'." % path)
+    steps = tuple(steps)
+    if len(_compiled_paths) >= MAX_COMPILED_PATHS:
+        _compiled_paths.clear()
+    _compiled_paths[path] = steps
+    return steps
+
+
+class _ChildrenIndex(object):
+    """Children of a node indexed by key and by section type, built on demand."""
+    def __init__(self, children):
+        self.children = children
+        self._by_key = None
+        self._by_type = None
+
+    def match(self, step):
+        kind = step[0]
+        if kind == STEP_KEY:
+            if self._by_key is None:
+                self._by_key = {}
+                for child in self.children:
+                    self._by_key.setdefault(child.key, child)
+            child = self._by_key.get(step[1])
+            return [child] if child is not None else []
+        if kind == STEP_ANONYMOUS:
+            if self._by_type is None:
+                self._by_type = {}
+                for child in self.children:
+                    self._by_type.setdefault(getattr(child, "type", None), []).append(child)
+            try:
+                return [self._by_type.get(step[1], [])[step[2]]]
+            except IndexError:
+                return []
+        return self.children
+
+
+def _match(children, step):
+    kind = step[0]
+    if kind == STEP_KEY:
+        for child in children:
+            if child.key == step[1]:
+                return [child]
+        return []
+    if kind == STEP_ANONYMOUS:
+        sections = [child for child in children if getattr(child, "type", None) == step[1]]
+        try:
+            return [sections[step[2]]]
+        except IndexError:
+            return []
+    return children
+
+
+def _select(where, steps):
+    """Find the first node matching compiled path (depth-first, in document order)."""
+    if not steps:
+        return where
+    for child in _match(where.children, steps[0]):
+        found = _select(child, steps[1:])
+        if found is not None:
+            return found
+    return None
+
+
+def _extract(where, trie, results):
+    for path in trie.get(None, ()):
+        results.setdefault(path, where)
+    steps = [step for step in trie if step is not None]
+    if not steps:
+        return
+    index = _ChildrenIndex(where.children)
+    for step in steps:
+        for child in index.match(step):
+            _extract(child, trie[step], results)
+
 
 class YinElement(object):
     tag = ""
@@ -27,10 +137,44 @@ class YinElement(object):
     final = False  # final node can't have children
 
     def __init__(self):
-        self.children = []
+        self._children = []
+        # XML element with children which haven't been converted yet (see set_lazy_element)
+        self._lazy_element = None
         self.parent = None
         self.operation = None
 
+    @property
+    def children(self):
+        if self._lazy_element is not None:
+            element, self._lazy_element = self._lazy_element, None
+            self._materialize(element)
+        return self._children
+
+    @children.setter
+    def children(self, children):
+        self._lazy_element = None
+        self._children = children
+
+    def set_lazy_element(self, element):
+        """Convert children from the XML element only when they are accessed.
+
+        :param element: ElementTree Element this node has been created from
+        """
+        self._lazy_element = element
+
+    def _materialize(self, element):
+        """Create children from XML element of lazily decoded node.
+
+        :param element: ElementTree Element this node has been created from
+        """
+        raise NotImplementedError()
+
+    def _append_parsed(self, child):
+        """Add child decoded from XML - unlike add(), it doesn't check for duplicates."""
+        child.parent = self
+        self._children.append(child)
+        return child
+
     def __iter__(self):
         return iter(self.children)
 
@@ -79,39 +223,50 @@ class YinElement(object):
         child.parent = None
 
     def find_child(self, path, where=None):
-        """Find child according to path, supports Uci-style indexing for sections.
+        """Find child according to path, supports Uci-style indexing for sections
+        and wildcards (see compile_path).
 
         :param path: path to the node
         :param where: where to start the search
         :type where: YinElement
         :return: YinElement
         """
-        where = where or self
-        keys = path.split(".")
-
-        while keys and where:
-            key = keys.pop(0)
-            if key[0] == "@":
-                match = anon_path.match(key)
-                section_type = match.group("name")
-                sections = filter(lambda x: x.type == section_type, where.children)
-                pos = int(match.group("pos"))
-                try:
-                    where = sections[pos]
-                except IndexError:
-                    where = None
-            else:
-                for child in where.children:
-                    if child.key == key:
-                        where = child
-                        break
-                else:
-                    where = None
-        return where
+        return _select(where or self, compile_path(path))
+
+    def find_children(self, paths):
+        """Find children for multiple paths in a single traversal of the tree.
+
+        Paths sharing a prefix are resolved together and children of every
+        visited node are indexed only once.
+
+        :param paths: iterable of paths (see find_child)
+        :return: dict path -> YinElement, paths which were not found are missing
+        """
+        trie = {}
+        for path in paths:
+            node = trie
+            for step in compile_path(path):
+                node = node.setdefault(step, {})
+            node.setdefault(None, []).append(path)
+        results = {}
+        _extract(self, trie, results)
+        return results
 
     def _append_subelements(self, element):
         pass
 
+    def _subelement_items(self):
+        """Subelements of this node for the streaming serializer (see foris.nuci.serializer).
+
+        :return: iterable of tuples (tag, text), text None means an empty element,
+                 None if the node can be serialized only using to_element()
+        """
+        return None
+
+    def tree_children(self):
+        """Children included in get_tree() of this node (none by default)."""
+        return []
+
     def to_element(self):
         """Get XML representation of this element.
 
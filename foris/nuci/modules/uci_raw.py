@@ -18,13 +18,25 @@ from base import YinElement
 from xml.etree import cElementTree as ET
 
 
+OPERATION_ATTRIBUTE = YinElement.qual_tag("operation", YinElement.NS_URI)
+
+
 class Uci(YinElement):
     tag = "uci"
     NS_URI = "http://www.nic.cz/ns/router/uci-raw"
 
     @staticmethod
-    def from_element(element):
+    def from_element(element, lazy=False):
+        """Create Uci tree from XML element.
+
+        :param element: ElementTree Element
+        :param lazy: convert nested nodes only when they are accessed
+        :return: Uci instance
+        """
         uci = Uci()
+        if lazy:
+            uci.set_lazy_element(element)
+            return uci
         config_elems = element.findall(Uci.qual_tag("config"))
         for config_elem in config_elems:
             config = Config.from_element(config_elem)
@@ -33,6 +45,10 @@ class Uci(YinElement):
             pass  # just return an empty UciElement
         return uci
 
+    def _materialize(self, element):
+        for config_elem in element.findall(Uci.qual_tag("config")):
+            self._append_parsed(Config.from_element(config_elem, lazy=True))
+
     @property
     def key(self):
         return "uci"
@@ -40,6 +56,13 @@ class Uci(YinElement):
     def __str__(self):
         return "Uci configuration"
 
+    def _subelement_items(self):
+        return ()
+
+    def _append_subelements(self, element):
+        for tag, text in self._subelement_items():
+            ET.SubElement(element, self.qual_tag(tag)).text = text
+
 
 class Config(Uci):
     tag = "config"
@@ -51,17 +74,21 @@ class Config(Uci):
     def __str__(self):
         return "Config " + self.name
 
-    def _append_subelements(self, element):
-        ET.SubElement(element, self.qual_tag("name")).text = self.name
+    def _subelement_items(self):
+        return ("name", self.name),
 
     @property
     def key(self):
         return self.name
 
     @staticmethod
-    def from_element(element):
+    def from_element(element, lazy=False):
         name = element.find(Config.qual_tag("name")).text
         config = Config(name)
+        config.operation = element.get(OPERATION_ATTRIBUTE)
+        if lazy:
+            config.set_lazy_element(element)
+            return config
         section_elems = element.findall(Config.qual_tag("section"))
         for section_elem in section_elems:
             section = Section.from_element(section_elem)
@@ -70,6 +97,10 @@ class Config(Uci):
             pass  # just return an empty ConfigElement
         return config
 
+    def _materialize(self, element):
+        for section_elem in element.findall(Config.qual_tag("section")):
+            self._append_parsed(Section.from_element(section_elem, lazy=True))
+
 
 class Section(Uci):
     tag = "section"
@@ -89,7 +120,7 @@ class Section(Uci):
         return self.name
 
     @staticmethod
-    def from_element(element):
+    def from_element(element, lazy=False):
         name = element.find(Section.qual_tag("name")).text
 
         # Note the type could be empty (when we filter the option - foris.settings.lang)
@@ -113,6 +144,10 @@ class Section(Uci):
 
         anonymous = element.find(Section.qual_tag("anonymous")) is not None
         section = Section(name, type_, anonymous)
+        section.operation = element.get(OPERATION_ATTRIBUTE)
+        if lazy:
+            section.set_lazy_element(element)
+            return section
         for elem in element.iter():
             if elem.tag == Option.qual_tag("option"):
                 section.add(Option.from_element(elem))
@@ -120,12 +155,22 @@ class Section(Uci):
                 section.add(List.from_element(elem))
         return section
 
-    def _append_subelements(self, element):
-        ET.SubElement(element, self.qual_tag("name")).text = self.name
+    def _materialize(self, element):
+        option_tag = Option.qual_tag("option")
+        list_tag = List.qual_tag("list")
+        for elem in element:
+            if elem.tag == option_tag:
+                self._append_parsed(Option.from_element(elem))
+            elif elem.tag == list_tag:
+                self._append_parsed(List.from_element(elem))
+
+    def _subelement_items(self):
+        items = [("name", self.name)]
         if self.type is not None:
-            ET.SubElement(element, self.qual_tag("type")).text = self.type
+            items.append(("type", self.type))
         if self.anonymous:
-            ET.SubElement(element, self.qual_tag("anonymous"))
+            items.append(("anonymous", None))
+        return items
 
 
 class Option(Uci):
@@ -153,11 +198,11 @@ class Option(Uci):
         name = element.find(Option.qual_tag("name")).text
         value = element.find(Option.qual_tag("value")).text
         option = Option(name, value)
+        option.operation = element.get(OPERATION_ATTRIBUTE)
         return option
 
-    def _append_subelements(self, element):
-        ET.SubElement(element, self.qual_tag("name")).text = self.name
-        ET.SubElement(element, self.qual_tag("value")).text = self.value
+    def _subelement_items(self):
+        return ("name", self.name), ("value", self.value)
 
 
 class List(Uci):
@@ -178,13 +223,18 @@ class List(Uci):
     def from_element(element):
         name = element.find(List.qual_tag("name")).text
         list_ = List(name)
+        list_.operation = element.get(OPERATION_ATTRIBUTE)
         for value_elem in element.findall(List.qual_tag("value")):
             value = Value.from_element(value_elem)
             list_.add(value)
         return list_
 
-    def _append_subelements(self, element):
-        ET.SubElement(element, self.qual_tag("name")).text = self.name
+    def _subelement_items(self):
+        return ("name", self.name),
+
+    def tree_children(self):
+        # list can't be empty - all the values are sent with the created list
+        return self.children if self.operation == "create" else []
 
     def get_tree(self, subelement=None):
         element = self.to_element()
@@ -226,9 +276,8 @@ class Value(Uci):
         value = Value(index, content)
         return value
 
-    def _append_subelements(self, element):
-        ET.SubElement(element, self.qual_tag("index")).text = self.index
-        ET.SubElement(element, self.qual_tag("content")).text = self.content
+    def _subelement_items(self):
+        return ("index", self.index), ("content", self.content)
 
 
 def parse_uci_bool(value):
@@ -0,0 +1,298 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2017 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Nuci multiplexer - a daemon sharing a bounded pool of Nuci sessions among
+multiple Foris processes (e.g. when running as CGI or with several flup
+workers).
+
+Foris workers connect to the multiplexer via Unix socket (use --nuci-socket
+option of Foris) and speak NETCONF to it as if it was Nuci itself. Every RPC
+received from a worker is forwarded to a free Nuci session and the reply is
+sent back to the worker. Messages are passed as they are, so the replies
+keep the message-id of the worker's requests.
+
+Usage:
+    python -m foris.nuci.multiplexer -s /var/run/nuci.sock
+"""
+from __future__ import absolute_import
+
+import argparse
+import logging
+import os
+import Queue
+import re
+import select
+import shlex
+import socket
+import SocketServer
+import subprocess
+import threading
+import time
+
+from .transport import BASE_1_1, BUF_SIZE, FrameReader, frame
+
+
+logger = logging.getLogger("nuci.multiplexer")
+
+
+HELLO = """<?xml version="1.0" encoding="UTF-8"?>
+<hello xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">
+<capabilities><capability>urn:ietf:params:netconf:base:1.0</capability></capabilities>
+</hello>"""
+
+CLOSE_SESSION_REPLY = """<?xml version="1.0" encoding="UTF-8"?>
+<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0" message-id="%s"><ok/></rpc-reply>"""
+
+message_id_re = re.compile(r"""message-id=["']([^"']*)["']""")
+close_session_re = re.compile(r"<(\w+:)?close-session\b")
+# multiplexer uses end-of-message framing only, base:1.1 must not be advertised to clients
+base_1_1_re = re.compile(r"<(\w+:)?capability>\s*%s\s*</(\w+:)?capability>" % re.escape(BASE_1_1))
+
+
+class NuciBackendError(IOError):
+    pass
+
+
+class NuciBackendTimeout(NuciBackendError):
+    pass
+
+
+class NuciBackend(object):
+    """
+    Single Nuci process with NETCONF session established.
+    """
+    def __init__(self, path, timeout=None):
+        """
+        :param path: command starting Nuci
+        :param timeout: how long (in seconds) to wait for a reply, None means forever
+        """
+        self.timeout = timeout
+        self.process = subprocess.Popen(shlex.split(path), stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, close_fds=True)
+        self.started = time.time()
+        self.reader = FrameReader()
+        self.pending = []
+        try:
+            self.send(HELLO)
+            self.hello = self.receive()
+        except NuciBackendError:
+            self.close(kill=True)
+            raise
+
+    def send(self, message):
+        try:
+            self.process.stdin.write(frame(message))
+            self.process.stdin.flush()
+        except (IOError, OSError) as e:
+            raise NuciBackendError("Unable to write to Nuci: %s" % e)
+
+    def receive(self):
+        """Wait for a message from Nuci.
+
+        :raises: NuciBackendTimeout if Nuci doesn't reply within the timeout
+        """
+        deadline = time.time() + self.timeout if self.timeout is not None else None
+        fd = self.process.stdout.fileno()
+        while not self.pending:
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                    raise NuciBackendTimeout("Nuci hasn't replied in %s seconds." % self.timeout)
+            data = os.read(fd, BUF_SIZE)
+            if not data:
+                raise NuciBackendError("Nuci closed the session.")
+            self.pending.extend(self.reader.feed(data))
+        return self.pending.pop(0)
+
+    def request(self, message):
+        """Send RPC and wait for the reply.
+
+        :param message: RPC message
+        :return: reply message
+        """
+        self.send(message)
+        return self.receive()
+
+    def close(self, kill=False):
+        """Close the session.
+
+        :param kill: kill the process (e.g. when it hangs) instead of waiting for it to exit
+        """
+        try:
+            if kill:
+                try:
+                    self.process.kill()
+                except OSError:
+                    # already exited
+                    pass
+            self.process.stdin.close()
+            self.process.wait()
+        except (IOError, OSError):
+            logger.exception("Unable to close Nuci session.")
+
+
+class NuciPool(object):
+    """
+    Bounded pool of Nuci sessions. Sessions are started lazily and recycled
+    after max_life seconds (in the same way as StaticNetconfConnection does).
+    Sessions which fail or don't reply in time are killed, a new session is
+    started in their place when needed.
+    """
+    def __init__(self, path, size, max_life, timeout=None):
+        self.path = path
+        self.max_life = max_life
+        self.timeout = timeout
+        self.idle = Queue.LifoQueue()
+        self.slots = threading.Semaphore(size)
+        # start the first session and keep its hello - it is replayed to the clients
+        self.slots.acquire()
+        backend = self._start()
+        self.hello = base_1_1_re.sub("", backend.hello)
+        self.release(backend)
+
+    def _start(self):
+        backend = NuciBackend(self.path, self.timeout)
+        logger.debug("Nuci session started (pid %d).", backend.process.pid)
+        return backend
+
+    def acquire(self):
+        self.slots.acquire()
+        try:
+            while True:
+                try:
+                    backend = self.idle.get_nowait()
+                except Queue.Empty:
+                    return self._start()
+                if time.time() - backend.started < self.max_life:
+                    return backend
+                backend.close()
+        except Exception:
+            self.slots.release()
+            raise
+
+    def release(self, backend, broken=False):
+        if broken:
+            backend.close(kill=True)
+        else:
+            self.idle.put(backend)
+        self.slots.release()
+
+    def request(self, message):
+        backend = self.acquire()
+        try:
+            reply = backend.request(message)
+        except NuciBackendError:
+            logger.warning("Nuci session (pid %d) failed, killing it.", backend.process.pid)
+            self.release(backend, broken=True)
+            raise
+        self.release(backend)
+        return reply
+
+
+class ClientHandler(SocketServer.BaseRequestHandler):
+    """
+    Handles a single Foris worker connection. RPCs of the worker are processed
+    one by one in the order they were received (as NETCONF requires, e.g. a get
+    must not overtake an edit-config sent before it), other workers use other
+    Nuci sessions concurrently.
+    """
+    def send(self, message):
+        self.request.sendall(frame(message))
+
+    def process(self, message):
+        """Forward RPC to Nuci and send the reply back.
+
+        :return: False if the connection has been closed
+        """
+        try:
+            reply = self.server.pool.request(message)
+        except NuciBackendError:
+            logger.exception("Nuci request failed, closing client connection.")
+            self.request.shutdown(socket.SHUT_RDWR)
+            return False
+        try:
+            self.send(reply)
+        except socket.error:
+            logger.debug("Client disconnected before receiving the reply.")
+            return False
+        return True
+
+    def handle(self):
+        pool = self.server.pool
+        self.send(pool.hello)
+        reader = FrameReader()
+        hello_received = False
+        while True:
+            data = self.request.recv(BUF_SIZE)
+            if not data:
+                return
+            for message in reader.feed(data):
+                if not hello_received:
+                    # client's hello - sessions to Nuci are already established
+                    hello_received = True
+                    continue
+                if close_session_re.search(message):
+                    # shared Nuci sessions are kept open
+                    match = message_id_re.search(message)
+                    self.send(CLOSE_SESSION_REPLY % (match.group(1) if match else ""))
+                    return
+                if not self.process(message):
+                    return
+
+
+class MultiplexerServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, pool):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        # socket must not be accessible by other users, not even for a moment
+        old_umask = os.umask(0o077)
+        try:
+            SocketServer.UnixStreamServer.__init__(self, socket_path, ClientHandler)
+        finally:
+            os.umask(old_umask)
+        self.pool = pool
+
+
+def get_arg_parser():
+    parser = argparse.ArgumentParser(description="Share Nuci sessions among Foris processes.")
+    parser.add_argument("-s", "--socket", required=True, help="path to the Unix socket")
+    parser.add_argument("--nucipath", default="/usr/bin/nuci", help="path to Nuci binary")
+    parser.add_argument("-n", "--sessions", type=int, default=2,
+                        help="maximum number of Nuci sessions")
+    parser.add_argument("--session-life", type=int, default=300,
+                        help="recycle Nuci sessions older than this (in seconds)")
+    parser.add_argument("--timeout", type=int, default=120,
+                        help="kill Nuci sessions not replying for this long (in seconds)")
+    parser.add_argument("-d", "--debug", action="store_true")
+    return parser
+
+
+def main():
+    args = get_arg_parser().parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING)
+    pool = NuciPool(args.nucipath, args.sessions, args.session_life, args.timeout or None)
+    server = MultiplexerServer(args.socket, pool)
+    try:
+        server.serve_forever()
+    finally:
+        os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
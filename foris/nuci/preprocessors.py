@@ -19,6 +19,16 @@ from foris.nuci.modules.uci_raw import parse_uci_bool
 from foris.utils import addresses
 
 
+GUEST_NETWORK_PATHS = (
+    'uci.network.guest_turris.enabled',
+    'uci.dhcp.guest_turris.ignore',
+    'uci.firewall.guest_turris.enabled',
+    'uci.firewall.guest_turris_forward_wan.enabled',
+    'uci.firewall.guest_turris_dhcp_rule.enabled',
+    'uci.firewall.guest_turris_dns_rule.enabled',
+)
+
+
 def guest_network_enabled(data):
     """ Processes the data obtained by `filters.wifi_filter`
     and decides whether guest network is enabled
@@ -29,8 +39,10 @@ def guest_network_enabled(data):
     :rtype: bool
     """
 
+    nodes = data.find_children(GUEST_NETWORK_PATHS)
+
     def test_enabled(uci_path, default=False):
-        node = data.find_child(uci_path)
+        node = nodes.get(uci_path)
         if not node:
             return default
         return parse_uci_bool(node.value)
@@ -68,9 +80,10 @@ def generate_network_preprocessor(address_path, netmask_path, default_network, d
         :param data: Data obtained from the query
         :type data: nuci.modules.base.Data
         """
-        address_node = data.find_child(address_path)
+        nodes = data.find_children((address_path, netmask_path))
+        address_node = nodes.get(address_path)
         address = address_node.value if address_node else default_network
-        netmask_node = data.find_child(netmask_path)
+        netmask_node = nodes.get(netmask_path)
         netmask = netmask_node.value if netmask_node else default_netmask
 
         try:
@@ -0,0 +1,180 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2017 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Serialization of YIN trees directly to XML, without building ElementTree
+elements first.
+
+Prefixed tags and their markup are computed only once for every tag.
+Nodes which don't describe their subelements (see
+YinElement._subelement_items) are serialized using their to_element().
+"""
+
+import threading
+from xml.etree import cElementTree as ET
+from xml.sax.saxutils import escape, quoteattr
+
+from .modules.base import YinElement
+from .modules.uci_raw import Uci
+
+
+# well-known namespaces, other namespaces get generated prefixes
+PREFIXES = {
+    YinElement.NS_URI: "nc",
+    Uci.NS_URI: "uci",
+}
+
+_OPERATION_ATTRIBUTE = ' nc:operation="%s"'
+
+_prefixes = dict(PREFIXES)
+# (namespace, tag) -> tuple (start tag without ">", end tag)
+_markup = {}
+_lock = threading.Lock()
+
+
+def _get_markup(ns_uri, tag):
+    try:
+        return _markup[ns_uri, tag]
+    except KeyError:
+        pass
+    with _lock:
+        prefix = _prefixes.get(ns_uri)
+        if prefix is None:
+            prefix = _prefixes[ns_uri] = "ns%d" % len(_prefixes)
+        name = "%s:%s" % (prefix, tag)
+        markup = _markup[ns_uri, tag] = ("<" + name, "</%s>" % name)
+    return markup
+
+
+class _Writer(object):
+    def __init__(self, pretty):
+        self.chunks = []
+        self.namespaces = set()
+        self.pretty = pretty
+
+    def indent(self, level):
+        if self.pretty:
+            self.chunks.append("\n" + "  " * level)
+
+    def start(self, node, level):
+        """Write start tag and subelements of the node.
+
+        :return: end tag or None if the node was written as a whole
+        """
+        items = node._subelement_items()
+        if items is None:
+            # node doesn't support streaming, use its ElementTree representation
+            self.indent(level)
+            self.chunks.append(ET.tostring(node.to_element()))
+            return None
+        chunks = self.chunks
+        ns_uri = node.NS_URI
+        self.namespaces.add(ns_uri)
+        start, end = _get_markup(ns_uri, node.tag)
+        self.indent(level)
+        chunks.append(start)
+        if node.operation:
+            self.namespaces.add(YinElement.NS_URI)
+            chunks.append(_OPERATION_ATTRIBUTE % node.operation)
+        chunks.append(">")
+        for tag, text in items:
+            item_start, item_end = _get_markup(ns_uri, tag)
+            self.indent(level + 1)
+            if text is None:
+                chunks.append(item_start + "/>")
+            else:
+                chunks.extend((item_start, ">", escape(text), item_end))
+        return end
+
+    def write(self, node, level=0, children=True):
+        end = self.start(node, level)
+        if end is None:
+            return
+        for child in node.children if children else node.tree_children():
+            self.write(child, level + 1, children)
+        self.indent(level)
+        self.chunks.append(end)
+
+    def write_with_parents(self, node, children):
+        """Write the node wrapped in its parents (like YinElement.get_tree does)."""
+        parents = []
+        parent = node.parent
+        while parent is not None:
+            parents.append(parent)
+            parent = parent.parent
+        ends = []
+        for level, parent in enumerate(reversed(parents)):
+            ends.append((level, self.start(parent, level)))
+        self.write(node, len(parents), children)
+        for level, end in reversed(ends):
+            if end is not None:
+                self.indent(level)
+                self.chunks.append(end)
+
+    def declarations(self):
+        return "".join(" xmlns:%s=%s" % (_prefixes[ns_uri], quoteattr(ns_uri))
+                       for ns_uri in sorted(self.namespaces))
+
+    def result(self, root=None):
+        """Get the serialized XML.
+
+        :param root: tag of the root element in the base namespace to wrap
+                     the nodes in, or None
+        :return: UTF-8 encoded XML
+        """
+        chunks = self.chunks
+        if root is not None:
+            self.namespaces.add(YinElement.NS_URI)
+            start, end = _get_markup(YinElement.NS_URI, root)
+            chunks = [start, self.declarations(), ">"] + chunks + ["\n" if self.pretty else "", end]
+        elif chunks:
+            # namespace declarations go to the first start tag
+            first = 1 if self.pretty else 0
+            chunks = chunks[:first + 1] + [self.declarations()] + chunks[first + 1:]
+        data = "".join(chunks)
+        if isinstance(data, unicode):
+            data = data.encode("utf-8")
+        return data.lstrip("\n")
+
+
+def serialize(node, pretty=False, parents=False):
+    """Serialize the node and its children.
+
+    :param node: YinElement to serialize
+    :param pretty: indent the XML
+    :param parents: wrap the node in its parents, children of the node are
+                    not serialized then (the same as YinElement.get_tree())
+    :return: UTF-8 encoded XML
+    """
+    writer = _Writer(pretty)
+    if parents:
+        writer.write_with_parents(node, children=False)
+    else:
+        writer.write(node)
+    return writer.result()
+
+
+def serialize_config(nodes, pretty=False):
+    """Serialize nodes wrapped in NETCONF <config> element, as used in edit-config.
+
+    :param nodes: YinElements to serialize (including their children)
+    :param pretty: indent the XML
+    :return: UTF-8 encoded XML
+    """
+    writer = _Writer(pretty)
+    for node in nodes:
+        writer.write(node, level=1)
+    return writer.result(root="config")
@@ -0,0 +1,334 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2017 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Snapshots of the Uci configuration, their comparison and rollback.
+
+Snapshots are immutable trees of tuples:
+
+    config = (name, (section, ...))
+    section = (name, type, anonymous, (item, ...))
+    item = (name, value) for options, (name, (value, ...)) for lists
+
+Configs and sections which haven't changed since the previous snapshot are
+shared with it (the very same tuples are used), so keeping many snapshots
+is cheap and unchanged parts are skipped by an identity check when diffing.
+Rollback sends only the changes needed to get from the current config to the
+snapshot, using a single edit-config.
+"""
+
+import itertools
+import logging
+import threading
+from time import time
+
+from .modules.uci_raw import Uci, Config, Section, Option, List, Value
+
+
+logger = logging.getLogger("nuci.snapshots")
+
+
+def _intern(value):
+    return intern(value) if isinstance(value, str) else value
+
+
+def _freeze_section(section):
+    items = []
+    for child in section.children:
+        if isinstance(child, List):
+            items.append((_intern(child.name), tuple(value.content for value in child.children)))
+        elif isinstance(child, Option):
+            items.append((_intern(child.name), child.value))
+    return _intern(section.name), _intern(section.type), bool(section.anonymous), tuple(items)
+
+
+def freeze_config(config):
+    """Create snapshot tree of a single config.
+
+    :param config: Config
+    :return: tuple (name, sections)
+    """
+    return _intern(config.name), tuple(_freeze_section(section) for section in config.children)
+
+
+def _share(new, old):
+    """Use the old tuple if it's equal to the new one."""
+    return old if old is not None and old == new else new
+
+
+def freeze(uci, previous=None):
+    """Create snapshot tree from the Uci tree.
+
+    :param uci: Uci tree
+    :param previous: previous snapshot tree - its unchanged parts are shared
+    :return: tuple of configs
+    """
+    previous_configs = dict((config[0], config) for config in previous or ())
+    configs = []
+    for config in uci.children:
+        old_config = previous_configs.get(config.name)
+        old_sections = dict((s[0], s) for s in old_config[1]) if old_config else {}
+        sections = tuple(_share(_freeze_section(section), old_sections.get(section.name))
+                         for section in config.children)
+        configs.append(_share((_intern(config.name), sections), old_config))
+    return tuple(configs)
+
+
+def diff(old, new):
+    """Compare two snapshot trees.
+
+    :param old: snapshot tree
+    :param new: snapshot tree
+    :return: list of tuples (path, old value, new value), where path is
+             a tuple (config, section, item) of names - shortened for changes
+             of whole configs and sections - and values are the corresponding
+             parts of the trees (None if missing)
+    """
+    changes = []
+    if old is new:
+        return changes
+    old_configs = dict((config[0], config) for config in old)
+    new_names = set()
+    for new_config in new:
+        name = new_config[0]
+        new_names.add(name)
+        old_config = old_configs.get(name)
+        if old_config is new_config:
+            continue
+        if old_config is None:
+            changes.append(((name, ), None, new_config))
+            continue
+        _diff_sections(name, old_config[1], new_config[1], changes)
+    for name, old_config in old_configs.iteritems():
+        if name not in new_names:
+            changes.append(((name, ), old_config, None))
+    return changes
+
+
+def _diff_sections(config_name, old_sections, new_sections, changes):
+    old_by_name = dict((section[0], section) for section in old_sections)
+    new_names = set()
+    for new_section in new_sections:
+        name = new_section[0]
+        new_names.add(name)
+        old_section = old_by_name.get(name)
+        if old_section is new_section or old_section == new_section:
+            continue
+        if old_section is None or old_section[1:3] != new_section[1:3]:
+            # new section or its type has changed
+            changes.append(((config_name, name), old_section, new_section))
+            continue
+        old_items = dict(old_section[3])
+        new_items = dict(new_section[3])
+        for item_name, value in new_section[3]:
+            if old_items.get(item_name) != value:
+                changes.append(((config_name, name, item_name), old_items.get(item_name), value))
+        for item_name, value in old_section[3]:
+            if item_name not in new_items:
+                changes.append(((config_name, name, item_name), value, None))
+    for old_section in old_sections:
+        if old_section[0] not in new_names:
+            changes.append(((config_name, old_section[0]), old_section, None))
+
+
+def _thaw_item(name, value):
+    if isinstance(value, tuple):
+        list_ = List(name)
+        for index, content in enumerate(value, 1):
+            list_.add(Value(index, content))
+        return list_
+    return Option(name, value)
+
+
+def _thaw_section(section):
+    name, type_, anonymous, items = section
+    node = Section(name, type_, anonymous)
+    for item_name, value in items:
+        node.add(_thaw_item(item_name, value))
+    return node
+
+
+def thaw_config(config):
+    """Create Config from its snapshot tree (see freeze_config()).
+
+    :param config: tuple (name, sections)
+    :return: Config
+    """
+    name, sections = config
+    node = Config(name)
+    for section in sections:
+        node.add(_thaw_section(section))
+    return node
+
+
+def build_update(changes, target):
+    """Create Uci tree applying the changes (new values) obtained by diff().
+
+    Whole configs are never removed, their sections are removed instead.
+
+    :param changes: result of diff(current, target)
+    :param target: snapshot tree the changes lead to
+    :return: Uci tree or None if there's nothing to change
+    """
+    if not changes:
+        return None
+    target_sections = dict(((config[0], section[0]), section)
+                           for config in target for section in config[1])
+    uci = Uci()
+    configs = {}
+
+    def get_config(name):
+        if name not in configs:
+            configs[name] = uci.add(Config(name))
+        return configs[name]
+
+    sections = {}
+    # sections replaced as a whole, their item changes are already included
+    replaced = set()
+
+    def get_section(config_name, name):
+        key = config_name, name
+        if key not in sections:
+            _, type_, anonymous, _ = target_sections[key]
+            sections[key] = get_config(config_name).add(Section(name, type_, anonymous))
+        return sections[key]
+
+    for path, old, new in changes:
+        if len(path) == 1:
+            config = get_config(path[0])
+            if new is None:
+                for section in old[1]:
+                    config.add_removal(Section(section[0], section[1], section[2]))
+            else:
+                for section in new[1]:
+                    config.add(_thaw_section(section))
+        elif len(path) == 2:
+            config = get_config(path[0])
+            if new is None:
+                config.add_removal(Section(old[0], old[1], old[2]))
+            elif old is None:
+                config.add(_thaw_section(new))
+            else:
+                config.add_replace(_thaw_section(new))
+        else:
+            # sections of item changes are present in both trees with the same type
+            key = path[0], path[1]
+            if key in replaced:
+                continue
+            section = get_section(*key)
+            if old is not None and new is not None \
+                    and isinstance(old, tuple) != isinstance(new, tuple):
+                # option and list with the same name can't be removed and added
+                # in the same section, so the whole section is replaced
+                config = get_config(path[0])
+                config.remove(section)
+                sections[key] = config.add_replace(_thaw_section(target_sections[key]))
+                replaced.add(key)
+            elif new is None:
+                section.add_removal(_thaw_item(path[2], old))
+            elif isinstance(new, tuple):
+                section.add_replace(_thaw_item(path[2], new))
+            else:
+                section.add(_thaw_item(path[2], new))
+    return uci
+
+
+class Snapshot(object):
+    def __init__(self, id, configs, created=None, description=None):
+        """
+        :param id: identifier of the snapshot
+        :param configs: snapshot tree (see freeze())
+        :param created: timestamp of the snapshot
+        :param description: description shown to the user
+        """
+        self.id = id
+        self.configs = configs
+        self.created = created if created is not None else time()
+        self.description = description
+
+
+class SnapshotStore(object):
+    """
+    Keeps a limited number of the most recent snapshots. Every snapshot shares
+    unchanged parts with the snapshot taken before it.
+    """
+    def __init__(self, max_snapshots=10):
+        self.max_snapshots = max_snapshots
+        self.snapshots = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def latest(self):
+        return self.snapshots[-1] if self.snapshots else None
+
+    def freeze(self, uci):
+        """Create snapshot tree of the Uci tree sharing parts with the latest snapshot.
+
+        :param uci: Uci tree
+        :return: snapshot tree
+        """
+        latest = self.latest
+        return freeze(uci, latest.configs if latest else None)
+
+    def take(self, uci, description=None):
+        """Store a new snapshot of the Uci tree.
+
+        :param uci: Uci tree
+        :param description: description of the snapshot
+        :return: Snapshot
+        """
+        configs = self.freeze(uci)
+        with self._lock:
+            snapshot = Snapshot(next(self._ids), configs, description=description)
+            self.snapshots.append(snapshot)
+            del self.snapshots[:-self.max_snapshots]
+        return snapshot
+
+    def get(self, id):
+        """Get snapshot by its identifier.
+
+        :param id: identifier of the snapshot
+        :return: Snapshot
+        :raises: KeyError if there's no such snapshot
+        """
+        for snapshot in self.snapshots:
+            if snapshot.id == id:
+                return snapshot
+        raise KeyError("No snapshot with id %s." % id)
+
+    def history(self):
+        """List snapshots from the newest one with changes made since the previous snapshot.
+
+        :return: list of tuples (Snapshot, changes or None for the oldest snapshot)
+        """
+        snapshots = list(self.snapshots)
+        result = []
+        for previous, snapshot in zip([None] + snapshots, snapshots):
+            changes = diff(previous.configs, snapshot.configs) if previous else None
+            result.append((snapshot, changes))
+        result.reverse()
+        return result
+
+    def rollback_update(self, snapshot, current_uci):
+        """Get Uci tree reverting the current config to the snapshot.
+
+        :param snapshot: Snapshot to revert to
+        :param current_uci: current Uci tree
+        :return: Uci tree or None if the config is the same as in the snapshot
+        """
+        current = self.freeze(current_uci)
+        return build_update(diff(current, snapshot.configs), snapshot.configs)
@@ -0,0 +1,312 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2017 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+NETCONF transports and message framing used for communication with Nuci
+(directly or through the Nuci multiplexer, see foris.nuci.multiplexer).
+"""
+from __future__ import absolute_import
+
+import logging
+import os
+import select
+import socket
+import subprocess
+
+from ncclient.transport import Session, SessionCloseError
+
+
+logger = logging.getLogger("nuci.transport")
+
+
+MSG_DELIM = "]]>]]>"
+
+BASE_1_1 = "urn:ietf:params:netconf:base:1.1"
+
+# size of a single read from the socket/pipe
+BUF_SIZE = 16 * 1024
+
+# how long to wait in select() before checking the send queue again
+TICK = 0.1
+
+# maximal chunk size allowed by RFC 6242
+MAX_CHUNK_SIZE = 4294967295
+
+
+class FramingError(ValueError):
+    pass
+
+
+class FrameReader(object):
+    """
+    Splits a stream of data into NETCONF messages.
+
+    Supports both end-of-message framing (NETCONF 1.0) and chunked framing
+    (RFC 6242, NETCONF 1.1). Received data is scanned incrementally - bytes
+    which have already been searched for the delimiter are never scanned again
+    and consumed data are discarded only once in a while.
+    """
+    # discard consumed data when there's more than this bytes of them
+    COMPACT_THRESHOLD = 64 * 1024
+
+    def __init__(self, chunked=False):
+        self.buffer = bytearray()
+        self.chunked = chunked
+        # start of unconsumed data
+        self._start = 0
+        # position where to continue searching for the delimiter or parsing chunks
+        self._scan_pos = 0
+        # chunked framing state - (start, end) ranges of received chunks of the current
+        # message in the buffer and remaining size of the current chunk
+        self._chunks = []
+        self._chunk_remaining = 0
+
+    def set_chunked(self, chunked=True):
+        """Switch framing mode (after hello messages have been exchanged)."""
+        self.chunked = chunked
+        # data already received after the hello has to be parsed again
+        self._scan_pos = self._start
+
+    def _take(self, start, end):
+        view = memoryview(self.buffer)
+        try:
+            return view[start:end].tobytes()
+        finally:
+            # release the view, so the buffer can be resized
+            del view
+
+    def _compact(self):
+        if self._start > self.COMPACT_THRESHOLD and self._start * 2 > len(self.buffer):
+            shift = self._start
+            del self.buffer[:shift]
+            self._scan_pos -= shift
+            self._chunks = [(start - shift, end - shift) for start, end in self._chunks]
+            self._start = 0
+
+    def _read_eom(self, messages):
+        delim_len = len(MSG_DELIM)
+        while True:
+            index = self.buffer.find(MSG_DELIM, self._scan_pos)
+            if index == -1:
+                # the delimiter might be split, rescan only its possible beginning
+                self._scan_pos = max(self._start, len(self.buffer) - delim_len + 1)
+                return
+            messages.append(self._take(self._start, index))
+            self._start = self._scan_pos = index + delim_len
+
+    def _read_chunked(self, messages):
+        buf = self.buffer
+        pos = self._scan_pos
+        length = len(buf)
+        chunks = self._chunks
+        while pos < length:
+            if self._chunk_remaining:
+                end = min(pos + self._chunk_remaining, length)
+                if chunks and chunks[-1][1] == pos:
+                    # the same chunk continues in newly received data
+                    chunks[-1] = (chunks[-1][0], end)
+                else:
+                    chunks.append((pos, end))
+                self._chunk_remaining -= end - pos
+                pos = end
+                continue
+            # chunk header: LF HASH chunk-size LF or end of chunks: LF HASH HASH LF
+            header_end = buf.find("\n", pos + 1)
+            if header_end == -1 or length - pos < 4:
+                break
+            if buf[pos] != ord("\n") or buf[pos + 1] != ord("#"):
+                raise FramingError("Invalid chunk header.")
+            if buf[pos + 2] == ord("#"):
+                if header_end != pos + 3:
+                    raise FramingError("Invalid end of chunks.")
+                if len(chunks) == 1:
+                    messages.append(self._take(*chunks[0]))
+                else:
+                    messages.append("".join([self._take(*chunk) for chunk in chunks]))
+                del chunks[:]
+            else:
+                size = buf[pos + 2:header_end]
+                if not size.isdigit() or size.startswith("0") or int(size) > MAX_CHUNK_SIZE:
+                    raise FramingError("Invalid chunk size.")
+                self._chunk_remaining = int(size)
+            pos = header_end + 1
+        # chunks of an incomplete message are kept in the buffer
+        self._start = chunks[0][0] if chunks else pos
+        self._scan_pos = pos
+
+    def feed(self, data):
+        """Add received data.
+
+        :param data: received data
+        :return: list of complete messages
+        """
+        self.buffer.extend(data)
+        messages = []
+        if self.chunked:
+            self._read_chunked(messages)
+        else:
+            self._read_eom(messages)
+        self._compact()
+        return messages
+
+    @property
+    def pending(self):
+        """Number of received bytes which are not a part of complete message yet."""
+        return len(self.buffer) - self._start
+
+
+def frame(message, chunked=False):
+    """Add framing to a message to be sent.
+
+    :param message: message to frame
+    :param chunked: use chunked framing (NETCONF 1.1)
+    :return: framed message
+    """
+    if chunked:
+        return "\n#%d\n%s\n##\n" % (len(message), message)
+    return message + MSG_DELIM
+
+
+class StdIOSession(Session):
+    """
+    NETCONF session with Nuci spawned as a child process, communicating
+    over its stdin/stdout.
+
+    Chunked framing is used after the hello exchange if both sides
+    advertise base:1.1 capability.
+    """
+    def __init__(self, capabilities):
+        super(StdIOSession, self).__init__(capabilities)
+        self._process = None
+        self._reader = FrameReader()
+        self._chunked = False
+        self._hello_sent = False
+
+    def connect(self, path):
+        """Spawn Nuci and exchange hello messages.
+
+        :param path: Nuci command as a list of arguments
+        """
+        self._process = subprocess.Popen(path, stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE, close_fds=True)
+        self._connected = True
+        self._post_connect()
+
+    def _update_framing(self):
+        """Switch to chunked framing once both hellos have been exchanged.
+
+        Client's hello must be written with end-of-message framing even when
+        server's hello arrives first (RFC 6242, section 4.1).
+        """
+        if self._chunked or not self._hello_sent or self._server_capabilities is None:
+            return
+        if BASE_1_1 in self._client_capabilities and BASE_1_1 in self._server_capabilities:
+            logger.debug("Switching to chunked framing.")
+            self._chunked = True
+            self._reader.set_chunked()
+
+    def run(self):
+        stdout = self._process.stdout.fileno()
+        stdin = self._process.stdin.fileno()
+        q = self._q
+        try:
+            while True:
+                writers = [stdin] if not q.empty() else []
+                readable, writable, _ = select.select([stdout], writers, [], TICK)
+                if readable:
+                    data = os.read(stdout, BUF_SIZE)
+                    if not data:
+                        raise SessionCloseError(str(self._reader.buffer))
+                    for message in self._reader.feed(data):
+                        self._dispatch_message(message)
+                        # the first message is server's hello
+                        self._update_framing()
+                if writable:
+                    while not q.empty():
+                        data = frame(q.get(), self._chunked)
+                        while data:
+                            written = os.write(stdin, data)
+                            data = data[written:]
+                        if not self._hello_sent:
+                            # the first message is client's hello
+                            self._hello_sent = True
+                            self._update_framing()
+        except Exception as e:
+            if self._connected:
+                logger.debug("Broken Nuci session: %s", e)
+                self.close()
+                self._dispatch_error(e)
+
+    def close(self):
+        if self._process is not None and self._process.poll() is None:
+            try:
+                self._process.stdin.close()
+                self._process.wait()
+            except (IOError, OSError):
+                pass
+        self._connected = False
+
+
+class UnixSocketSession(Session):
+    """
+    NETCONF session connected to the Nuci multiplexer via Unix socket.
+    """
+    def __init__(self, capabilities):
+        super(UnixSocketSession, self).__init__(capabilities)
+        self._socket = None
+        self._reader = FrameReader()
+
+    def connect(self, path):
+        """Connect to the multiplexer and exchange hello messages.
+
+        :param path: path to the Unix socket
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+        self._socket = sock
+        self._connected = True
+        self._post_connect()
+
+    def run(self):
+        sock = self._socket
+        q = self._q
+        try:
+            while True:
+                writers = [sock] if not q.empty() else []
+                readable, writable, _ = select.select([sock], writers, [], TICK)
+                if readable:
+                    data = sock.recv(BUF_SIZE)
+                    if not data:
+                        raise SessionCloseError(str(self._reader.buffer))
+                    for message in self._reader.feed(data):
+                        self._dispatch_message(message)
+                if writable:
+                    while not q.empty():
+                        sock.sendall(frame(q.get()))
+        except Exception as e:
+            if self._connected:
+                logger.debug("Broken multiplexer session: %s", e)
+                self.close()
+                self._dispatch_error(e)
+
+    def close(self):
+        if self._socket is not None:
+            try:
+                self._socket.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            self._socket.close()
+        self._connected = False
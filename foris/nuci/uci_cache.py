@@ -0,0 +1,146 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2017 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Persistent cache of parsed Uci configs shared by Foris processes.
+
+It's useful mainly for the cgi server, where every request starts a new
+process. Configs are stored as snapshot trees (see foris.nuci.snapshots) in
+a single marshal file together with the modification time, size and inode
+of the config file they were parsed from - a config is used only while its
+file stays the same.
+"""
+
+import logging
+import marshal
+import os
+import tempfile
+
+from .snapshots import freeze_config, thaw_config
+
+
+logger = logging.getLogger("nuci.uci_cache")
+
+
+DEFAULT_CACHE_PATH = "/tmp/foris-uci-cache"
+
+# bump when the format of the stored data changes
+FORMAT_VERSION = 1
+
+
+def file_stamp(path):
+    """Get stamp identifying the content of the file.
+
+    :param path: path to the file
+    :return: tuple (mtime, size, inode) or None if the file doesn't exist
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime, st.st_size, st.st_ino
+
+
+class UciDiskCache(object):
+    """
+    Parsed configs stored on disk, loaded once per process.
+    """
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        """
+        :param path: path to the cache file
+        """
+        self.path = path
+        self._configs = None
+        # configs stored by this process and not saved yet
+        self._pending = {}
+
+    def _load(self):
+        """Read the cache file.
+
+        :return: dict name -> (stamp, snapshot tree of the config)
+        """
+        try:
+            with open(self.path, "rb") as f:
+                # the file is in a world-writable directory, trust only our own files
+                if os.fstat(f.fileno()).st_uid != os.getuid():
+                    logger.warning("Cache file %s is not owned by us, ignoring it.", self.path)
+                    return {}
+                data = marshal.load(f)
+        except IOError:
+            return {}
+        except (EOFError, ValueError, TypeError):
+            logger.warning("Cache file %s is corrupted, ignoring it.", self.path)
+            return {}
+        if not isinstance(data, tuple) or len(data) != 2 or data[0] != FORMAT_VERSION:
+            return {}
+        return data[1]
+
+    @property
+    def configs(self):
+        if self._configs is None:
+            self._configs = self._load()
+        return self._configs
+
+    def get(self, name, stamp):
+        """Get cached config.
+
+        :param name: name of the config
+        :param stamp: current stamp of the config file (see file_stamp())
+        :return: Config or None if it's not cached or the file has changed since
+        """
+        record = self.configs.get(name)
+        if record is None or stamp is None or tuple(record[0]) != stamp:
+            return None
+        logger.debug("Config %s loaded from disk cache.", name)
+        return thaw_config(record[1])
+
+    def store(self, config, stamp):
+        """Cache the config, it's written to disk by save().
+
+        :param config: parsed Config
+        :param stamp: stamp of the config file it was parsed from
+        """
+        if stamp is None:
+            return
+        record = (stamp, freeze_config(config))
+        self.configs[config.name] = record
+        self._pending[config.name] = record
+
+    def save(self):
+        """Write stored configs to disk, keeping those stored by other processes meanwhile."""
+        if not self._pending:
+            return
+        configs = self._load()
+        configs.update(self._pending)
+        directory = os.path.dirname(self.path) or "."
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".foris-uci-cache-", dir=directory)
+        except OSError as e:
+            logger.warning("Unable to write cache file %s: %s", self.path, e)
+            return
+        try:
+            with os.fdopen(fd, "wb") as f:
+                marshal.dump((FORMAT_VERSION, configs), f, 2)
+            os.rename(tmp_path, self.path)
+        except (OSError, IOError, ValueError) as e:
+            logger.warning("Unable to write cache file %s: %s", self.path, e)
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        self._configs = configs
+        self._pending = {}
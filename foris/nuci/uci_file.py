@@ -0,0 +1,344 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2017 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Reading of Uci configs directly from the config files, without asking Nuci.
+
+Only plain reads of whole configs (or their sections/options) are handled,
+everything else - and configs with uncommitted changes saved by the uci
+tool - is left to Nuci. Anonymous sections get the same names as libuci
+(and thus Nuci) gives them.
+"""
+
+import logging
+import os
+
+from .modules.base import Data
+from .modules.uci_raw import Uci, Config, Section, Option, List, Value
+from .uci_cache import file_stamp
+
+
+logger = logging.getLogger("nuci.uci_file")
+
+
+DEFAULT_CONFIG_DIR = "/etc/config"
+# directory with changes saved by `uci set` but not committed yet
+DELTA_DIR = "/tmp/.uci"
+
+
+class UciParseError(ValueError):
+    pass
+
+
+def get_config_dir():
+    """Get directory with Uci config files.
+
+    :return: NUCI_TEST_CONFIG_DIR environment variable (used by Nuci too)
+             or /etc/config if not set
+    """
+    return os.environ.get("NUCI_TEST_CONFIG_DIR", DEFAULT_CONFIG_DIR)
+
+
+def _tokenize(text):
+    """Split text of the config file into statements.
+
+    :return: generator of lists of words
+    """
+    words = []
+    word = None
+    pos = 0
+    length = len(text)
+    while pos < length:
+        char = text[pos]
+        if char == "\n":
+            if word is not None:
+                words.append(word)
+                word = None
+            if words:
+                yield words
+                words = []
+        elif char in " \t\r":
+            if word is not None:
+                words.append(word)
+                word = None
+        elif char == "#" and word is None:
+            end = text.find("\n", pos)
+            pos = length if end == -1 else end
+            continue
+        elif char == "'":
+            end = text.find("'", pos + 1)
+            if end == -1:
+                raise UciParseError("Unterminated single quote.")
+            word = (word or "") + text[pos + 1:end]
+            pos = end
+        elif char == '"':
+            chunk = []
+            pos += 1
+            while pos < length and text[pos] != '"':
+                if text[pos] == "\\" and pos + 1 < length:
+                    pos += 1
+                    if text[pos] == "\n":
+                        pos += 1
+                        continue
+                chunk.append(text[pos])
+                pos += 1
+            if pos >= length:
+                raise UciParseError("Unterminated double quote.")
+            word = (word or "") + "".join(chunk)
+        elif char == "\\" and pos + 1 < length:
+            pos += 1
+            if text[pos] != "\n":
+                # backslash-newline joins lines
+                word = (word or "") + text[pos]
+        else:
+            word = (word or "") + char
+        pos += 1
+    if word is not None:
+        words.append(word)
+    if words:
+        yield words
+
+
+def _djbhash(hash_, string):
+    for char in bytearray(string):
+        hash_ = ((hash_ << 5) + hash_ + char) & 0xffffffff
+    return hash_
+
+
+def anonymous_section_name(index, type_):
+    """Get name of an anonymous section in the same way as libuci does.
+
+    The name is assigned when the section is added, so only its type and
+    position are used (not its options).
+
+    :param index: order of the section in the config (from 1)
+    :param type_: type of the section
+    :return: name of the section (e.g. cfg01e48a for the first "system" section)
+    """
+    return "cfg%02x%04x" % (index & 0xff, _djbhash(5381, type_) % (1 << 16))
+
+
+def _build_section(name, type_, anonymous, options):
+    section = Section(name, type_, anonymous)
+    for option_name, value in options:
+        if isinstance(value, list):
+            list_ = section.add(List(option_name))
+            for index, content in enumerate(value, 1):
+                list_.add(Value(index, content.decode("utf-8")))
+        else:
+            section.add(Option(option_name, value))
+    return section
+
+
+def parse(text, name):
+    """Parse Uci config file.
+
+    :param text: content of the file (UTF-8 encoded)
+    :param name: name of the config
+    :return: Config
+    :raises: UciParseError
+    """
+    # list of [name, type, anonymous, options], options are lists of [name, value]
+    sections = []
+    by_name = {}
+    current = None
+    # libuci numbers all the sections, the number is a part of anonymous sections' names
+    section_count = 0
+
+    for words in _tokenize(text):
+        keyword = words[0]
+        if keyword == "package":
+            continue
+        if keyword == "config":
+            if len(words) not in (2, 3):
+                raise UciParseError("Invalid section definition: %s" % " ".join(words))
+            section_name = words[2] if len(words) == 3 else None
+            if section_name and section_name in by_name:
+                # sections with the same name are merged
+                current = by_name[section_name]
+                current[1] = words[1]
+                continue
+            section_count += 1
+            current = [section_name, words[1], not section_name, [], section_count]
+            sections.append(current)
+            if section_name:
+                by_name[section_name] = current
+        elif keyword in ("option", "list"):
+            if current is None:
+                raise UciParseError("Option outside of a section.")
+            if len(words) != 3:
+                raise UciParseError("Invalid option definition: %s" % " ".join(words))
+            options = current[3]
+            for option in options:
+                if option[0] == words[1]:
+                    break
+            else:
+                option = None
+            if keyword == "option":
+                if option is None:
+                    options.append([words[1], words[2]])
+                else:
+                    option[1] = words[2]
+            elif option is None or not isinstance(option[1], list):
+                if option is not None:
+                    options.remove(option)
+                options.append([words[1], [words[2]]])
+            else:
+                option[1].append(words[2])
+        else:
+            raise UciParseError("Unknown keyword: %s" % keyword)
+
+    config = Config(name)
+    for section_name, type_, anonymous, options, index in sections:
+        if anonymous:
+            section_name = anonymous_section_name(index, type_)
+        config.add(_build_section(section_name, type_, anonymous, options))
+    return config
+
+
+def _select(config, config_filter):
+    """Apply subtree filter of a single config.
+
+    :return: filtered Config or None if the filter isn't supported
+    """
+    name_tag = Uci.qual_tag("name")
+    section_filters = config_filter.findall(Uci.qual_tag("section"))
+    if len(config_filter) != 1 + len(section_filters):
+        return None
+    if not section_filters:
+        return config
+    selected = Config(config.name)
+    for section_filter in section_filters:
+        section_name = section_filter.findtext(name_tag)
+        option_filters = section_filter.findall(Uci.qual_tag("option"))
+        if not section_name or len(section_filter) != 1 + len(option_filters):
+            return None
+        section = config.find_child(section_name)
+        if section is None:
+            continue
+        if not option_filters:
+            selected.add(section)
+            continue
+        section_copy = selected.add(Section(section.name, section.type, section.anonymous))
+        for option_filter in option_filters:
+            option_name = option_filter.findtext(name_tag)
+            if not option_name or len(option_filter) != 1:
+                return None
+            option = section.find_child(option_name)
+            if isinstance(option, Option):
+                section_copy.add(option)
+    return selected
+
+
+class UciFileReader(object):
+    """
+    Reads Uci configs from files for client.get() if enabled.
+    """
+    def __init__(self, config_dir=None, delta_dir=DELTA_DIR):
+        """
+        :param config_dir: directory with the config files, get_config_dir()
+                           is used if not set
+        :param delta_dir: directory with uncommitted changes
+        """
+        self._config_dir = config_dir
+        self.delta_dir = delta_dir
+        self.enabled = False
+        self.cache = None
+
+    @property
+    def config_dir(self):
+        return self._config_dir or get_config_dir()
+
+    def enable(self, enabled=True, cache=None):
+        """
+        :param enabled: read configs from files
+        :param cache: UciDiskCache with parsed configs or None
+        """
+        self.enabled = enabled
+        self.cache = cache
+
+    def read_config(self, name):
+        """Read a single config.
+
+        :param name: name of the config
+        :return: Config or None if it can't be read directly
+        """
+        if not name or "/" in name or name.startswith("."):
+            return None
+        if os.path.exists(os.path.join(self.delta_dir, name)):
+            logger.debug("Config %s has uncommitted changes.", name)
+            return None
+        path = os.path.join(self.config_dir, name)
+        stamp = None
+        if self.cache:
+            # obtained before reading, so a concurrent change can't be hidden
+            stamp = file_stamp(path)
+            config = self.cache.get(name, stamp)
+            if config is not None:
+                return config
+        try:
+            with open(path) as f:
+                text = f.read()
+        except IOError:
+            return None
+        try:
+            config = parse(text, name)
+        except UciParseError:
+            logger.warning("Unable to parse config %s, leaving it to Nuci.", name, exc_info=True)
+            return None
+        if self.cache:
+            self.cache.store(config, stamp)
+        return config
+
+    def get(self, filter):
+        """Get data for a subtree filter selecting Uci configs.
+
+        :param filter: subtree filter
+        :return: Data or None if the filter has to be handled by Nuci
+        """
+        if not self.enabled or filter is None or filter.tag != Uci.qual_tag(Uci.tag):
+            return None
+        config_tag = Uci.qual_tag("config")
+        name_tag = Uci.qual_tag("name")
+        config_filters = list(filter)
+        if any(child.tag != config_tag for child in config_filters):
+            return None
+        if not config_filters:
+            # whole Uci
+            config_dir = self.config_dir
+            try:
+                names = sorted(name for name in os.listdir(config_dir)
+                               if os.path.isfile(os.path.join(config_dir, name)))
+            except OSError:
+                return None
+            config_filters = [None] * len(names)
+        else:
+            names = [config_filter.findtext(name_tag) for config_filter in config_filters]
+        uci = Uci()
+        for name, config_filter in zip(names, config_filters):
+            config = self.read_config(name)
+            if config is None:
+                return None
+            if config_filter is not None:
+                config = _select(config, config_filter)
+                if config is None:
+                    return None
+            uci.add(config)
+        if self.cache:
+            self.cache.save()
+        data = Data()
+        data.add(uci)
+        return data
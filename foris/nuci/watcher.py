@@ -0,0 +1,273 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2017 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Notifications about changes of Uci configs made outside of Foris (by LuCI,
+the uci tool, updater scripts...).
+
+Directories with config files and with uncommitted changes are watched using
+inotify. Where inotify is not available, modification times and sizes of the
+files are polled instead. Subscribers are called with the name of the changed
+config, or with None if anything might have changed (e.g. events were lost).
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import threading
+from time import sleep
+
+from .uci_file import DELTA_DIR, get_config_dir
+
+
+logger = logging.getLogger("nuci.watcher")
+
+
+# inotify constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# files are written in place (close) or replaced by rename (uci commit)
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF)
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _Inotify(object):
+    """Minimal inotify binding using ctypes."""
+    def __init__(self):
+        """
+        :raises: OSError if inotify is not available
+        """
+        path = ctypes.util.find_library("c")
+        if not path:
+            raise OSError(errno.ENOSYS, "libc not found")
+        self._libc = ctypes.CDLL(path, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not supported")
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path, mask):
+        """Watch the directory.
+
+        :return: watch descriptor
+        :raises: OSError
+        """
+        wd = self._libc.inotify_add_watch(self.fd, path, mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def read_events(self):
+        """Read pending events.
+
+        :return: list of tuples (watch descriptor, mask, file name)
+        """
+        try:
+            buf = os.read(self.fd, 16384)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EINTR):
+                return []
+            raise
+        events = []
+        pos = 0
+        while pos + _EVENT_HEADER.size <= len(buf):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(buf, pos)
+            pos += _EVENT_HEADER.size
+            name = buf[pos:pos + length].rstrip("\0")
+            pos += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _is_config_name(name):
+    # skip temporary files of editors and of uci itself (.uci-XXXXXX)
+    return bool(name) and not name.startswith(".") and not name.endswith("~")
+
+
+class _Poller(object):
+    """Detects changed files by comparing their modification times and sizes."""
+    def __init__(self, directories):
+        self.directories = directories
+        self._state = self._scan()
+
+    def _scan(self):
+        state = {}
+        for directory in self.directories:
+            try:
+                names = os.listdir(directory)
+            except OSError:
+                continue
+            for name in names:
+                if not _is_config_name(name):
+                    continue
+                try:
+                    st = os.stat(os.path.join(directory, name))
+                except OSError:
+                    continue
+                state[directory, name] = (st.st_mtime, st.st_size, st.st_ino)
+        return state
+
+    def check(self):
+        """Compare the files with their state from the previous check.
+
+        :return: set of names of changed configs
+        """
+        old, new = self._state, self._scan()
+        self._state = new
+        changed = set(key[1] for key, value in new.iteritems() if old.get(key) != value)
+        changed.update(key[1] for key in old if key not in new)
+        return changed
+
+
+class ConfigWatcher(object):
+    """
+    Watches Uci config files in a background thread and notifies subscribers
+    about changed configs.
+    """
+    def __init__(self, interval=2):
+        """
+        :param interval: how often (in seconds) files are polled when inotify
+                         isn't available, missing directories are checked
+                         with the same period
+        """
+        self.interval = interval
+        self.directories = []
+        self._subscribers = []
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def subscribe(self, callback):
+        """Register function called with the name of a changed config (None
+        means that any config might have changed).
+
+        :param callback: function with a single argument
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def publish(self, name):
+        """Notify subscribers about a changed config.
+
+        :param name: name of the config or None for all configs
+        """
+        logger.debug("Config %s changed.", name if name is not None else "(any)")
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(name)
+            except Exception:
+                logger.exception("Subscriber of config changes failed.")
+
+    def start(self, directories=None, use_inotify=True):
+        """Start watching in a background thread.
+
+        :param directories: directories to watch, config directory (see
+                            get_config_dir()) and directory with uncommitted
+                            changes are watched if not set
+        :param use_inotify: use inotify if available, poll otherwise
+        """
+        if self.running:
+            return
+        self.directories = directories or [get_config_dir(), DELTA_DIR]
+        inotify = None
+        if use_inotify:
+            try:
+                inotify = _Inotify()
+            except OSError as e:
+                logger.warning("Unable to use inotify (%s), polling config files.", e)
+        target = self._watch_inotify if inotify else self._watch_polling
+        args = (inotify, ) if inotify else (_Poller(self.directories), )
+        self._thread = threading.Thread(target=target, args=args, name="config-watcher")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _watch_polling(self, poller):
+        while True:
+            sleep(self.interval)
+            for name in sorted(poller.check()):
+                self.publish(name)
+
+    def _add_missing_watches(self, inotify, watches):
+        """Try to watch directories which aren't watched yet.
+
+        :return: True if a new directory is watched
+        """
+        added = False
+        for directory in self.directories:
+            if directory in watches.values():
+                continue
+            try:
+                watches[inotify.add_watch(directory, WATCH_MASK)] = directory
+                added = True
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    logger.warning("Unable to watch %s: %s", directory, e)
+        return added
+
+    def _watch_inotify(self, inotify):
+        # watch descriptor -> directory
+        watches = {}
+        self._add_missing_watches(inotify, watches)
+        while True:
+            timeout = self.interval if len(watches) < len(self.directories) else None
+            readable, _, _ = select.select([inotify.fd], [], [], timeout)
+            if not readable:
+                if self._add_missing_watches(inotify, watches):
+                    # files created together with the directory weren't seen
+                    self.publish(None)
+                continue
+            changed = set()
+            for wd, mask, name in inotify.read_events():
+                if mask & IN_Q_OVERFLOW:
+                    changed.add(None)
+                elif mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                    # directory is gone, it will be watched again when recreated
+                    if watches.pop(wd, None) is not None:
+                        changed.add(None)
+                elif _is_config_name(name):
+                    changed.add(name)
+            if None in changed:
+                self.publish(None)
+            else:
+                for name in sorted(changed):
+                    self.publish(name)
@@ -565,6 +565,48 @@ Foris.initNotificationTestAlert = function () {
   });
 };
 
+Foris.initUciTree = function (nodePath) {
+  var loadChildren = function (checkbox, callback) {
+    var list = $(checkbox).siblings("ul");
+    if (list.data("loaded")) {
+      if (callback) callback();
+      return;
+    }
+    list.data("loaded", true);
+    $.get($(checkbox).data("children-url"), function (html) {
+      list.html(html);
+      if (callback) callback();
+    });
+  };
+
+  $(document).on("change", ".treeview input[data-children-url]", function () {
+    if (this.checked)
+      loadChildren(this);
+  });
+
+  $(document).on("click", ".treeview .uci-more a", function (e) {
+    e.preventDefault();
+    var item = $(this).parent();
+    $.get(this.href, function (html) {
+      item.replaceWith(html);
+    });
+  });
+
+  // expand the tree up to the node that has been requested
+  var expand = function (depth) {
+    if (!nodePath || depth > nodePath.length)
+      return;
+    var checkbox = document.getElementById(nodePath.slice(0, depth).join("."));
+    if (!checkbox)
+      return;
+    checkbox.checked = true;
+    loadChildren(checkbox, function () {
+      expand(depth + 1);
+    });
+  };
+  expand(2);
+};
+
 function extractPathName(src) {
   var a = document.createElement("a");
   a.href = src;
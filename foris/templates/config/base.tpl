@@ -33,6 +33,23 @@
     <div id="content-wrap">
         <div id="content">
           <h1>{{ title }}</h1>
+          %if nuci_status()["state"] != "closed":
+          <div class="message error">
+            {{ trans("The configuration backend of the router is not responding. Displayed data may be incomplete and changes can't be saved at the moment.") }}
+          </div>
+          %end
+          %pending_count = staged_changes_count()
+          %if pending_count and get("active_config_page_key") != "pending-changes":
+          <div class="message info">
+            {{ ungettext("There is %d change waiting to be applied.", "There are %d changes waiting to be applied.", pending_count) % pending_count }}
+            <a href="{{ url("config_page", page_name="pending-changes") }}">{{ trans("Review pending changes") }}</a>
+          </div>
+          %end
+          %if nuci_data_outdated():
+          <div class="message info">
+            {{ trans("Data displayed on this page may be outdated, the router is busy at the moment. Refresh the page later to get the current data.") }}
+          </div>
+          %end
 %end
             {{! base }}
 %if not defined('is_xhr'):
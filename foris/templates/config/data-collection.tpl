@@ -65,6 +65,9 @@
     <form id="ucollect-form" class="config-form" action="{{ request.fullpath }}" method="post" autocomplete="off" novalidate>
         <p class="config-description">{{! form.sections[0].description }}</p>
         <input type="hidden" name="csrf_token" value="{{ get_csrf_token() }}">
+        %if form.rendered_version_token:
+        <input type="hidden" name="config_version" value="{{ form.rendered_version_token }}">
+        %end
         %for field in form.active_fields:
             %include("_field.tpl", field=field)
         %end
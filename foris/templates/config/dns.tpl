@@ -25,10 +25,16 @@
     %end
     <form id="main-form" class="dns-form" action="{{ request.fullpath }}" method="post" enctype="multipart/form-data" autocomplete="off" novalidate>
         <input type="hidden" name="csrf_token" value="{{ get_csrf_token() }}">
+        %if form.rendered_version_token:
+        <input type="hidden" name="config_version" value="{{ form.rendered_version_token }}">
+        %end
         %for field in form.active_fields:
             %include("_field.tpl", field=field)
         %end
         <button type="submit" name="send" class="button">{{ trans("Save") }}</button>
+        %if can_stage:
+        <button type="submit" name="stage" value="1" class="button">{{ trans("Save for later") }}</button>
+        %end
     </form>
 
     <h2>{{ trans("Connection test") }}</h2>
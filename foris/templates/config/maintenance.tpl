@@ -54,6 +54,45 @@
         <button type="submit" name="send" class="button">{{ trans("Restore from backup") }}</button>
     </form>
 
+    <h2>{{ trans("Configuration snapshots") }}</h2>
+    <p>{{ trans("Snapshots keep the state of the configuration, so you can revert it later. Only the settings changed since the snapshot are restored. Snapshots are kept in memory only and they are lost when the interface is restarted.") }}</p>
+    <form id="snapshot-form" class="maintenance-form" action="{{ url("config_action", page_name="maintenance", action="take_snapshot") }}" method="post" autocomplete="off" novalidate>
+        <input type="hidden" name="csrf_token" value="{{ get_csrf_token() }}">
+        <div class="row">
+            <label for="field-snapshot-description">{{ trans("Description") }}</label>
+            <input type="text" name="description" id="field-snapshot-description">
+        </div>
+        <button type="submit" name="send" class="button">{{ trans("Take snapshot") }}</button>
+    </form>
+    %if snapshots:
+    <table>
+        <thead>
+            <tr>
+                <th>{{ trans("Taken") }}</th>
+                <th>{{ trans("Description") }}</th>
+                <th>{{ trans("Changes since previous") }}</th>
+                <th></th>
+            </tr>
+        </thead>
+        <tbody>
+        %for snapshot in snapshots:
+            <tr>
+                <td>{{ snapshot['created'] }}</td>
+                <td>{{ snapshot['description'] or "" }}</td>
+                <td>{{ snapshot['changes'] if snapshot['changes'] is not None else "-" }}</td>
+                <td>
+                    <form action="{{ url("config_action", page_name="maintenance", action="rollback_snapshot") }}" method="post">
+                        <input type="hidden" name="csrf_token" value="{{ get_csrf_token() }}">
+                        <input type="hidden" name="snapshot" value="{{ snapshot['id'] }}">
+                        <button type="submit" class="button">{{ trans("Revert") }}</button>
+                    </form>
+                </td>
+            </tr>
+        %end
+        </tbody>
+    </table>
+    %end
+
     <h2>{{ trans("Device reboot") }}</h2>
     <p>{{ trans("If you need to reboot the device, click on the following button. The reboot process takes approximately 30 seconds, you will be required to log in again after the reboot.") }}</p>
     <div>
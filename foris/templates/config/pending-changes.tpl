@@ -0,0 +1,59 @@
+%# Foris - web administration interface for OpenWrt based on NETCONF
+%# Copyright (C) 2017 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+%#
+%# This program is free software: you can redistribute it and/or modify
+%# it under the terms of the GNU General Public License as published by
+%# the Free Software Foundation, either version 3 of the License, or
+%# (at your option) any later version.
+%#
+%# This program is distributed in the hope that it will be useful,
+%# but WITHOUT ANY WARRANTY; without even the implied warranty of
+%# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+%# GNU General Public License for more details.
+%#
+%# You should have received a copy of the GNU General Public License
+%# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+%#
+%rebase("config/base.tpl", **locals())
+
+<div id="page-pending-changes" class="config-page">
+    %include("_messages.tpl")
+    %if changes:
+    <p>{{ trans("Following changes were saved for later. They will be applied all at once, so the affected services are restarted only once.") }}</p>
+    <table>
+        <thead>
+            <tr>
+                <th>{{ trans("Option") }}</th>
+                <th>{{ trans("Current value") }}</th>
+                <th>{{ trans("New value") }}</th>
+            </tr>
+        </thead>
+        <tbody>
+        %for change in changes:
+            <tr>
+                <td>{{ change['path'] }}</td>
+                <td>{{ change['old'] if change['old'] is not None else "" }}</td>
+                %if change['action'] == "remove":
+                <td>{{ trans("(removed)") }}</td>
+                %elif change['action'] == "add":
+                <td>{{ trans("(added)") }} {{ change['new'] or "" }}</td>
+                %elif change['action'] == "replace":
+                <td>{{ trans("(replaced)") }} {{ change['new'] or "" }}</td>
+                %else:
+                <td>{{ change['new'] }}</td>
+                %end
+            </tr>
+        %end
+        </tbody>
+    </table>
+    <form action="{{ url("config_action", page_name="pending-changes", action="apply") }}" method="post">
+        <input type="hidden" name="csrf_token" value="{{ get_csrf_token() }}">
+        <div class="form-buttons">
+            <button type="submit" name="action" value="discard" class="button grayed">{{ trans("Discard changes") }}</button>
+            <button type="submit" name="send" class="button">{{ trans("Apply changes") }}</button>
+        </div>
+    </form>
+    %else:
+    <p>{{ trans("There are no pending changes.") }}</p>
+    %end
+</div>
@@ -71,6 +71,9 @@
       <form id="main-form" class="config-form" action="{{ url("config_page", page_name="updater") }}" method="post" autocomplete="off" novalidate>
 
           <input type="hidden" name="csrf_token" value="{{ get_csrf_token() }}">
+          %if form.rendered_version_token:
+          <input type="hidden" name="config_version" value="{{ form.rendered_version_token }}">
+          %end
           %for field in form.sections[0].sections[0].active_fields:
               %if field.hidden:
                   {{! field.render() }}
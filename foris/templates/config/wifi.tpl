@@ -26,6 +26,9 @@
         <p class="config-description">{{! description }}</p>
         %include("_messages.tpl")
         <input type="hidden" name="csrf_token" value="{{ get_csrf_token() }}">
+        %if form.rendered_version_token:
+        <input type="hidden" name="config_version" value="{{ form.rendered_version_token }}">
+        %end
         %include("config/_wifi_form.tpl", form=form)
         <div id="wifi-qr">
         </div>
@@ -38,6 +41,9 @@
         <div class="form-buttons">
             <a href="{{ request.fullpath }}" class="button grayed">{{ trans("Discard changes") }}</a>
             <button type="submit" name="send" class="button">{{ trans("Save changes") }}</button>
+            %if can_stage:
+            <button type="submit" name="stage" value="1" class="button">{{ trans("Save for later") }}</button>
+            %end
         </div>
     </form>
     %end
@@ -0,0 +1,22 @@
+%# Foris - web administration interface for OpenWrt based on NETCONF
+%# Copyright (C) 2017 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+%#
+%# This program is free software: you can redistribute it and/or modify
+%# it under the terms of the GNU General Public License as published by
+%# the Free Software Foundation, either version 3 of the License, or
+%# (at your option) any later version.
+%#
+%# This program is distributed in the hope that it will be useful,
+%# but WITHOUT ANY WARRANTY; without even the implied warranty of
+%# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+%# GNU General Public License for more details.
+%#
+%# You should have received a copy of the GNU General Public License
+%# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+%#
+%for child in children:
+    %include("uci/_node.tpl", element=child)
+%end
+%if next_page is not None:
+    <li class="uci-more"><a href="{{ url("uci_children", node=node.path) }}?page={{ next_page }}">Show more</a></li>
+%end
@@ -15,42 +15,6 @@
 %# along with this program.  If not, see <http://www.gnu.org/licenses/>.
 %#
 %rebase("_layout.tpl", **locals())
-%def render_buttons(element):
-    %if not element.final:
-        %if element.tag == "section":
-        <a href="{{ url("uci_create", node=element.path, operation="add-option") }}">Add option</a>
-        | <a href="{{ url("uci_create", node=element.path, operation="add-list") }}">Add list</a>
-        %else:
-        <a href="{{ url("uci_create", node=element.path, operation="add") }}">Add value</a>
-        %end
-    %end
-    %if element.tag == "option" or element.tag == "value":
-        <a href="{{ url("uci_edit", node=element.path) }}">Edit</a>
-    %end
-    %if element.tag != "config":
-        | <a href="{{ url("uci_remove", node=element.path) }}">Remove</a>
-    %end
-        | <a href="{{ url("uci_debug", node=element.path) }}">Debug</a>
-%end
-%def treenode(element, node_path, depth=0):
-    <li>
-    %if not element.final or depth == 0:
-        <input type="checkbox" id="{{ element.path }}" {{! " checked=\"checked\"" if node_path and len(node_path) > depth and node_path[depth] == element.key else "" }}><label for="{{element.path}}">{{element}}</label>
-        %render_buttons(element)
-    %end
-    <ul>
-    %for child in element.children:
-        %if not child.final:
-            %treenode(child, node_path, depth + 1)
-        %else:
-            <li>{{child}}
-                %render_buttons(child)
-            </li>
-        %end
-    %end
-    </ul>
-    </li>
-%end
 
 %############################## PAGE ITSELF STARTS HERE ############################################
 <h1>Foris</h1>
@@ -60,8 +24,13 @@
     <div class="treeview">
     <ul>
     %for config in tree.children:
-        %treenode(config, node_path)
+        %include("uci/_node.tpl", element=config)
     %end
     </ul>
     </div>
-%end
\ No newline at end of file
+    <script>
+        $(document).ready(function() {
+            Foris.initUciTree({{! node_path_json }});
+        });
+    </script>
+%end
@@ -0,0 +1,101 @@
+import json
+
+import bottle
+import pytest
+
+from foris import api
+from foris.api import (
+    OperationError,
+    build_operation,
+    merge_uci,
+    project,
+    section_to_dict,
+    _find_conflict,
+)
+from foris.nuci.modules.base import Data
+from foris.nuci.modules.uci_raw import Uci, Config, Section, Option, List, Value
+
+
+def test_build_operation_invalid_path():
+    with pytest.raises(OperationError):
+        build_operation({"op": "set", "path": "foris.settings", "type": "config", "value": "1"})
+
+    with pytest.raises(OperationError):
+        build_operation({"op": "delete", "path": "firewall.@rule[0]"})
+
+
+def test_build_operation_set_requires_type():
+    with pytest.raises(OperationError):
+        build_operation({"op": "set", "path": "foris.settings.lang", "value": "cs"})
+
+
+def test_build_operation_list_booleans():
+    _, _, uci = build_operation({"op": "list", "path": "foris.settings.flags", "type": "config",
+                                 "values": [True, False, "x"]})
+    list_ = uci.find_child("foris.settings.flags")
+    assert [value.content for value in list_.children] == ["1", "0", "x"]
+
+
+def test_merge_operations_same_section():
+    uci = Uci()
+    for operation in ({"op": "set", "path": "foris.settings.lang", "type": "config", "value": "cs"},
+                      {"op": "set", "path": "foris.settings.x", "type": "config", "value": True}):
+        _, _, tree = build_operation(operation)
+        for config in list(tree.children):
+            merge_uci(uci, config)
+
+    assert len(uci.children) == 1
+    assert uci.find_child("foris.settings.lang").value == "cs"
+    assert uci.find_child("foris.settings.x").value == "1"
+
+
+def test_conflicting_operations():
+    touched = {0: (["firewall", "rule"], True)}
+
+    assert _find_conflict(["firewall", "rule", "name"], False, touched) == 0
+    assert _find_conflict(["firewall", "other", "name"], False, touched) is None
+
+
+def test_section_to_dict():
+    section = Section("lan", "interface")
+    section.add(Option("proto", "static"))
+    dns = List("dns")
+    dns.add(Value(0, "1.1.1.1"))
+    dns.add(Value(1, "8.8.8.8"))
+    section.add(dns)
+
+    assert section_to_dict(section) == {
+        "name": "lan", "type": "interface", "anonymous": False,
+        "options": {"proto": "static", "dns": ["1.1.1.1", "8.8.8.8"]},
+    }
+
+
+def test_project():
+    data = {"uptime": "10", "meminfo": {"MemTotal": "1", "MemFree": "2"}, "hostname": "turris"}
+
+    assert project(data, ["uptime", "meminfo.MemFree", "missing", "hostname.x"]) == {
+        "uptime": "10", "meminfo": {"MemFree": "2"},
+    }
+
+
+def test_uci_get_list(monkeypatch):
+    list_ = List("lists")
+    list_.add(Value(1, "luci-controls"))
+    list_.add(Value(2, "nas"))
+    data = Data()
+    data.add(Uci()).add(Config("updater")).add(Section("pkglists", "pkglists")).add(list_)
+
+    def get(filter=None, **kwargs):
+        # like Nuci, option filter doesn't match lists
+        if filter.find(".//" + Uci.qual_tag("option")) is not None:
+            return Data()
+        return data
+
+    monkeypatch.setattr(api.client, "get", get)
+    monkeypatch.setitem(bottle.default_app().config, "no_auth", True)
+    bottle.request.bind({})
+    bottle.response.bind()
+
+    result = json.loads(api.uci_get("updater.pkglists.lists"))
+
+    assert result == {"path": "updater.pkglists.lists", "value": ["luci-controls", "nas"]}
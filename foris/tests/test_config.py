@@ -0,0 +1,33 @@
+import pytest
+
+from foris import config, fapi
+from foris.nuci.filters import create_config_filter
+from foris.nuci.modules.base import Data
+from foris.nuci.modules.uci_raw import Uci
+
+
+@pytest.mark.parametrize("page_class", [
+    config.MaintenanceConfigPage,
+    config.UpdaterConfigPage,
+])
+def test_outdated_submit_shows_single_message(monkeypatch, page_class):
+    shown = []
+    monkeypatch.setattr(config, "_", lambda text: text)
+    for level in ("info", "success", "warning", "error"):
+        monkeypatch.setattr(config.messages, level,
+                            lambda text, level=level, **kwargs: shown.append((level, text)))
+
+    data = Data()
+    data.add(Uci())
+    monkeypatch.setattr(fapi.client, "get", lambda filter=None, **kwargs: data)
+    monkeypatch.setattr(
+        page_class, "get_form",
+        lambda self: fapi.ForisForm("test", self.data, filter=create_config_filter("test"))
+    )
+
+    page = page_class({"config_version": "stale"})
+
+    assert not page.save()
+    assert len(shown) == 1
+    assert shown[0][0] == "warning"
+    assert "modified by someone else" in shown[0][1]
@@ -0,0 +1,35 @@
+from foris import fapi
+from foris.form import Checkbox
+from foris.nuci.filters import create_config_filter
+from foris.nuci.modules.base import Data
+from foris.nuci.modules.uci_raw import Uci, Config, Section
+
+
+def _package_lists_form(monkeypatch, data):
+    current = Data()
+    current.add(Uci()).add(Config("updater")).add(Section("pkglists", "pkglists"))
+    monkeypatch.setattr(fapi.client, "get", lambda filter=None, **kwargs: current)
+
+    def make_preproc(list_name):
+        def preproc(list_):
+            return list_name in [value.content for value in list_.children]
+        return preproc
+
+    form = fapi.ForisForm("package_lists", data, filter=create_config_filter("updater"))
+    section = form.add_section(name="lists", title="Lists")
+    for name in ("luci", "nas"):
+        section.add_field(Checkbox, name="install_%s" % name, label=name,
+                          nuci_path="uci.updater.pkglists.lists",
+                          nuci_preproc=make_preproc(name))
+    return form
+
+
+def test_changed_fields_resubmit_without_uci_list(monkeypatch):
+    # no list in uci, nothing checked - unchecked checkboxes are not submitted at all
+    form = _package_lists_form(monkeypatch, {})
+    assert form.changed_fields == set()
+
+
+def test_changed_fields_checked_without_uci_list(monkeypatch):
+    form = _package_lists_form(monkeypatch, {"install_nas": "1"})
+    assert form.changed_fields == {"install_nas"}
@@ -0,0 +1,104 @@
+import threading
+from time import sleep
+from xml.etree import cElementTree as ET
+
+import pytest
+
+from foris.nuci.memo import RpcMemo, reset_served_stale, served_stale
+
+
+class Counter(object):
+    def __init__(self, delay=0):
+        self.calls = 0
+        self.delay = delay
+
+    def __call__(self):
+        self.calls += 1
+        sleep(self.delay)
+        return ET.Element("reply")
+
+
+def rpc(tag, text="value"):
+    element = ET.Element(tag)
+    ET.SubElement(element, "arg").text = text
+    return element
+
+
+def test_memoized_by_canonical_form():
+    memo = RpcMemo({"serial": RpcMemo.FOREVER})
+    func = Counter()
+    memo.call("dispatch", rpc("serial"), func)
+    memo.call("dispatch", rpc("serial"), func)
+    memo.call("dispatch", rpc("serial", "other"), func)
+    assert func.calls == 2
+
+
+def test_not_memoized_without_policy():
+    memo = RpcMemo({})
+    func = Counter()
+    memo.call("dispatch", rpc("check"), func)
+    memo.call("dispatch", rpc("check"), func)
+    assert func.calls == 2
+
+
+def test_ttl_and_refresh():
+    memo = RpcMemo({"check": 0.1})
+    func = Counter()
+    memo.call("dispatch", rpc("check"), func)
+    memo.call("dispatch", rpc("check"), func, refresh=True)
+    assert func.calls == 2
+    sleep(0.15)
+    memo.call("dispatch", rpc("check"), func)
+    assert func.calls == 3
+
+
+def test_single_flight():
+    memo = RpcMemo({"check": 60})
+    func = Counter(delay=0.1)
+    threads = [threading.Thread(target=memo.call, args=("dispatch", rpc("check"), func))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert func.calls == 1
+
+
+def test_errors_not_memoized():
+    memo = RpcMemo({"check": 60})
+
+    def fail():
+        raise IOError("failed")
+
+    with pytest.raises(IOError):
+        memo.call("dispatch", rpc("check"), fail)
+    func = Counter()
+    memo.call("dispatch", rpc("check"), func)
+    assert func.calls == 1
+
+
+def test_stale_while_revalidate():
+    memo = RpcMemo({"messages": 0}, stale_policies={"messages": 60}, stale_wait=0.05)
+    func = Counter(delay=0.1)
+    reset_served_stale()
+    first = memo.call("get", rpc("messages"), func, allow_stale=True)
+    assert not served_stale()
+    # slow call - outdated result is returned and revalidated in background
+    assert memo.call("get", rpc("messages"), func, allow_stale=True) is first
+    assert served_stale()
+    sleep(0.1)
+    assert func.calls == 2
+    # callers that don't accept outdated data wait for the running revalidation
+    memo.call("get", rpc("messages"), func)
+    assert func.calls == 3
+
+
+def test_stale_not_served_when_fresh_in_time():
+    memo = RpcMemo({"messages": 0}, stale_policies={"messages": 60}, stale_wait=0.5)
+    func = Counter(delay=0.01)
+    reset_served_stale()
+    first = memo.call("get", rpc("messages"), func, allow_stale=True)
+    assert memo.call("get", rpc("messages"), func, allow_stale=True) is not first
+    assert memo.lookup("get", rpc("messages"), revalidate=func) is not None
+    assert func.calls == 3
+    assert not served_stale()
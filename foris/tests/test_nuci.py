@@ -2,11 +2,20 @@ from xml.etree import cElementTree as ET
 
 import pytest
 
+from foris.nuci.cache import NuciCache
+from foris.nuci.diff import strip_unchanged
+from foris.nuci.serializer import serialize, serialize_config
+from foris.nuci.snapshots import SnapshotStore, diff
+from foris.nuci.uci_cache import UciDiskCache, file_stamp
+from foris.nuci.uci_file import anonymous_section_name, parse as parse_uci_file
+from foris.nuci.watcher import _Poller
 from foris.nuci.modules.uci_raw import (
     Uci,
     Config,
     Section,
     Option,
+    List,
+    Value,
     build_option_uci_tree,
 )
 
@@ -45,3 +54,249 @@ def test_option_bool_serialization():
     option_bool = Option("test", False)
     option_str = Option("test", "0")
     assert option_bool.value == option_str.value == "0"
+
+
+def _sample_uci_element():
+    uci = Uci()
+    network = uci.add(Config("network"))
+    lan = network.add(Section("lan", "interface"))
+    lan.add(Option("proto", "static"))
+    dns = lan.add(List("dns"))
+    dns.add(Value(0, "8.8.8.8"))
+    dns.add(Value(1, "1.1.1.1"))
+    network.add(Section("cfg01", "route", anonymous=True)).add(Option("target", "10.0.0.0"))
+    uci.add(Config("foris")).add(Section("settings", "config")).add(Option("lang", "cs"))
+    return ET.fromstring(ET.tostring(uci.get_xml()))
+
+
+def test_lazy_decoding_same_as_full():
+    element = _sample_uci_element()
+    full = Uci.from_element(element)
+    lazy = Uci.from_element(element, lazy=True)
+
+    assert ET.tostring(lazy.get_xml()) == ET.tostring(full.get_xml())
+    assert lazy.find_child("network.@route[0].target").value == "10.0.0.0"
+    assert [v.content for v in lazy.find_child("network.lan.dns").children] == \
+        ["8.8.8.8", "1.1.1.1"]
+    assert lazy.find_child("network.lan").parent.name == "network"
+
+
+def test_lazy_decoding_on_access_only():
+    lazy = Uci.from_element(_sample_uci_element(), lazy=True)
+    network = lazy.find_child("network")
+
+    assert network._lazy_element is not None
+    assert lazy.find_child("foris")._lazy_element is not None
+    assert len(network.children) == 2
+    assert network._lazy_element is None
+
+
+def test_find_child_paths():
+    uci = Uci.from_element(_sample_uci_element(), lazy=True)
+
+    assert uci.find_child("network.@route[-1].target").value == "10.0.0.0"
+    assert uci.find_child("network.@route[1]") is None
+    assert uci.find_child("*.settings.lang").value == "cs"
+    assert uci.find_child("network.*.proto").value == "static"
+    with pytest.raises(ValueError):
+        uci.find_child("network.@route")
+
+
+def test_find_children():
+    uci = Uci.from_element(_sample_uci_element())
+    paths = ["network.lan.proto", "network.@route[0].target", "*.settings.lang",
+             "network.lan.missing", "network.lan.dns"]
+    nodes = uci.find_children(paths)
+
+    assert sorted(nodes) == sorted(set(paths) - {"network.lan.missing"})
+    for path, node in nodes.items():
+        assert node is uci.find_child(path)
+
+
+def test_strip_unchanged():
+    current = Uci.from_element(_sample_uci_element(), lazy=True)
+    update = Uci()
+    network = update.add(Config("network"))
+    lan = network.add(Section("lan", "interface"))
+    lan.add(Option("proto", "dhcp"))
+    dns = lan.add_replace(List("dns"))
+    dns.add(Value(0, "8.8.8.8"))
+    dns.add(Value(1, "1.1.1.1"))
+    update.add(Config("foris")).add(Section("settings", None)).add(Option("lang", "cs"))
+    update.add(Config("unknown")).add(Section("s", "t")).add(Option("o", "1"))
+
+    stripped = strip_unchanged(update, current)
+
+    # config which is not in the current data is kept
+    assert stripped.find_child("network.lan.proto").value == "dhcp"
+    assert stripped.find_child("network.lan.dns") is None
+    assert stripped.find_child("foris") is None
+    assert stripped.find_child("unknown.s.o") is not None
+
+
+def test_strip_unchanged_nothing_left():
+    current = Uci.from_element(_sample_uci_element())
+    update = build_option_uci_tree("network.lan.proto", "interface", "static")
+    lan = update.find_child("network.lan")
+    dns = lan.add(List("dns"))
+    dns.add(Value(0, "8.8.8.8"))
+    dns.add(Value(1, "1.1.1.1"))
+
+    assert strip_unchanged(update, current) is None
+
+
+def _snapshot_uci(proto, guest=True):
+    uci = Uci()
+    network = uci.add(Config("network"))
+    network.add(Section("wan", "interface")).add(Option("proto", proto))
+    if guest:
+        network.add(Section("guest", "interface")).add(Option("ifname", "br-guest"))
+    uci.add(Config("system")).add(Section("cfg01", "system", True)).add(Option("hostname", "turris"))
+    return uci
+
+
+def test_snapshots_share_unchanged_configs():
+    store = SnapshotStore()
+    first = store.take(_snapshot_uci("dhcp"))
+    second = store.take(_snapshot_uci("static", guest=False))
+
+    assert first.configs[1] is second.configs[1]
+    assert diff(first.configs, second.configs) == [
+        (("network", "wan", "proto"), u"dhcp", u"static"),
+        (("network", "guest"), ("guest", "interface", False, (("ifname", u"br-guest"), )), None),
+    ]
+
+
+def test_snapshot_rollback_update():
+    store = SnapshotStore()
+    snapshot = store.take(_snapshot_uci("dhcp"))
+
+    assert store.rollback_update(snapshot, _snapshot_uci("dhcp")) is None
+    update = store.rollback_update(snapshot, _snapshot_uci("static", guest=False))
+    assert [config.name for config in update.children] == ["network"]
+    assert update.find_child("network.wan.proto").value == "dhcp"
+    assert update.find_child("network.guest.ifname").value == "br-guest"
+
+
+def test_snapshot_rollback_update_item_kind_changed():
+    def uci_with(item):
+        uci = Uci()
+        wan = uci.add(Config("network")).add(Section("wan", "interface"))
+        wan.add(Option("proto", "dhcp"))
+        wan.add(item)
+        return uci
+
+    dns_list = List("dns")
+    dns_list.add(Value(1, "1.1.1.1"))
+    dns_list.add(Value(2, "8.8.8.8"))
+
+    store = SnapshotStore()
+    snapshot = store.take(uci_with(dns_list))
+    update = store.rollback_update(snapshot, uci_with(Option("dns", "1.1.1.1")))
+    wan = update.find_child("network.wan")
+    assert wan.operation == "replace"
+    assert [child.name for child in wan.children] == ["proto", "dns"]
+    assert isinstance(wan.children[1], List)
+    assert [value.content for value in wan.children[1].children] == ["1.1.1.1", "8.8.8.8"]
+
+
+def test_serialize_same_as_element_tree():
+    uci = Uci()
+    network = uci.add(Config("network"))
+    wan = network.add(Section("wan", "interface"))
+    wan.add(Option("proto", u"<dhcp> & \u017e"))
+    dns = wan.add_replace(List("dns"))
+    dns.add(Value(1, "1.1.1.1"))
+    network.add_removal(Section("guest", "interface"))
+    network.add(Section("cfg01", "alias", True))
+
+    expected = ET.tostring(uci.get_xml())
+    assert ET.tostring(ET.fromstring(serialize(uci))) == expected
+    pretty = "".join(line.strip() for line in serialize(uci, pretty=True).splitlines())
+    assert ET.tostring(ET.fromstring(pretty)) == expected
+
+    config = ET.fromstring(serialize_config([uci]))
+    assert config.tag == "{urn:ietf:params:xml:ns:netconf:base:1.0}config"
+    assert ET.tostring(config[0]) == expected
+
+    option = wan.children[0]
+    assert ET.tostring(ET.fromstring(serialize(option, parents=True))) == \
+        ET.tostring(option.get_tree())
+
+
+def test_uci_file_anonymous_section_names():
+    # names known from default OpenWrt configs
+    assert anonymous_section_name(1, "system") == "cfg01e48a"
+    assert anonymous_section_name(1, "dnsmasq") == "cfg01411c"
+    assert anonymous_section_name(2, "zone") == "cfg02dc81"
+
+
+def test_uci_file_parse():
+    config = parse_uci_file(
+        "package network\n"
+        "# comment\n"
+        "config interface 'wan'  # trailing comment\n"
+        "\toption proto dhcp\n"
+        "\tlist dns '1.1.1.1'\n"
+        "\tlist dns \"8.8.8.8\"\n"
+        "\toption descr \"it's \\\"quoted\\\"\"\n"
+        "\n"
+        "config globals\n"
+        "\toption ula_prefix 'fd00::/48'\n"
+        "config interface 'wan'\n"
+        "\toption proto 'static'\n",
+        "network"
+    )
+
+    assert [section.name for section in config.children] == ["wan", "cfg023b09"]
+    assert config.find_child("wan.proto").value == "static"
+    assert [v.content for v in config.find_child("wan.dns").children] == ["1.1.1.1", "8.8.8.8"]
+    assert config.find_child("wan.descr").value == u"it's \"quoted\""
+    globals_ = config.find_child("@globals[0]")
+    assert globals_.anonymous and globals_.find_child("ula_prefix").value == "fd00::/48"
+
+
+def test_config_watcher_polling(tmpdir):
+    config_dir = tmpdir.mkdir("config")
+    config_dir.join("network").write("config interface 'lan'\n")
+    config_dir.join("system").write("config system\n")
+    poller = _Poller([str(config_dir), str(tmpdir.join("missing"))])
+    assert poller.check() == set()
+
+    config_dir.join("network").write("config interface 'lan'\n\toption proto 'static'\n")
+    config_dir.join("system").remove()
+    config_dir.join(".uci-tmp").write("")
+    config_dir.join("wireless").write("")
+    assert poller.check() == {"network", "system", "wireless"}
+    assert poller.check() == set()
+
+
+def test_nuci_cache_invalidate_config():
+    nuci_cache = NuciCache()
+    nuci_cache.results = {
+        "foris": 1, "foris.settings": 2, "foris.settings.lang": 3, "foris_extra.settings": 4,
+    }
+    nuci_cache.invalidate_config("foris")
+    assert nuci_cache.results == {"foris_extra.settings": 4}
+    nuci_cache.invalidate_config(None)
+    assert nuci_cache.results == {}
+
+
+def test_uci_disk_cache(tmpdir):
+    config_file = tmpdir.join("network")
+    config_file.write("config interface 'lan'\n\toption proto 'static'\n\tlist dns '1.1.1.1'\n")
+    stamp = file_stamp(str(config_file))
+    config = parse_uci_file(config_file.read(), "network")
+
+    cache = UciDiskCache(str(tmpdir.join("cache")))
+    cache.store(config, stamp)
+    cache.save()
+
+    cached = UciDiskCache(str(tmpdir.join("cache"))).get("network", stamp)
+    assert cached.find_child("lan.proto").value == "static"
+    assert [v.content for v in cached.find_child("lan.dns").children] == ["1.1.1.1"]
+
+    config_file.write("config interface 'lan'\n\toption proto 'dhcp'\n")
+    new_stamp = file_stamp(str(config_file))
+    assert UciDiskCache(str(tmpdir.join("cache"))).get("network", new_stamp) is None
+    assert UciDiskCache(str(tmpdir.join("missing"))).get("network", stamp) is None
@@ -0,0 +1,63 @@
+import pytest
+
+from foris.nuci.transport import BASE_1_1, FrameReader, FramingError, StdIOSession, frame
+
+
+def feed_by_bytes(reader, data):
+    messages = []
+    for c in data:
+        messages.extend(reader.feed(c))
+    return messages
+
+
+def test_eom_framing_split_delimiter():
+    data = frame("<a/>") + frame("<b>]]></b>")
+
+    assert feed_by_bytes(FrameReader(), data) == ["<a/>", "<b>]]></b>"]
+
+
+def test_chunked_framing():
+    data = frame("<a/>", chunked=True) + "\n#3\n<b>\n#4\n</b>\n##\n"
+
+    assert feed_by_bytes(FrameReader(chunked=True), data) == ["<a/>", "<b></b>"]
+
+
+def test_chunked_framing_across_reads():
+    reader = FrameReader(chunked=True)
+    reader.COMPACT_THRESHOLD = 4
+    message = "<data>%s</data>" % ("x" * 100)
+
+    assert reader.feed("\n#%d\n%s" % (len(message), message[:40])) == []
+    assert reader.feed(message[40:80]) == []
+    assert reader.pending == 80
+    assert reader.feed(message[80:] + "\n#3\n<b>\n#4") == []
+    assert reader.feed("\n</b>\n##\n") == [message + "<b></b>"]
+    assert reader.pending == 0
+
+
+def test_framing_switched_with_data_received():
+    reader = FrameReader()
+    assert reader.feed(frame("<hello/>") + "\n#4\n<a/>") == ["<hello/>"]
+    reader.set_chunked()
+    assert reader.feed("\n##\n") == ["<a/>"]
+
+
+def test_chunked_framing_invalid_size():
+    with pytest.raises(FramingError):
+        FrameReader(chunked=True).feed("\n#0\n")
+
+
+def test_chunked_framing_after_client_hello_sent():
+    session = StdIOSession.__new__(StdIOSession)
+    session._reader = FrameReader()
+    session._chunked = False
+    session._hello_sent = False
+    session._client_capabilities = [BASE_1_1]
+    # server's hello arrived before client's hello has been written
+    session._server_capabilities = [BASE_1_1]
+    session._update_framing()
+    assert not session._chunked
+
+    session._hello_sent = True
+    session._update_framing()
+    assert session._chunked and session._reader.chunked
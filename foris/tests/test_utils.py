@@ -0,0 +1,55 @@
+# coding=utf-8
+from foris.utils import Collation, localized_sorted
+
+
+def test_localized_sorted_czech_ch_after_h():
+    words = [u"chata", u"cibule", u"hrad", u"ihned", u"Čech"]
+
+    assert localized_sorted(words, "cs") == [u"Čech", u"cibule", u"hrad", u"chata", u"ihned"]
+
+
+def test_localized_sorted_with_key():
+    items = [(1, u"Žatec"), (2, u"Brno"), (3, u"Chrudim"), (4, u"Hulín")]
+
+    result = localized_sorted(items, "cs", key=lambda x: x[1])
+
+    assert [x[0] for x in result] == [2, 4, 3, 1]
+
+
+def test_localized_sorted_unknown_language():
+    assert localized_sorted([u"b", u"a"], "xx") == [u"a", u"b"]
+
+
+def test_collation_unknown_characters_last():
+    collation = Collation([u"A", u"B"])
+
+    assert collation.key(u"a") < collation.key(u"€")
+    assert collation.key("ab") == collation.key(u"ab")
+
+
+def _staged_update(section, option, value):
+    from foris.nuci.modules.uci_raw import Uci, Config, Section, Option
+    uci = Uci()
+    uci.add(Config("network")).add(Section(section, "interface")).add(Option(option, value))
+    return uci
+
+
+def test_staging_later_changes_win():
+    from foris.nuci.modules.uci_raw import Uci, Config, Section
+    from foris.utils.staging import _merge, describe
+
+    staged = Uci()
+    removal = Uci()
+    removal.add(Config("network")).add_removal(Section("guest", "interface"))
+    for update in (_staged_update("wan", "proto", "dhcp"), removal,
+                   _staged_update("wan", "proto", "static"),
+                   _staged_update("guest", "ifname", "br-guest")):
+        for config in list(update.children):
+            _merge(staged, config)
+
+    changes = [(c["path"], c["action"], c["new"]) for c in describe(staged)]
+    assert changes == [
+        ("network.wan.proto", "set", "static"),
+        ("network.guest", "replace", "interface"),
+        ("network.guest.ifname", "set", "br-guest"),
+    ]
@@ -14,12 +14,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from bottle import Bottle, request, view
+from bottle import Bottle, request, template, view
 import bottle
+import json
 import logging
+import re
 from form import Checkbox, Form, Textbox, websafe
 from ncclient.operations import RPCError
-from nuci import client
+from nuci import client, filters
 from nuci.client import edit_uci_config
 from nuci.modules import uci_raw
 from utils import print_model, login_required
@@ -90,25 +92,63 @@ class UciRawForm(Form):
         return model
 
 
-app = Bottle()
+# maximum number of children rendered at once when a node is expanded
+PAGE_SIZE = 50
+
+node_path_re = re.compile(r"^\w+(\.\w+)*$")
+
+
+def _get_node(node):
+    """Get Uci node from Nuci, fetching only the config or section it belongs to.
+
+    :param node: path to the node, starting with "uci"
+    :return: YinElement
+    """
+    chunks = node.split(".")
+    if chunks[0] != "uci" or len(chunks) < 2:
+        raise bottle.HTTPError(404, "Unknown node.")
+    # option filter does not match lists, so filter by section at most
+    data = client.get(filter=filters.create_uci_filter(*chunks[1:3]))
+    node_model = data.find_child(node)
+    if node_model is None:
+        raise bottle.HTTPError(404, "Unknown node.")
+    return node_model
 
 
 @app.get("/", name="uci_index")
 @view("uci/index")
 @login_required
 def index():
-    uci_model = client.get_uci_config()
+    # get only the names of configs, content is loaded when a node is expanded
+    uci_model = client.get(filter=filters.uci_config_names).find_child("uci")
     node_path = request.GET.get("node")
-    return dict(tree=uci_model, node=None,
-                node_path=node_path.split(".") if node_path else None)
+    if node_path and node_path_re.match(node_path):
+        node_path_json = json.dumps(node_path.split("."))
+    else:
+        node_path_json = "null"
+    return dict(tree=uci_model, node=None, node_path_json=node_path_json)
+
+
+@app.get("/<node:re:\w+(\.\w+)*>/children", name="uci_children")
+@login_required
+def children(node):
+    node_model = _get_node(node)
+    try:
+        page = max(int(request.GET.get("page", 0)), 0)
+    except ValueError:
+        page = 0
+    start = page * PAGE_SIZE
+    end = start + PAGE_SIZE
+    next_page = page + 1 if len(node_model.children) > end else None
+    return template("uci/_children", node=node_model, children=node_model.children[start:end],
+                    next_page=next_page)
 
 
 @app.get("/<node:re:\w+(\.\w+)*>/edit", name="uci_edit")
 @view("uci/edit")
 @login_required
 def edit(node):
-    uci_model = client.get_uci_config()
-    node_model = uci_model.find_child(node)
+    node_model = _get_node(node)
 
     form = UciRawForm(type(node_model), editable_key=False)
     form.fill_from_uci(node_model)
@@ -120,8 +160,7 @@ def edit(node):
 @view("uci/edit")
 @login_required
 def edit_post(node):
-    uci_model = client.get_uci_config()
-    node_model = uci_model.find_child(node)
+    node_model = _get_node(node)
 
     form = UciRawForm(type(node_model), editable_key=False)
     if form.validates(request.POST):
@@ -137,8 +176,7 @@ def edit_post(node):
 @login_required
 def create(node):
     operation = request.GET.get("operation")
-    uci_model = client.get_uci_config()
-    node_model = uci_model.find_child(node)
+    node_model = _get_node(node)
     if type(node_model) is uci_raw.Section:
         # Section contains lists or options
         if operation == "add-list":
@@ -164,8 +202,7 @@ def create(node):
 @login_required
 def create_post(node):
     operation = request.GET.get("operation")
-    uci_model = client.get_uci_config()
-    parent = uci_model.find_child(node)
+    parent = _get_node(node)
     if isinstance(parent, uci_raw.Section):
         if operation == "add-list":
             form = UciRawForm(uci_raw.List, editable_key=True)
@@ -201,8 +238,7 @@ def create_post(node):
 @app.get("/<node:re:\w+(\.\w+)*>/remove", name="uci_remove")
 @login_required
 def remove(node):
-    uci_model = client.get_uci_config()
-    node_model = uci_model.find_child(node)
+    node_model = _get_node(node)
     node_model.operation = "remove"
     try:
         edit_uci_config(node_model)
@@ -215,6 +251,5 @@ def remove(node):
 @app.get("/<node:re:\w+(\.\w+)*>/debug", name="uci_debug")
 @login_required
 def debug(node):
-    uci_model = client.get_uci_config()
-    node_model = uci_model.find_child(node)
+    node_model = _get_node(node)
     return "<pre>%s</pre>" % websafe(print_model(node_model))
\ No newline at end of file
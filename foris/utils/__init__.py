@@ -22,11 +22,11 @@ from datetime import datetime, timedelta
 import bottle
 from functools import wraps
 import logging
-from xml.etree import cElementTree as ET
 
 from .routing import reverse
 from .. import DEVICE_CUSTOMIZATION
 from ..nuci.modules.uci_raw import parse_uci_bool
+from ..nuci.serializer import serialize
 
 
 logger = logging.getLogger("foris.utils")
@@ -187,25 +187,108 @@ class LazyCache(object):
 
 
 def print_model(model):
-    import copy
-    toprint = copy.deepcopy(model.get_tree())
-    indent(toprint)
-    data = ET.tostring(toprint)
+    data = serialize(model, pretty=True, parents=True)
     logger.debug(data)
     return data
 
 
-def indent(elem, level=0):
-    i = "\n" + level*"  "
-    if len(elem):
-        if not elem.text or not elem.text.strip():
-            elem.text = i + "  "
-        for e in elem:
-            indent(e, level+1)
-        if not e.tail or not e.tail.strip():
-            e.tail = i
-    if level and (not elem.tail or not elem.tail.strip()):
-        elem.tail = i
+class Collation(object):
+    """
+    Precomputed collation table for a language-specific alphabet.
+
+    Graphemes are weighted in the order of the alphabet (uppercase forms first,
+    then lowercase, title-case forms like "Ch" as uppercase), multi-character
+    graphemes (e.g. Czech "ch") are matched greedily. Characters not present
+    in the alphabet are sorted after it by their code point. Computed sort keys
+    are cached per string.
+    """
+    MAX_CACHED_KEYS = 4096
+
+    def __init__(self, alphabet):
+        """
+        :param alphabet: uppercase graphemes in collation order
+        :type alphabet: list
+        """
+        graphemes = [u" "]
+        graphemes.extend(alphabet)
+        graphemes.extend(grapheme.lower() for grapheme in alphabet)
+
+        self.weights = {}
+        for weight, grapheme in enumerate(graphemes):
+            self.weights[grapheme] = weight
+        # title-case form of multi-character graphemes (e.g. "Ch") weighs the same as "CH"
+        for grapheme in alphabet:
+            if len(grapheme) > 1:
+                self.weights.setdefault(grapheme.title(), self.weights[grapheme])
+        self.unknown_base = len(graphemes)
+        self.max_length = max(len(g) for g in self.weights)
+        # starting characters of multi-character graphemes
+        self.prefixes = frozenset(g[0] for g in self.weights if len(g) > 1)
+        self._keys = {}
+
+    def _compute_key(self, string):
+        weights = self.weights
+        prefixes = self.prefixes
+        result = []
+        i = 0
+        length = len(string)
+        while i < length:
+            c = string[i]
+            if c in prefixes:
+                for size in xrange(min(self.max_length, length - i), 1, -1):
+                    weight = weights.get(string[i:i + size])
+                    if weight is not None:
+                        result.append(weight)
+                        i += size
+                        break
+                else:
+                    result.append(weights.get(c, self.unknown_base + ord(c)))
+                    i += 1
+            else:
+                result.append(weights.get(c, self.unknown_base + ord(c)))
+                i += 1
+        return tuple(result)
+
+    def key(self, string):
+        """
+        Get sort key for a string.
+
+        :param string: string to compute the key for
+        :return: tuple of grapheme weights
+        """
+        try:
+            return self._keys[string]
+        except KeyError:
+            pass
+        if isinstance(string, str):
+            result = self._compute_key(string.decode("utf-8"))
+        else:
+            result = self._compute_key(string)
+        if len(self._keys) >= self.MAX_CACHED_KEYS:
+            self._keys.clear()
+        self._keys[string] = result
+        return result
+
+
+_collations = {}
+
+
+def get_collation(lang):
+    """
+    Get collation for a language, build it on the first use.
+
+    :param lang: ISO 639-1 code of the language
+    :return: Collation instance or None if the language has no alphabet
+    """
+    try:
+        return _collations[lang]
+    except KeyError:
+        pass
+    from ..langs import alphabets
+    alphabet = alphabets.get(lang)
+    collation = Collation(alphabet) if alphabet else None
+    _collations[lang] = collation
+    return collation
 
 
 def localized_sorted(iterable, lang, cmp=None, key=None, reverse=False):
@@ -219,27 +302,17 @@ def localized_sorted(iterable, lang, cmp=None, key=None, reverse=False):
     :param reverse: reverse argument for the sorted method
     :return: sorted iterable
     """
-    alphabet = {
-        # FIXME: "ch" should be sorted after h in Czech
-        'cs': u" AÁÅBCČDĎEÉĚFGHIÍJKLMNŇOÓPQRŘSŠTŤUÚŮVWXYÝZŽ"
-              u"aáåbcčdďeéěfghiíjklmnňoópqrřsštťuúůvwxyýzž"
-    }
-
-    alphabet = alphabet.get(lang)
-    if not alphabet:
+    collation = get_collation(lang)
+    if not collation:
         return sorted(iterable, cmp, key, reverse)
 
-    key = key or (lambda x: x)
-
-    def safe_index(c):
-        """Get index of a character in the alphabet, do not raise error."""
-        try:
-            return alphabet.index(c)
-        except ValueError:
-            return len(alphabet) + ord(c)
+    if key:
+        collation_key = collation.key
 
-    def key_fn(x):
-        """Key function for sorting using a custom alphabet."""
-        return map(safe_index, key(x))
+        def key_fn(x):
+            """Key function for sorting using a custom alphabet."""
+            return collation_key(key(x))
+    else:
+        key_fn = collation.key
 
     return sorted(iterable, cmp, key_fn, reverse)
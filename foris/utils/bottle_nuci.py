@@ -0,0 +1,66 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2017 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import json
+import logging
+
+import bottle
+
+from ..nuci.exceptions import NuciBusyError, NuciUnavailableError
+
+
+logger = logging.getLogger("foris.utils.bottle_nuci")
+
+
+def service_unavailable(message, retry_after, **kwargs):
+    """Create 503 response, JSON-encoded for XHR requests.
+
+    :param message: message for the user
+    :param retry_after: value of Retry-After header (in seconds)
+    :param kwargs: additional content of the JSON response
+    :return: HTTPResponse
+    """
+    headers = {"Retry-After": str(retry_after)}
+    if bottle.request.is_xhr:
+        res = bottle.response.copy(cls=bottle.HTTPResponse)
+        res.content_type = 'application/json'
+        res.body = json.dumps(dict(success=False, retryAfter=retry_after, message=message,
+                                   **kwargs))
+        res.status = 503
+        for name, value in headers.items():
+            res.set_header(name, value)
+        return res
+    return bottle.HTTPError(503, message, headers=headers)
+
+
+class NuciErrorsPlugin(object):
+    """Bottle plugin turning Nuci overload and outage errors into HTTP 503 responses."""
+    name = "nuci_errors"
+    api = 2
+
+    def apply(self, callback, route):
+        def wrapper(*args, **kwargs):
+            try:
+                return callback(*args, **kwargs)
+            except NuciBusyError as e:
+                logger.warning("Request rejected: %s", e)
+                raise service_unavailable("The router is busy, please try again later.",
+                                          e.retry_after, busy=True)
+            except NuciUnavailableError as e:
+                logger.warning("Request rejected: %s", e)
+                raise service_unavailable("The configuration backend of the router is not "
+                                          "responding, please try again later.",
+                                          e.retry_after, unavailable=True)
+        return wrapper
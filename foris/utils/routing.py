@@ -29,11 +29,43 @@ def _get_prefix_and_script_name():
     return script_name, prefix
 
 
-def reverse(name, **kargs):
-    script_name, prefix = _get_prefix_and_script_name()
+# name -> (mount prefix, router), see build_route_table()
+_route_table = {}
+# name -> path (without script name) for routes built without arguments
+_path_cache = {}
+
+
+def build_route_table(app):
+    """
+    Precompute the table of named routes of the main app and its mounted apps
+    used by reverse(). Must be called after all the apps are mounted and all
+    the plugins are loaded.
+
+    The lookup order is the same as in the fallback in reverse() - routes
+    of the main app take precedence over routes of the mounted apps,
+    mounted apps are searched in the order in which they were mounted.
+
+    :param app: main Bottle app
+    :return: None
+    """
+    table = {}
+    for name in app.router.builder:
+        table[name] = ("", app.router)
+    for route in app.routes:
+        if route.config.get("mountpoint"):
+            prefix = route.config['mountpoint.prefix'].rstrip("/")
+            router = route.config['mountpoint.target'].router
+            for name in router.builder:
+                table.setdefault(name, (prefix, router))
+
+    _route_table.clear()
+    _route_table.update(table)
+    _path_cache.clear()
+
+
+def _reverse_uncached(name, **kargs):
     try:
-        path = bottle.app().router.build(name, **kargs)
-        return "".join([script_name.rstrip("/"), path])
+        return bottle.app().router.build(name, **kargs)
     except bottle.RouteBuildError:
         for route in bottle.app().routes:
             if route.config.get("mountpoint"):
@@ -41,13 +73,34 @@ def reverse(name, **kargs):
                 try:
                     prefix = config['mountpoint.prefix'].rstrip("/")
                     path = config['mountpoint.target'].router.build(name, **kargs)
-                    return "".join([script_name.rstrip("/"), prefix, path])
+                    return "".join([prefix, path])
                 except bottle.RouteBuildError as e:
                     if str(e).startswith("Missing URL"):
                         raise e
     raise bottle.RouteBuildError("No route with name '%s' in main app or mounted apps." % name)
 
 
+def reverse(name, **kargs):
+    script_name, _ = _get_prefix_and_script_name()
+    script_name = script_name.rstrip("/")
+    if not kargs:
+        path = _path_cache.get(name)
+        if path is not None:
+            return script_name + path
+
+    try:
+        prefix, router = _route_table[name]
+    except KeyError:
+        # table not built yet or route added afterwards
+        path = _reverse_uncached(name, **kargs)
+    else:
+        path = prefix + router.build(name, **kargs)
+
+    if not kargs:
+        _path_cache[name] = path
+    return script_name + path
+
+
 def static(name, *args):
     script_name, _ = _get_prefix_and_script_name()
     script_name = script_name.strip('/')
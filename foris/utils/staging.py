@@ -0,0 +1,198 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2017 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Staging area for configuration changes.
+
+Changes saved from config pages can be collected in the session instead
+of being sent to Nuci immediately. All the staged changes are then applied
+together using a single edit-config, so the affected services are restarted
+only once.
+"""
+
+import logging
+from xml.etree import cElementTree as ET
+
+import bottle
+
+from ..nuci import client, filters
+from ..nuci.diff import strip_unchanged
+from ..nuci.modules.uci_raw import Uci, Section, Option, List
+
+
+logger = logging.getLogger("foris.utils.staging")
+
+_SESSION_KEY = "foris.staged_changes"
+
+
+def _merge(target, node):
+    """Merge node into the target node, later changes override the earlier ones.
+
+    :param target: node to merge into
+    :param node: node to merge
+    """
+    for existing in target.children:
+        if existing.key == node.key:
+            break
+    else:
+        target.add(node)
+        return
+    if isinstance(node, (Option, List)) or node.operation is not None:
+        target.remove(existing)
+        target.add(node)
+        return
+    if existing.operation == "remove":
+        # section or config removed before - drop the rest of it and create it again
+        target.remove(existing)
+        target.add_replace(node)
+        return
+    if isinstance(existing, Section) and node.type is not None:
+        existing.type = node.type
+    for child in list(node.children):
+        _merge(existing, child)
+
+
+def get_staged():
+    """Get staged changes of the current session.
+
+    :return: Uci tree with the changes or None if there are none
+    """
+    session = bottle.request.environ['beaker.session']
+    xml = session.get(_SESSION_KEY)
+    if not xml:
+        return None
+    return Uci.from_element(ET.fromstring(xml))
+
+
+def _set_staged(uci):
+    session = bottle.request.environ['beaker.session']
+    if uci is None or not uci.children:
+        session.pop(_SESSION_KEY, None)
+    else:
+        session[_SESSION_KEY] = ET.tostring(uci.get_xml())
+
+
+def stage(updates, current=None):
+    """Add config updates to the staging area.
+
+    :param updates: list of Uci trees (other elements are not supported)
+    :param current: current configuration - staged changes which wouldn't
+                    change it are dropped (e.g. when a change is reverted)
+    :return: None
+    """
+    staged = get_staged() or Uci()
+    for update in updates:
+        if type(update) is not Uci:
+            raise ValueError("Only Uci updates can be staged.")
+        for config in list(update.children):
+            _merge(staged, config)
+    if current is not None:
+        staged = strip_unchanged(staged, current)
+    _set_staged(staged)
+
+
+def get_staged_count():
+    """Get number of staged changes (options, lists and removed/added sections).
+
+    :return: number of changes
+    """
+    return len(describe(get_staged()))
+
+
+def discard():
+    """Drop all the staged changes."""
+    _set_staged(None)
+
+
+def apply():
+    """Apply all the staged changes using a single edit-config.
+
+    :return: None
+    :raises: RPCError, TimeoutExpiredError
+    """
+    staged = get_staged()
+    if staged is None:
+        return
+    try:
+        client.edit_config(staged)
+    finally:
+        from ..core import nuci_cache
+        for config in staged.children:
+            nuci_cache.invalidate(config.name)
+    discard()
+
+
+def _describe_value(node):
+    if node is None:
+        return None
+    if isinstance(node, Option):
+        return node.value
+    if isinstance(node, List):
+        return ", ".join(value.content for value in node.children)
+    if isinstance(node, Section):
+        return node.type
+    return ""
+
+
+def describe(staged, current=None):
+    """Describe the staged changes for the user.
+
+    :param staged: staged changes (Uci) or None
+    :param current: current configuration (Uci) to show the original values
+    :return: list of dicts with path, action ("set", "add", "replace", "remove"),
+             old and new value
+    """
+    changes = []
+
+    def walk(node, path, current_node):
+        current_children = {}
+        if current_node is not None:
+            for child in current_node.children:
+                current_children.setdefault(child.key, child)
+        for child in node.children:
+            child_path = "%s.%s" % (path, child.key) if path else child.key
+            current_child = current_children.get(child.key)
+            old = _describe_value(current_child)
+            if child.operation == "remove":
+                changes.append(dict(path=child_path, action="remove", old=old, new=None))
+            elif isinstance(child, (Option, List)):
+                changes.append(dict(path=child_path, action="set", old=old,
+                                    new=_describe_value(child)))
+            else:
+                if child.operation == "replace":
+                    changes.append(dict(path=child_path, action="replace", old=old,
+                                        new=_describe_value(child)))
+                    current_child = None
+                elif isinstance(child, Section) and current is not None \
+                        and current_child is None:
+                    changes.append(dict(path=child_path, action="add", old=None,
+                                        new=_describe_value(child)))
+                walk(child, child_path, current_child)
+
+    if staged is not None:
+        walk(staged, "", current)
+    return changes
+
+
+def get_current_config(staged):
+    """Get current configuration of the configs touched by staged changes.
+
+    :param staged: staged changes (Uci)
+    :return: Uci tree
+    """
+    names = [config.name for config in staged.children]
+    data = client.get(filter=filters.create_config_filter(*names))
+    return data.find_child("uci")
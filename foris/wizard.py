@@ -45,6 +45,8 @@ class WizardStepMixin(object):
     is_final_step = False
     # wizard step name
     can_skip_wizard = True
+    # time budgets (in seconds) of AJAX actions, overriding the request deadline
+    ajax_budgets = {}
 
     def call_action(self, action):
         """Call config page action.
@@ -173,12 +175,13 @@ class WizardStep3(WizardStepMixin, BaseConfigHandler):
     template = "wizard/connectivity.tpl"
     name = "connectivity"
     next_step_allowed = 4
+    ajax_budgets = {"check_connection": 30, "check_connection_noforward": 30}
     userfriendly_title = gettext("Connectivity test")
 
     def _disable_forwarding(self):
         uci = build_option_uci_tree("resolver.common.forward_upstream", "resolver", "0")
         try:
-            client.edit_config(uci.get_xml())
+            client.edit_config(uci)
             return True
         except (RPCError, TimeoutExpiredError):
             return False
@@ -232,6 +235,8 @@ class WizardStep5(WizardStepMixin, TimeHandler):
     template = "wizard/time.tpl"
     name = "time"
     next_step_allowed = 6
+    # NTP synchronization uses longer RPC timeout
+    ajax_budgets = {"ntp_update": 65}
 
     def _action_ntp_update(self):
         success = client.ntp_update()
@@ -504,7 +509,8 @@ def ajax(number=1):
     Wizard = get_wizard(number)
     wiz = Wizard(request.POST)
     try:
-        result = wiz.call_ajax_action(action)
+        with client.deadline(wiz.ajax_budgets.get(action)):
+            result = wiz.call_ajax_action(action)
         return result
     except ValueError:
         raise bottle.HTTPError(404, "Unknown Wizard action.")
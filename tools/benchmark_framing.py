@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Benchmark of NETCONF message framing (foris.nuci.transport.FrameReader)
+on multi-megabyte replies, compared to naive accumulation of the data into
+a string which is searched for the delimiter from its beginning after each
+read.
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from foris.nuci.transport import FrameReader, MSG_DELIM, frame
+
+
+def naive_read(data, read_size):
+    buffer = ""
+    messages = []
+    for i in xrange(0, len(data), read_size):
+        buffer += data[i:i + read_size]
+        while MSG_DELIM in buffer:
+            message, buffer = buffer.split(MSG_DELIM, 1)
+            messages.append(message)
+    return messages
+
+
+def frame_reader_read(data, read_size, chunked):
+    reader = FrameReader(chunked)
+    messages = []
+    for i in xrange(0, len(data), read_size):
+        messages.extend(reader.feed(data[i:i + read_size]))
+    return messages
+
+
+def make_reply(size):
+    value = "<uci:value>%s</uci:value>" % ("x" * 64)
+    return "<rpc-reply message-id=\"1\"><data>%s</data></rpc-reply>" % (
+        value * (size / len(value)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-m", "--megabytes", type=int, default=4, help="size of the reply")
+    parser.add_argument("-b", "--read-size", type=int, default=16 * 1024,
+                        help="size of a single read")
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    reply = make_reply(args.megabytes * 1024 * 1024)
+    eom_data = frame(reply)
+    chunked_data = frame(reply, chunked=True)
+
+    assert naive_read(eom_data, args.read_size) == [reply]
+    assert frame_reader_read(eom_data, args.read_size, False) == [reply]
+    assert frame_reader_read(chunked_data, args.read_size, True) == [reply]
+
+    cases = (
+        ("naive", lambda: naive_read(eom_data, args.read_size)),
+        ("FrameReader (1.0)", lambda: frame_reader_read(eom_data, args.read_size, False)),
+        ("FrameReader (1.1)", lambda: frame_reader_read(chunked_data, args.read_size, True)),
+    )
+    for name, fn in cases:
+        elapsed = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        print "%-18s %8.1f ms" % (name, elapsed * 1000)
+
+
+if __name__ == "__main__":
+    main()
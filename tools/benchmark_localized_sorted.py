@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Micro-benchmark of foris.utils.localized_sorted against the former
+implementation based on per-character alphabet.index() lookups.
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from foris.utils import localized_sorted, _collations
+
+
+OLD_ALPHABET = u" AÁÅBCČDĎEÉĚFGHIÍJKLMNŇOÓPQRŘSŠTŤUÚŮVWXYÝZŽ" \
+               u"aáåbcčdďeéěfghiíjklmnňoópqrřsštťuúůvwxyýzž"
+
+
+def old_localized_sorted(iterable, key=None):
+    key = key or (lambda x: x)
+
+    def safe_index(c):
+        try:
+            return OLD_ALPHABET.index(c)
+        except ValueError:
+            return len(OLD_ALPHABET) + ord(c)
+
+    return sorted(iterable, key=lambda x: map(safe_index, key(x)))
+
+
+def generate_words(count, seed):
+    rnd = random.Random(seed)
+    letters = OLD_ALPHABET.replace(u" ", u"")
+    return [u"".join(rnd.choice(letters) for _ in range(rnd.randint(4, 24)))
+            for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--items", type=int, default=250,
+                        help="number of strings to sort")
+    parser.add_argument("-r", "--repeat", type=int, default=200,
+                        help="number of sorts per measurement")
+    parser.add_argument("-s", "--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    words = generate_words(args.items, args.seed)
+    items = [(i, word) for i, word in enumerate(words)]
+    key = lambda x: x[1]
+
+    def run_old():
+        old_localized_sorted(items, key=key)
+
+    def run_new():
+        localized_sorted(items, "cs", key=key)
+
+    def run_new_cold():
+        _collations.clear()
+        localized_sorted(items, "cs", key=key)
+
+    for name, fn in (("old", run_old), ("new (cold)", run_new_cold), ("new (cached)", run_new)):
+        elapsed = min(timeit.repeat(fn, number=args.repeat, repeat=3))
+        print "%-14s %8.3f ms/sort" % (name, elapsed / args.repeat * 1000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Benchmark of decoding of large Uci configs (foris.nuci.modules.uci_raw)
+- full conversion of the whole tree compared to lazy conversion followed
+by lookup of a few paths (as config handlers usually do).
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from xml.etree import cElementTree as ET
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from foris.nuci.modules.uci_raw import Uci, Config, Section, Option
+
+
+def make_uci_element(configs, sections, options):
+    uci = Uci()
+    for c in xrange(configs):
+        config = uci.add(Config("config%d" % c))
+        for s in xrange(sections):
+            section = config.add(Section("section%d" % s, "type%d" % (s % 5)))
+            for o in xrange(options):
+                section.add(Option("option%d" % o, "value %d" % o))
+    return ET.fromstring(ET.tostring(uci.get_xml()))
+
+
+def lookup(element, lazy, paths):
+    uci = Uci.from_element(element, lazy=lazy)
+    return [uci.find_child(path) for path in paths]
+
+
+def walk(element):
+    uci = Uci.from_element(element, lazy=True)
+    return [option for config in uci for section in config for option in section]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-c", "--configs", type=int, default=20)
+    parser.add_argument("-s", "--sections", type=int, default=50, help="sections per config")
+    parser.add_argument("-o", "--options", type=int, default=10, help="options per section")
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    element = make_uci_element(args.configs, args.sections, args.options)
+    paths = [
+        "config0.section0.option0",
+        "config1.@type2[0].option1",
+        "config%d.section%d.option%d" % (args.configs - 1, args.sections - 1, args.options - 1),
+    ]
+    assert [n.value for n in lookup(element, False, paths)] == \
+        [n.value for n in lookup(element, True, paths)]
+
+    cases = (
+        ("full", lambda: lookup(element, False, paths)),
+        ("lazy", lambda: lookup(element, True, paths)),
+        ("lazy, whole tree", lambda: walk(element)),
+    )
+    for name, fn in cases:
+        elapsed = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        print "%-18s %8.1f ms" % (name, elapsed * 1000)
+
+
+if __name__ == "__main__":
+    main()